@@ -4,12 +4,12 @@ from .models import UserProfile
 
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
-    list_display = ['user', 'role', 'phone', 'created_at']
-    list_filter = ['role', 'created_at']
+    list_display = ['user', 'role', 'phone', 'digest_mode', 'created_at']
+    list_filter = ['role', 'digest_mode', 'created_at']
     search_fields = ['user__username', 'user__email', 'phone']
     readonly_fields = ['created_at', 'updated_at']
     fieldsets = (
         ('User Information', {'fields': ('user',)}),
-        ('Profile Details', {'fields': ('role', 'phone', 'bio')}),
+        ('Profile Details', {'fields': ('role', 'phone', 'bio', 'digest_mode')}),
         ('Timestamps', {'fields': ('created_at', 'updated_at')}),
     )
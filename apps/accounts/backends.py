@@ -0,0 +1,19 @@
+from django.contrib.auth.backends import ModelBackend
+from django.core.exceptions import PermissionDenied
+
+from .identity import load_user
+
+
+class CachedModelBackend(ModelBackend):
+    """``ModelBackend`` that loads signed-in users, with their profiles, through the identity cache."""
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        user = super().authenticate(request, username=username, password=password, **kwargs)
+        if user is None and password is not None:
+            # stop here rather than have the plain ModelBackend hash the password again
+            raise PermissionDenied
+        return user
+
+    def get_user(self, user_id):
+        user = load_user(user_id)
+        return user if user is not None and self.user_can_authenticate(user) else None
@@ -37,9 +37,10 @@ class UserRegistrationForm(UserCreationForm):
 class UserProfileForm(forms.ModelForm):
     class Meta:
         model = UserProfile
-        fields = ['role', 'phone', 'bio']
+        fields = ['role', 'phone', 'bio', 'digest_mode']
         widgets = {
             'role': forms.Select(attrs={'class': 'form-control'}),
+            'digest_mode': forms.Select(attrs={'class': 'form-control'}),
             'phone': forms.TextInput(attrs={'class': 'form-control'}),
             'bio': forms.Textarea(attrs={'class': 'form-control', 'rows': 4}),
         }
@@ -0,0 +1,42 @@
+"""Load the signed-in user and their profile from the cache.
+
+Each authenticated request loads its ``User``, and the navbar, profile page
+and inquiry form then load the ``UserProfile``. ``CachedModelBackend``, whose
+``get_user`` ``AuthenticationMiddleware`` calls, loads both with one joined
+query, and reads them from the ``IDENTITY_CACHE`` alias when one is set.
+``signals.py`` drops a user's entry whenever the user (including a password
+change) or their profile is saved or deleted. Sessions are still checked
+against the cached password hash, so changing a password signs out the
+user's other sessions as before. That only holds while every process shares
+the cache, so there is no per-process default.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+
+
+def identity_cache():
+    """The shared identity cache, or None when identities are not cached."""
+    alias = getattr(settings, 'IDENTITY_CACHE', None)
+    return caches[alias] if alias else None
+
+
+def cache_key(user_id):
+    return f'identity:user:{user_id}'
+
+
+def load_user(user_id):
+    """The user with ``user_id`` and their profile, or None if there is no such user."""
+    cache = identity_cache()
+    user = cache.get(cache_key(user_id)) if cache is not None else None
+    if user is None:
+        user = get_user_model()._default_manager.select_related('profile').filter(pk=user_id).first()
+        if user is not None and cache is not None:
+            cache.set(cache_key(user_id), user)
+    return user
+
+
+def forget_user(user_id):
+    cache = identity_cache()
+    if cache is not None:
+        cache.delete(cache_key(user_id))
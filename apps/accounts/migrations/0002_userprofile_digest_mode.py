@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='digest_mode',
+            field=models.CharField(choices=[('IMMEDIATE', 'One email per inquiry'), ('HOURLY', 'Hourly digest'), ('DAILY', 'Daily digest')], default='IMMEDIATE', max_length=10, verbose_name='Inquiry emails'),
+        ),
+    ]
@@ -11,10 +11,22 @@ class UserProfile(models.Model):
         (BUYER, 'Buyer'),
     ]
 
+    IMMEDIATE = 'IMMEDIATE'
+    HOURLY = 'HOURLY'
+    DAILY = 'DAILY'
+
+    DIGEST_CHOICES = [
+        (IMMEDIATE, 'One email per inquiry'),
+        (HOURLY, 'Hourly digest'),
+        (DAILY, 'Daily digest'),
+    ]
+
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     role = models.CharField(max_length=10, choices=ROLE_CHOICES, default=BUYER)
     phone = models.CharField(max_length=20, blank=True, null=True)
     bio = models.TextField(blank=True, null=True)
+    # how inquiries on the user's listings are emailed to them
+    digest_mode = models.CharField('Inquiry emails', max_length=10, choices=DIGEST_CHOICES, default=IMMEDIATE)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -1,6 +1,8 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.contrib.auth.models import User
+from .identity import forget_user
 from .models import UserProfile
 
 
@@ -19,3 +21,13 @@ def save_user_profile(sender, instance, **kwargs):
     except UserProfile.DoesNotExist:
         # If profile doesn't exist, create it
         UserProfile.objects.create(user=instance)
+
+
+@receiver([post_save, post_delete], sender=User)
+@receiver([post_save, post_delete], sender=UserProfile)
+def forget_cached_identity(sender, instance, **kwargs):
+    """Drop the cached user and profile when either changes, password changes included."""
+    user_id = instance.pk if sender is User else instance.user_id
+    forget_user(user_id)
+    # again after commit, in case a request cached the old rows meanwhile
+    transaction.on_commit(lambda: forget_user(user_id))
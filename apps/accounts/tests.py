@@ -1,6 +1,11 @@
-from django.test import TestCase, Client
+from django.conf import settings
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
+from django.db import connection
 from django.urls import reverse
+from apps.properties.forms import InquiryForm
+from .identity import identity_cache
 from .models import UserProfile
 
 class UserProfileModelTest(TestCase):
@@ -268,4 +273,82 @@ class AuthenticationIntegrationTest(TestCase):
 
         # Attempt to access property creation (should succeed)
         response = self.client.get(reverse('properties:property_create'))
-        self.assertEqual(response.status_code, 200)
\ No newline at end of file
+        self.assertEqual(response.status_code, 200)
+
+# a locmem alias stands in for the shared Redis cache
+@override_settings(
+    CACHES={**settings.CACHES, 'identity': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'identity'}},
+    IDENTITY_CACHE='identity',
+)
+class CachedIdentityTest(TestCase):
+    def setUp(self):
+        identity_cache().clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='cached', password='testpass123', email='cached@example.com')
+        self.user.profile.phone = '555-0100'
+        self.user.profile.save()
+        self.client.login(username='cached', password='testpass123')
+        self.list_url = reverse('properties:property_list')
+
+    def identity_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        return response, [q['sql'] for q in queries if 'auth_user' in q['sql'] or 'accounts_userprofile' in q['sql']]
+
+    def test_user_and_profile_loaded_once(self):
+        """Test later requests take the user and profile from the cache instead of the database"""
+        self.identity_queries(self.list_url)
+        response, queries = self.identity_queries(self.list_url)
+        self.assertEqual(queries, [])
+        self.assertEqual(response.context['user'].profile.phone, '555-0100')
+        self.assertEqual(InquiryForm(user=response.context['user']).initial['phone'], '555-0100')
+
+    def test_saves_invalidate_cached_identity(self):
+        """Test user and profile saves show up on the next request"""
+        self.identity_queries(self.list_url)
+        self.user.first_name = 'Renamed'
+        self.user.save()
+        profile = UserProfile.objects.get(user=self.user)
+        profile.role = UserProfile.AGENT
+        profile.save()
+        response, queries = self.identity_queries(self.list_url)
+        self.assertNotEqual(queries, [])
+        self.assertEqual(response.context['user'].first_name, 'Renamed')
+        self.assertTrue(response.context['user'].profile.is_agent)
+
+    def test_password_change_and_deactivation_sign_out(self):
+        """Test a cached session stops working after a password change or deactivation"""
+        self.identity_queries(self.list_url)
+        self.user.set_password('newpass456')
+        self.user.save()
+        self.assertFalse(self.client.get(self.list_url).context['user'].is_authenticated)
+        self.client.login(username='cached', password='newpass456')
+        self.identity_queries(self.list_url)
+        self.user.is_active = False
+        self.user.save()
+        self.assertFalse(self.client.get(self.list_url).context['user'].is_authenticated)
+
+class UncachedIdentityTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='plain', password='testpass123')
+        self.list_url = reverse('properties:property_list')
+
+    def test_changes_from_other_processes_apply_at_once(self):
+        """Test without a shared cache each request reads the user, so an update made elsewhere signs out"""
+        self.assertIsNone(identity_cache())
+        self.client.login(username='plain', password='testpass123')
+        self.assertTrue(self.client.get(self.list_url).context['user'].is_authenticated)
+        # a queryset update sends no signals, like a save in another process
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertFalse(self.client.get(self.list_url).context['user'].is_authenticated)
+
+    def test_model_backend_sessions_still_load(self):
+        """Test sessions signed in under the plain ModelBackend stay signed in"""
+        self.client.force_login(self.user, backend='django.contrib.auth.backends.ModelBackend')
+        self.assertEqual(self.client.get(self.list_url).context['user'], self.user)
+
+    def test_wrong_password_rejected(self):
+        """Test a wrong password fails once instead of falling through to the next backend"""
+        self.assertFalse(self.client.login(username='plain', password='wrong'))
+        self.assertFalse(self.client.login(username='nobody', password='wrong'))
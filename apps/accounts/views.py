@@ -4,10 +4,13 @@ from django.contrib import messages
 from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.views import LoginView, LogoutView
+from django.db.models import Count, Q
 
 from .forms import UserRegistrationForm, UserProfileForm, UserUpdateForm
 from .models import UserProfile
-from apps.properties.models import Inquiry
+from apps.properties.counters import user_counts
+from apps.properties.models import Inquiry, Property
+from apps.properties.sharding import scatter, with_users
 
 
 class CustomLoginView(LoginView):
@@ -38,7 +41,7 @@ def register_view(request):
         form = UserRegistrationForm(request.POST)
         if form.is_valid():
             user = form.save()
-            login(request, user)
+            login(request, user, backend='apps.accounts.backends.CachedModelBackend')
             messages.success(request, 'Registration successful! Welcome to Real Estate Management.')
             return redirect('properties:property_list')
     else:
@@ -63,15 +66,19 @@ def profile_view(request):
         user_form = UserUpdateForm(instance=request.user)
         profile_form = UserProfileForm(instance=profile)
 
-    user_properties = request.user.properties.all()[:5]
+    # a user's listings and inquiries may be spread over several shards
+    user_properties = scatter(request.user.properties.all())[:5]
+    property_stats = scatter(request.user.properties.all()).aggregate(total=Count('pk'), available=Count('pk', filter=Q(status=Property.AVAILABLE)))
 
-    received_inquiries = Inquiry.objects.filter(property__owner=request.user, is_read=False).select_related('property', 'user').order_by('-created_at')[:5]
-    sent_inquiries = Inquiry.objects.filter(user=request.user).select_related('property').order_by('-created_at')[:5]
+    received_inquiries = scatter(with_users(Inquiry.objects.filter(owner=request.user, is_read=False).select_related('related_property'), 'user').order_by('-created_at'))[:5]
+    sent_inquiries = scatter(Inquiry.objects.filter(user=request.user).select_related('related_property').order_by('-created_at'))[:5]
 
     context = {
         'user_form': user_form,
         'profile_form': profile_form,
         'user_properties': user_properties,
+        'property_stats': property_stats,
+        'inquiry_counts': user_counts(request.user),
         'received_inquiries': received_inquiries,
         'sent_inquiries': sent_inquiries,
     }
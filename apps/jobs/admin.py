@@ -0,0 +1,22 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['task', 'queue', 'status', 'attempts', 'run_at', 'created_at', 'finished_at']
+    list_filter = ['status', 'queue', 'task']
+    search_fields = ['task', 'last_error']
+    readonly_fields = ['created_at', 'finished_at', 'locked_by', 'locked_at', 'last_error']
+    date_hierarchy = 'created_at'
+    list_per_page = 50
+    actions = ['retry_now']
+
+    def retry_now(self, request, queryset):
+        updated = queryset.exclude(status=Job.RUNNING).update(
+            status=Job.PENDING, run_at=timezone.now(), attempts=0, finished_at=None,
+        )
+        self.message_user(request, f"{updated} jobs queued to run again.")
+    retry_now.short_description = 'Retry selected jobs now' # type: ignore
@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
+
+
+class JobsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.jobs'
+    verbose_name = 'Background Jobs'
+
+    def ready(self):
+        # register the handlers defined in each app's tasks.py
+        autodiscover_modules('tasks')
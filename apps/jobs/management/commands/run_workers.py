@@ -0,0 +1,61 @@
+import signal
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from apps.jobs.queue import purge_finished, run_batch
+
+
+class Command(BaseCommand):
+    help = 'Run background job workers against the database job queue.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queue', default='default')
+        parser.add_argument('--workers', type=int, default=1, help='Worker threads polling the queue.')
+        parser.add_argument('--batch-size', type=int, default=20, help='Jobs claimed (and sharing one SMTP connection) per batch.')
+        parser.add_argument('--sleep', type=float, default=1.0, help='Seconds to wait when the queue is empty.')
+        parser.add_argument('--once', action='store_true', help='Drain the due jobs and exit.')
+        parser.add_argument('--purge-days', type=int, default=7, help='Delete finished jobs older than this; 0 keeps them.')
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+        processed = [0] * options['workers']
+
+        def work(slot):
+            while not stop.is_set():
+                count = run_batch(options['queue'], options['batch_size'])
+                processed[slot] += count
+                if not count:
+                    if options['once']:
+                        return
+                    # drop a connection the database server may time out while idle
+                    close_old_connections()
+                    stop.wait(options['sleep'])
+
+        def work_in_thread(slot):
+            try:
+                work(slot)
+            finally:
+                # each thread has its own database connection
+                connection.close()
+
+        if options['purge_days']:
+            purge_finished(options['purge_days'])
+        if not options['once']:
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(signum, lambda *_args: stop.set())
+            self.stdout.write(f"Running {options['workers']} worker(s) on queue '{options['queue']}'.")
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=work_in_thread, args=(slot,), daemon=True) for slot in range(1, options['workers'])]
+        for thread in threads:
+            thread.start()
+        # the first worker runs here so --once needs no extra thread
+        work(0)
+        for thread in threads:
+            thread.join()
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {sum(processed)} jobs in {time.perf_counter() - started:.2f}s.'
+        ))
@@ -0,0 +1,150 @@
+"""A small database-backed job queue.
+
+Jobs are rows in ``Job``. ``enqueue()`` inserts one in the caller's
+transaction, so a job exists exactly when the data it refers to was
+committed. ``run_workers`` claims due jobs in batches, runs each through the
+handler registered with ``@task``, and on failure reschedules it with
+exponential backoff until ``max_attempts`` is reached.
+
+Handlers take ``(payload, context)``. The ``JobContext`` is shared by a
+batch, so ``context.mail_connection`` opens one SMTP connection for every
+email sent in that batch.
+"""
+import logging
+import random
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .models import Job
+
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+def task(name):
+    """Register the decorated function as the handler for jobs named ``name``."""
+    def decorator(func):
+        _registry[name] = func
+        return func
+    return decorator
+
+
+def get_handler(name):
+    return _registry.get(name)
+
+
+def enqueue(name, payload=None, queue='default', run_at=None, max_attempts=None):
+    """Create a job; call inside the transaction that writes the job's data."""
+    if name not in _registry:
+        raise ValueError(f'No job handler registered for {name!r}.')
+    return Job.objects.create(
+        task=name,
+        payload=payload or {},
+        queue=queue,
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts or getattr(settings, 'JOBS_MAX_ATTEMPTS', 5),
+    )
+
+
+def backoff(attempts):
+    """Delay before retry number ``attempts``: doubling from JOBS_RETRY_DELAY, with jitter."""
+    base = getattr(settings, 'JOBS_RETRY_DELAY', 30)
+    cap = getattr(settings, 'JOBS_MAX_RETRY_DELAY', 60 * 60)
+    delay = min(base * 2 ** (attempts - 1), cap)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+class JobContext:
+    """Resources shared by the jobs of one batch."""
+
+    @cached_property
+    def mail_connection(self):
+        connection = get_connection()
+        connection.open()
+        return connection
+
+    def close(self):
+        if 'mail_connection' in self.__dict__:
+            try:
+                self.mail_connection.close()
+            except Exception:  # the relay may already have dropped us
+                logger.warning('Closing the mail connection failed', exc_info=True)
+            del self.__dict__['mail_connection']
+
+
+def _claimable(now):
+    # jobs whose worker died mid-run are retried once their lock expires
+    stale = now - timedelta(seconds=getattr(settings, 'JOBS_LOCK_TIMEOUT', 5 * 60))
+    return Q(status=Job.PENDING, run_at__lte=now) | Q(status=Job.RUNNING, locked_at__lt=stale)
+
+
+def claim(queue='default', limit=20):
+    """Lock up to ``limit`` due jobs for this caller and return them."""
+    now = timezone.now()
+    due = Job.objects.filter(_claimable(now), queue=queue).order_by('run_at').values_list('pk', flat=True)[:limit]
+    ids = list(due)
+    if not ids:
+        return []
+    token = uuid.uuid4().hex
+    # the status condition is re-checked by the UPDATE, so concurrent workers never share a job
+    Job.objects.filter(_claimable(now), pk__in=ids).update(status=Job.RUNNING, locked_by=token, locked_at=now)
+    return list(Job.objects.filter(locked_by=token, status=Job.RUNNING).order_by('run_at'))
+
+
+def run_job(job, context):
+    handler = get_handler(job.task)
+    job.attempts += 1
+    try:
+        if handler is None:
+            raise LookupError(f'No job handler registered for {job.task!r}.')
+        handler(job.payload, context)
+    except Exception:
+        job.last_error = traceback.format_exc(limit=5)
+        if job.attempts >= job.max_attempts or handler is None:
+            job.status = Job.FAILED
+            job.finished_at = timezone.now()
+            logger.error('Job %s failed permanently', job, exc_info=True)
+        else:
+            job.status = Job.PENDING
+            job.run_at = timezone.now() + backoff(job.attempts)
+            logger.warning('Job %s failed; retrying at %s', job, job.run_at, exc_info=True)
+        # a dead SMTP connection must not fail the rest of the batch
+        context.close()
+    else:
+        job.status = Job.DONE
+        job.finished_at = timezone.now()
+        job.last_error = ''
+    job.locked_by = ''
+    job.locked_at = None
+    job.save(update_fields=['status', 'attempts', 'run_at', 'last_error', 'finished_at', 'locked_by', 'locked_at'])
+    return job.status == Job.DONE
+
+
+def run_batch(queue='default', limit=20):
+    """Claim and run one batch; returns the number of jobs processed."""
+    jobs = claim(queue, limit)
+    if not jobs:
+        return 0
+    context = JobContext()
+    try:
+        for job in jobs:
+            run_job(job, context)
+    finally:
+        context.close()
+    return len(jobs)
+
+
+def purge_finished(days):
+    """Delete jobs that finished more than ``days`` days ago."""
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = Job.objects.filter(status__in=[Job.DONE, Job.FAILED], finished_at__lt=cutoff).delete()
+    return deleted
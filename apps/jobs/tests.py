@@ -0,0 +1,141 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.properties.models import Property, Inquiry
+from apps.properties.tasks import SEND_INQUIRY_NOTIFICATION
+
+from .models import Job
+from .queue import backoff, claim, enqueue, run_batch, task
+
+
+FLAKY = 'jobs.tests.flaky'
+calls = []
+
+
+@task(FLAKY)
+def flaky(payload, context):
+    calls.append(payload)
+    raise RuntimeError('relay unavailable')
+
+
+def run_workers():
+    out = StringIO()
+    call_command('run_workers', '--once', '--purge-days', '0', stdout=out)
+    return out.getvalue()
+
+
+class InquiryNotificationJobTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.owner = User.objects.create_user(username='agent', email='agent@example.com', password='testpass123')
+        User.objects.create_user(username='buyer', password='testpass123')
+        self.prop = Property.objects.create(
+            title='Queued Cottage', description='Quiet street', price=Decimal('200000.00'),
+            address='2 Test Street', city='Austin', state='Texas', zipcode='78701',
+            bedrooms=2, bathrooms=Decimal('1.0'), area=900, property_type=Property.HOUSE,
+            status=Property.AVAILABLE, owner=self.owner,
+        )
+        self.url = reverse('properties:inquiry_create', kwargs={'pk': self.prop.pk})
+
+    def post_inquiry(self, message='Is it still available?'):
+        self.client.login(username='buyer', password='testpass123')
+        return self.client.post(self.url, {'name': 'Buyer', 'email': 'buyer@example.com', 'message': message})
+
+    def test_inquiry_enqueues_without_sending(self):
+        """Test posting an inquiry queues the email instead of sending it"""
+        response = self.post_inquiry()
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(len(mail.outbox), 0)
+        job = Job.objects.get()
+        self.assertEqual(job.task, SEND_INQUIRY_NOTIFICATION)
+        self.assertEqual(job.payload['inquiry_id'], Inquiry.objects.get().pk)
+        self.assertEqual(job.status, Job.PENDING)
+
+    def test_worker_sends_notification(self):
+        """Test run_workers --once delivers the owner's email and marks the job done"""
+        self.post_inquiry()
+        self.assertIn('Processed 1 jobs', run_workers())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['agent@example.com'])
+        self.assertIn('Queued Cottage', mail.outbox[0].subject)
+        self.assertIn(self.prop.get_absolute_url(), mail.outbox[0].body)
+        self.assertEqual(Job.objects.get().status, Job.DONE)
+
+    def test_batch_shares_one_connection(self):
+        """Test every email in a batch goes through a single mail connection"""
+        for index in range(3):
+            self.post_inquiry(f'Question {index}')
+        with mock.patch('apps.jobs.queue.get_connection', wraps=mail.get_connection) as get_connection:
+            run_workers()
+        self.assertEqual(get_connection.call_count, 1)
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_owner_without_email_is_skipped(self):
+        """Test the job completes quietly when the owner has no address"""
+        self.owner.email = ''
+        self.owner.save()
+        self.post_inquiry()
+        run_workers()
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(Job.objects.get().status, Job.DONE)
+
+
+class JobQueueTest(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_unknown_task_rejected(self):
+        """Test enqueue refuses a task with no registered handler"""
+        with self.assertRaises(ValueError):
+            enqueue('jobs.tests.missing')
+
+    @override_settings(JOBS_RETRY_DELAY=10, JOBS_MAX_RETRY_DELAY=100)
+    def test_backoff_doubles_up_to_cap(self):
+        """Test retry delays grow exponentially and stop at the cap"""
+        self.assertAlmostEqual(backoff(1).total_seconds(), 10, delta=2)
+        self.assertAlmostEqual(backoff(3).total_seconds(), 40, delta=8)
+        self.assertAlmostEqual(backoff(10).total_seconds(), 100, delta=20)
+
+    def test_failure_retries_then_fails(self):
+        """Test a failing job is rescheduled with backoff until max_attempts"""
+        job = enqueue(FLAKY, {'n': 1}, max_attempts=2)
+        with self.assertLogs('apps.jobs.queue', 'WARNING'):
+            self.assertEqual(run_batch(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.PENDING, 1))
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn('relay unavailable', job.last_error)
+        # not due yet
+        self.assertEqual(run_batch(), 0)
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        with self.assertLogs('apps.jobs.queue', 'ERROR'):
+            run_batch()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertEqual(len(calls), 2)
+
+    def test_claim_is_exclusive(self):
+        """Test jobs claimed by one worker are not handed to another"""
+        jobs = [enqueue(FLAKY, {'n': n}) for n in range(3)]
+        first = claim(limit=2)
+        second = claim(limit=5)
+        self.assertEqual([job.pk for job in first], [jobs[0].pk, jobs[1].pk])
+        self.assertEqual([job.pk for job in second], [jobs[2].pk])
+        self.assertEqual(claim(), [])
+
+    @override_settings(JOBS_LOCK_TIMEOUT=60)
+    def test_stale_lock_is_reclaimed(self):
+        """Test a job abandoned by a dead worker is claimed again"""
+        job = enqueue(FLAKY)
+        claim()
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(minutes=5))
+        self.assertEqual([claimed.pk for claimed in claim()], [job.pk])
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class MetricsConfig(AppConfig):
+    name = 'apps.metrics'
+    verbose_name = 'Metrics'
+
+    def ready(self):
+        from .instrumentation import install
+        install()
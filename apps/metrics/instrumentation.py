@@ -0,0 +1,73 @@
+"""Hooks that attribute SQL and template time to the request being handled.
+
+The middleware puts a ``Recording`` in a context variable for the length of
+the request. A database execute wrapper, installed on every connection as it
+is opened, and a wrapper around the Django template backend's ``render`` add
+to whichever recording is current; outside a request both pass straight
+through. A context variable (rather than a thread-local) keeps the
+attribution right for async views too.
+"""
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import Template
+
+
+current = ContextVar('metrics_recording', default=None)
+
+
+class Recording:
+    __slots__ = ('queries', 'sql_seconds', 'template_seconds', 'template_depth')
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+        self.template_depth = 0
+
+
+def record_sql(execute, sql, params, many, context):
+    recording = current.get()
+    if recording is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        recording.sql_seconds += time.perf_counter() - start
+        recording.queries += 1
+
+
+def _wrap_connection(connection, **kwargs):
+    if record_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_sql)
+
+
+def _wrap_render(render):
+    @wraps(render)
+    def timed_render(self, context=None, request=None):
+        recording = current.get()
+        # a template rendered while rendering another is already being timed
+        if recording is None or recording.template_depth:
+            return render(self, context, request)
+        recording.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return render(self, context, request)
+        finally:
+            recording.template_seconds += time.perf_counter() - start
+            recording.template_depth -= 1
+    timed_render.metrics_wrapped = True
+    return timed_render
+
+
+def install():
+    connection_created.connect(_wrap_connection, dispatch_uid='metrics_execute_wrapper')
+    # connections opened before the app registry was ready
+    for connection in connections.all(initialized_only=True):
+        _wrap_connection(connection)
+    if not getattr(Template.render, 'metrics_wrapped', False):
+        Template.render = _wrap_render(Template.render)
@@ -0,0 +1,96 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .instrumentation import Recording, current
+from .registry import registry
+
+
+UNMATCHED = '<unmatched>'
+
+
+def view_label(request):
+    match = getattr(request, 'resolver_match', None)
+    # raw paths would give every 404 its own series
+    return match.view_name if match is not None else UNMATCHED
+
+
+class MetricsMiddleware:
+    """Record wall time, SQL, template time and response size per URL name.
+
+    Put it first in MIDDLEWARE so the timings cover the other middleware.
+    It runs natively under both WSGI and ASGI, so it never forces an ASGI
+    request through a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        recording = Recording()
+        token = current.set(recording)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current.reset(token)
+        self.observe(request, response, recording, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        recording = Recording()
+        token = current.set(recording)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current.reset(token)
+        self.observe(request, response, recording, time.perf_counter() - start)
+        return response
+
+    def observe(self, request, response, recording, duration):
+        labels = (view_label(request),)
+        registry.observe('django_http_request_duration_seconds', labels, duration)
+        registry.observe('django_http_request_db_queries', labels, recording.queries)
+        registry.observe('django_http_request_db_duration_seconds', labels, recording.sql_seconds)
+        registry.observe('django_http_request_template_duration_seconds', labels, recording.template_seconds)
+        registry.observe('django_http_responses', labels + (str(response.status_code),), 1)
+        self.observe_size(response, labels)
+        registry.flush()
+
+    def observe_size(self, response, labels):
+        length = response.get('Content-Length')
+        if length is not None and length.isdigit():
+            # FileResponse sets it; wrapping its stream would lose sendfile
+            registry.observe('django_http_response_size_bytes', labels, int(length))
+        elif not response.streaming:
+            registry.observe('django_http_response_size_bytes', labels, len(response.content))
+        elif response.is_async:
+            response.streaming_content = self.acount_stream(response.streaming_content, labels)
+        else:
+            response.streaming_content = self.count_stream(response.streaming_content, labels)
+
+    def count_stream(self, content, labels):
+        size = 0
+        for chunk in content:
+            size += len(chunk)
+            yield chunk
+        registry.observe('django_http_response_size_bytes', labels, size)
+
+    async def acount_stream(self, content, labels):
+        size = 0
+        async for chunk in content:
+            size += len(chunk)
+            yield chunk
+        registry.observe('django_http_response_size_bytes', labels, size)
@@ -0,0 +1,208 @@
+"""In-process metric histograms exported in the Prometheus text format.
+
+Every thread records into its own shard, so an observation is a few plain
+list updates with no lock and no contention; only the first observation of a
+new thread takes a lock to register its shard. Scrapes add the shards up.
+A shard may be read while its thread writes to it, which can at worst show
+an observation in ``_count`` a scrape before it shows in ``_sum``.
+
+Worker processes each hold their own registry. With ``METRICS_DIR`` set,
+each process writes a snapshot of its totals to ``<METRICS_DIR>/<pid>.json``
+at most every ``METRICS_FLUSH_INTERVAL`` seconds, and ``/metrics`` adds up
+every snapshot in the directory. Clear the directory when deploying, as
+prometheus_client's multiprocess mode requires too.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, buckets, labels=('view',)):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.labels = tuple(labels)
+
+    def new_series(self):
+        # one count per bucket (non-cumulative) plus +Inf, then the sum
+        return [0] * (len(self.buckets) + 1) + [0.0]
+
+    def update(self, series, value):
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def samples(self, label_values, series):
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), series):
+            cumulative += count
+            yield '_bucket', label_values + (('le', _format_number(bound)),), cumulative
+        yield '_sum', label_values, series[-1]
+        yield '_count', label_values, cumulative
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels=('view',)):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+
+    def new_series(self):
+        return [0]
+
+    def update(self, series, value):
+        series[0] += value
+
+    def samples(self, label_values, series):
+        yield '_total', label_values, series[0]
+
+
+def _format_number(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+class Registry:
+    def __init__(self, metrics):
+        self.metrics = {metric.name: metric for metric in metrics}
+        self._local = threading.local()
+        self._shards = []
+        self._shards_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._last_flush = 0.0
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {name: {} for name in self.metrics}
+            with self._shards_lock:
+                self._shards.append(shard)
+        return shard
+
+    def observe(self, name, labels, value):
+        """Record ``value`` for metric ``name`` under the ``labels`` tuple."""
+        values = self._shard()[name]
+        series = values.get(labels)
+        if series is None:
+            series = values[labels] = self.metrics[name].new_series()
+        self.metrics[name].update(series, value)
+
+    def snapshot(self):
+        """Totals of every shard: ``{name: {labels: series}}``."""
+        with self._shards_lock:
+            shards = list(self._shards)
+        totals = {name: {} for name in self.metrics}
+        for shard in shards:
+            for name, values in shard.items():
+                _merge(totals[name], list(values.items()))
+        return totals
+
+    def reset(self):
+        with self._shards_lock:
+            for shard in self._shards:
+                for values in shard.values():
+                    values.clear()
+
+    # -- multi-process aggregation ------------------------------------------
+
+    def directory(self):
+        return getattr(settings, 'METRICS_DIR', None)
+
+    def flush(self, force=False):
+        """Write this process's totals to METRICS_DIR; never waits on another flush."""
+        directory = self.directory()
+        if not directory:
+            return False
+        interval = getattr(settings, 'METRICS_FLUSH_INTERVAL', 5)
+        if not force and time.monotonic() - self._last_flush < interval:
+            return False
+        if not self._flush_lock.acquire(blocking=False):
+            return False
+        try:
+            self._last_flush = time.monotonic()
+            data = {
+                name: [[list(labels), series] for labels, series in values.items()]
+                for name, values in self.snapshot().items()
+            }
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'w') as handle:
+                json.dump(data, handle)
+            os.replace(tmp, os.path.join(directory, f'{os.getpid()}.json'))
+            return True
+        finally:
+            self._flush_lock.release()
+
+    def collect(self):
+        """Totals across every process sharing METRICS_DIR (or just this one)."""
+        directory = self.directory()
+        if not directory:
+            return self.snapshot()
+        self.flush(force=True)
+        totals = {name: {} for name in self.metrics}
+        for filename in sorted(os.listdir(directory)):
+            if not filename.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(directory, filename)) as handle:
+                    data = json.load(handle)
+            except (OSError, ValueError):
+                # replaced or half-written mid-read; the next scrape gets it
+                continue
+            for name, rows in data.items():
+                if name in totals:
+                    _merge(totals[name], [(tuple(labels), series) for labels, series in rows])
+        return totals
+
+    def render(self):
+        """The Prometheus text exposition of ``collect()``."""
+        lines = []
+        for name, values in self.collect().items():
+            metric = self.metrics[name]
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            for labels in sorted(values):
+                label_values = tuple(zip(metric.labels, labels))
+                for suffix, sample_labels, value in metric.samples(label_values, values[labels]):
+                    rendered = ','.join(f'{key}="{_escape(val)}"' for key, val in sample_labels)
+                    lines.append(f'{name}{suffix}{{{rendered}}} {_format_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _merge(into, rows):
+    for labels, series in rows:
+        existing = into.get(labels)
+        if existing is None:
+            into[labels] = list(series)
+        else:
+            for index, value in enumerate(series):
+                existing[index] += value
+
+
+registry = Registry([
+    Histogram('django_http_request_duration_seconds', 'Wall time from middleware entry to response, by view.', DURATION_BUCKETS),
+    Histogram('django_http_request_db_queries', 'SQL queries run while handling a request, by view.', QUERY_BUCKETS),
+    Histogram('django_http_request_db_duration_seconds', 'Time spent in SQL queries per request, by view.', DURATION_BUCKETS),
+    Histogram('django_http_request_template_duration_seconds', 'Time spent rendering templates per request, by view.', DURATION_BUCKETS),
+    Histogram('django_http_response_size_bytes', 'Response body size, by view.', SIZE_BUCKETS),
+    Counter('django_http_responses', 'Responses by view and status code.', labels=('view', 'status')),
+])
@@ -0,0 +1,134 @@
+import json
+import os
+import tempfile
+import threading
+
+from asgiref.sync import iscoroutinefunction
+from django.db import connection
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import AsyncRequestFactory, TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .middleware import MetricsMiddleware
+from .registry import registry
+
+
+def series(name, view):
+    return registry.snapshot()[name].get((view,))
+
+
+class MetricsMiddlewareTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        registry.reset()
+
+    def test_records_view_timings(self):
+        """Test a page view records wall time, queries, template time and size"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('properties:property_list'))
+        view = 'properties:property_list'
+        duration = series('django_http_request_duration_seconds', view)
+        self.assertEqual(sum(duration[:-1]), 1)
+        self.assertGreater(duration[-1], 0)
+        self.assertEqual(series('django_http_request_db_queries', view)[-1], len(queries))
+        self.assertGreater(series('django_http_request_template_duration_seconds', view)[-1], 0)
+        self.assertEqual(series('django_http_response_size_bytes', view)[-1], len(response.content))
+        self.assertEqual(registry.snapshot()['django_http_responses'][(view, '200')], [1])
+
+    def test_streaming_size_counted_when_consumed(self):
+        """Test a streamed response's size is recorded once its body is read"""
+        response = self.client.get(reverse('properties:listing_feed'))
+        self.assertIsNone(series('django_http_response_size_bytes', 'properties:listing_feed'))
+        body = b''.join(response.streaming_content)
+        self.assertEqual(series('django_http_response_size_bytes', 'properties:listing_feed')[-1], len(body))
+
+    def test_unmatched_paths_share_a_label(self):
+        """Test 404s for unknown URLs do not create a series per path"""
+        self.client.get('/no-such-page/')
+        self.client.get('/another-missing-page/')
+        self.assertEqual(sum(series('django_http_request_duration_seconds', '<unmatched>')[:-1]), 2)
+
+    def test_threads_record_without_losing_observations(self):
+        """Test concurrent observations from many threads all reach the totals"""
+        def observe():
+            for _ in range(1000):
+                registry.observe('django_http_request_db_queries', ('threaded',), 3)
+        threads = [threading.Thread(target=observe) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        totals = series('django_http_request_db_queries', 'threaded')
+        self.assertEqual(sum(totals[:-1]), 8000)
+        self.assertEqual(totals[-1], 24000)
+
+
+    async def test_async_stack_runs_natively(self):
+        """Test under ASGI the middleware awaits the chain instead of forcing it into a thread"""
+        async def view(request):
+            return HttpResponse(b'hello')
+
+        async def stream(request):
+            async def chunks():
+                yield b'ab'
+                yield b'cde'
+            return StreamingHttpResponse(chunks())
+
+        middleware = MetricsMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = await middleware(AsyncRequestFactory().get('/'))
+        self.assertEqual(response.content, b'hello')
+        self.assertEqual(series('django_http_response_size_bytes', '<unmatched>')[-1], 5)
+        registry.reset()
+        response = await MetricsMiddleware(stream)(AsyncRequestFactory().get('/'))
+        self.assertEqual(b''.join([chunk async for chunk in response.streaming_content]), b'abcde')
+        self.assertEqual(series('django_http_response_size_bytes', '<unmatched>')[-1], 5)
+
+@override_settings(METRICS_TOKEN='scrape-secret')
+class MetricsEndpointTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        registry.reset()
+
+    def scrape(self, **extra):
+        return self.client.get(reverse('metrics:metrics'), HTTP_AUTHORIZATION='Bearer scrape-secret', **extra)
+
+    def test_prometheus_exposition(self):
+        """Test /metrics renders cumulative histograms in the text format"""
+        self.client.get(reverse('properties:property_list'))
+        response = self.scrape()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        text = response.content.decode()
+        self.assertIn('# TYPE django_http_request_duration_seconds histogram', text)
+        self.assertIn('django_http_request_duration_seconds_bucket{view="properties:property_list",le="+Inf"} 1', text)
+        self.assertIn('django_http_request_duration_seconds_count{view="properties:property_list"} 1', text)
+        self.assertIn('django_http_responses_total{view="properties:property_list",status="200"} 1', text)
+        buckets = [
+            int(line.rsplit(' ', 1)[1]) for line in text.splitlines()
+            if line.startswith('django_http_request_db_queries_bucket{view="properties:property_list"')
+        ]
+        self.assertEqual(buckets, sorted(buckets))
+
+    def test_scrapes_without_token_refused(self):
+        """Test /metrics needs the bearer token, even from localhost, and is closed without one"""
+        url = reverse('metrics:metrics')
+        self.assertEqual(self.client.get(url, REMOTE_ADDR='127.0.0.1').status_code, 403)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        self.assertEqual(self.scrape(REMOTE_ADDR='10.1.2.3').status_code, 200)
+        with override_settings(METRICS_ALLOWED_IPS=['10.0.0.1']):
+            self.assertEqual(self.scrape(REMOTE_ADDR='10.1.2.3').status_code, 403)
+        with override_settings(METRICS_TOKEN=None):
+            self.assertEqual(self.scrape().status_code, 403)
+
+    def test_processes_aggregated_through_directory(self):
+        """Test snapshots written by other worker processes are added in"""
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            other = {'django_http_responses': [[['properties:property_list', '200'], [41]]]}
+            with open(os.path.join(directory, '99999.json'), 'w') as handle:
+                json.dump(other, handle)
+            self.client.get(reverse('properties:property_list'))
+            text = self.scrape().content.decode()
+            self.assertIn(f'{os.getpid()}.json', os.listdir(directory))
+        self.assertIn('django_http_responses_total{view="properties:property_list",status="200"} 42', text)
@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_GET
+
+from .registry import registry
+
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def scrape_allowed(request):
+    """Whether the request carries ``Authorization: Bearer <METRICS_TOKEN>`` from an allowed address.
+
+    Without a token nobody may scrape. The address check alone is no guard:
+    behind a reverse proxy on the same host every request comes from 127.0.0.1.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if not token:
+        return False
+    allowed = getattr(settings, 'METRICS_ALLOWED_IPS', None)
+    if allowed is not None and request.META.get('REMOTE_ADDR') not in allowed:
+        return False
+    scheme, _, credentials = request.headers.get('Authorization', '').partition(' ')
+    return scheme.lower() == 'bearer' and constant_time_compare(credentials.strip(), token)
+
+
+@never_cache
+@require_GET
+def metrics_view(request):
+    """Prometheus scrape endpoint, limited to requests bearing METRICS_TOKEN."""
+    if not scrape_allowed(request):
+        return HttpResponseForbidden('Metrics require the scrape token.')
+    return HttpResponse(registry.render(), content_type=PROMETHEUS_CONTENT_TYPE)
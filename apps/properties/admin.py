@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import Property, PropertyImage, Inquiry
+from .counters import mark_read
 
 
 class PropertyImageInline(admin.TabularInline):
@@ -20,8 +21,9 @@ class PropertyAdmin(admin.ModelAdmin):
         ('Basic Information', {'fields': ('title', 'description', 'owner')}),
         ('Property Details', {'fields': ('property_type', 'status', 'featured_image')}),
         ('Specifications', {'fields': ('bedrooms', 'bathrooms', 'area')}),
-        ('Location', {'fields': ('address', 'city', 'state', 'zipcode')}),
+        ('Location', {'fields': ('address', 'city', 'state', 'zipcode', 'latitude', 'longitude')}),
         ('Pricing', {'fields': ('price',)}),
+        ('Feed', {'fields': ('external_id',)}),
         ('Timestamps', {'fields': ('created_at', 'updated_at')}),
     )
 
@@ -37,13 +39,13 @@ class PropertyImageAdmin(admin.ModelAdmin):
 class InquiryAdmin(admin.ModelAdmin):
     list_display = ['related_property', 'user', 'name', 'email', 'is_read', 'created_at']
     list_filter = ['is_read', 'created_at', 'related_property__property_type']
-    search_fields = ['property__title', 'user__username', 'name', 'email', 'message']
+    search_fields = ['related_property__title', 'user__username', 'name', 'email', 'message']
     readonly_fields = ['created_at']
     date_hierarchy = 'created_at'
     list_editable = ['is_read']
     list_per_page = 25
     fieldsets = (
-        ('Property & User', {'fields': ('property', 'user')}),
+        ('Property & User', {'fields': ('related_property', 'user')}),
         ('Contact Information', {'fields': ('name', 'email', 'phone')}),
         ('Message', {'fields': ('message',)}),
         ('Status', {'fields': ('is_read', 'created_at')}),
@@ -52,14 +54,14 @@ class InquiryAdmin(admin.ModelAdmin):
 
     def get_queryset(self, request):
         qs = super().get_queryset(request)
-        return qs.select_related('property', 'user')
+        return qs.select_related('related_property', 'user')
 
     def mark_as_read(self, request, queryset):
-        updated = queryset.update(is_read=True)
+        updated = mark_read(queryset, True)
         self.message_user(request, f"{updated} inquiries marked as read.")
     mark_as_read.short_description = 'Mark selected inquiries as read' # type: ignore
 
     def mark_as_unread(self, request, queryset):
-        updated = queryset.update(is_read=False)
+        updated = mark_read(queryset, False)
         self.message_user(request, f"{updated} inquiries marked as unread.")
     mark_as_unread.short_description = 'Mark selected inquiries as unread' # type: ignore
@@ -1,7 +1,18 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class PropertiesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.properties'
     verbose_name = 'Properties'
+
+    def ready(self):
+        # Import signals to ensure they're registered
+        try:
+            import apps.properties.signals  # noqa: F401
+        except Exception:
+            pass
+        from .sharding import reserve_pk_ranges
+        # each shard allocates pks from its own range
+        post_migrate.connect(reserve_pk_ranges, sender=self)
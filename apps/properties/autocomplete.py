@@ -0,0 +1,173 @@
+"""In-memory prefix trie behind the city/state autocomplete endpoint.
+
+Every distinct ``"City, State"`` and ``"State"`` among AVAILABLE listings is
+inserted under its lowercased city (or state) name and under each later word
+start, so ``"york"`` finds ``"New York, New York"``. Each trie node caches its top
+suggestions by listing count; a write only invalidates the caches on the
+paths it touches, so lookups stay a dictionary walk plus a cached list slice.
+
+The trie is built lazily, patched from the Property signals after commit,
+and rebuilt from scratch every ``PROPERTY_AUTOCOMPLETE_REBUILD_INTERVAL``
+seconds to pick up writes from other processes.
+"""
+import heapq
+import itertools
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db.models import Count
+
+from .models import Property
+from .sharding import listing_databases
+
+
+TOP_K = 10
+CITY = 'city'
+STATE = 'state'
+
+
+def _keys(value):
+    # the full name plus every later word start
+    words = value.lower().replace(',', ' ').split()
+    return {' '.join(words[i:]) for i in range(len(words))}
+
+
+def _entries(city, state):
+    city, state = (city or '').strip(), (state or '').strip()
+    entries = []
+    if city:
+        entries.append((CITY, f'{city}, {state}' if state else city, city))
+    if state:
+        entries.append((STATE, state, state))
+    return entries
+
+
+class _Node:
+    __slots__ = ('children', 'terms', 'top')
+
+    def __init__(self):
+        self.children = {}
+        # label -> (kind, value) of suggestions whose key ends here
+        self.terms = {}
+        self.top = None
+
+
+class AutocompleteIndex:
+    def __init__(self, rebuild_interval=300):
+        self.rebuild_interval = rebuild_interval
+        self.lock = threading.RLock()
+        self.root = _Node()
+        self.counts = Counter()
+        self.built_at = None
+
+    def build(self):
+        queryset = (
+            Property.objects.filter(status=Property.AVAILABLE)
+            .values_list('city', 'state')
+            .annotate(n=Count('pk'))
+            .order_by()
+        )
+        # a term's rows are spread over the shards; counts are summed below
+        rows = itertools.chain.from_iterable(queryset.using(alias) for alias in listing_databases())
+        counts = Counter()
+        terms = {}
+        for city, state, n in rows:
+            for kind, label, value in _entries(city, state):
+                counts[label] += n
+                terms[label] = (kind, value)
+        with self.lock:
+            self.root = _Node()
+            self.counts = counts
+            for label, (kind, value) in terms.items():
+                self._insert(label, kind, value)
+            self._top(self.root)
+            self.built_at = time.monotonic()
+
+    def _insert(self, label, kind, value):
+        for key in _keys(value):
+            node = self.root
+            node.top = None
+            for ch in key:
+                node = node.children.setdefault(ch, _Node())
+                node.top = None
+            node.terms[label] = (kind, value)
+
+    def _discard(self, label, value):
+        for key in _keys(value):
+            node = self.root
+            path = [node]
+            for ch in key:
+                node = node.children.get(ch)
+                if node is None:
+                    break
+                path.append(node)
+            else:
+                node.terms.pop(label, None)
+            for visited in path:
+                visited.top = None
+
+    def _top(self, node):
+        if node.top is None:
+            candidates = {label: (self.counts[label], kind, value) for label, (kind, value) in node.terms.items()}
+            for child in node.children.values():
+                for count, label, kind, value in self._top(child):
+                    candidates[label] = (count, kind, value)
+            best = heapq.nsmallest(TOP_K, candidates.items(), key=lambda item: (-item[1][0], item[0]))
+            node.top = [(count, label, kind, value) for label, (count, kind, value) in best]
+        return node.top
+
+    @property
+    def built(self):
+        return self.built_at is not None
+
+    def apply(self, city, state, delta):
+        """Adjust the counts for one listing entering (+1) or leaving (-1) the index."""
+        with self.lock:
+            if not self.built:
+                return
+            for kind, label, value in _entries(city, state):
+                self.counts[label] += delta
+                if self.counts[label] <= 0:
+                    del self.counts[label]
+                    self._discard(label, value)
+                else:
+                    # re-inserting clears the cached rankings along its paths
+                    self._insert(label, kind, value)
+
+    def suggest(self, prefix, limit=TOP_K):
+        if not self.built or time.monotonic() - self.built_at > self.rebuild_interval:
+            self.build()
+        key = ' '.join((prefix or '').lower().replace(',', ' ').split())
+        if not key:
+            return []
+        with self.lock:
+            node = self.root
+            for ch in key:
+                node = node.children.get(ch)
+                if node is None:
+                    return []
+            return [
+                {'label': label, 'type': kind, 'value': value, 'count': count}
+                for count, label, kind, value in self._top(node)[:limit]
+            ]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_autocomplete_index():
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = AutocompleteIndex(getattr(settings, 'PROPERTY_AUTOCOMPLETE_REBUILD_INTERVAL', 300))
+    return _index
+
+
+def reset_autocomplete_index():
+    global _index
+    with _index_lock:
+        _index = None
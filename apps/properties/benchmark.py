@@ -0,0 +1,333 @@
+"""End-to-end request benchmarks for ``perf_bench``.
+
+Each scenario is one URL (or form post) driven through the Django test
+client, so timings cover the full middleware, view, query and template
+stack. Scenarios pick their listings and users from whatever data is
+loaded, ideally a ``perf_seed`` database. Everything runs in one
+transaction that is rolled back, so the create flows leave no rows behind.
+
+Results are per scenario: latency percentiles in milliseconds and the
+number of SQL queries per request. ``compare()`` checks them against a
+saved baseline run.
+
+``wsgi_load()`` and ``asgi_load()`` measure throughput instead: they drive
+Django's WSGI and ASGI handlers directly, ``concurrency`` requests at a
+time, the way a threaded WSGI server or an ASGI event loop would.
+``wsgi_post_load()`` does the same for a form post, to measure concurrent
+write throughput.
+"""
+import asyncio
+import itertools
+import math
+import platform
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client, RequestFactory
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Inquiry, Property, UserInquiryCounter
+from .pagination import InboxPaginator
+
+
+class Scenario:
+    def __init__(self, name, path, params=None, user=None, data=None, expect=200):
+        self.name = name
+        self.path = path
+        self.params = params or {}
+        self.user = user
+        # scenarios with form data are POSTed
+        self.data = data
+        self.expect = expect
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of ``values``."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+@contextmanager
+def count_queries():
+    counter = [0]
+
+    def wrapper(execute, sql, params, many, context):
+        counter[0] += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(wrapper):
+        yield counter
+
+
+def _inbox_cursor(owner, pages):
+    """Cursor ``pages`` pages into ``owner``'s received inbox (or as deep as it goes)."""
+    paginator = InboxPaginator(Inquiry.objects.filter(owner=owner), 20)
+    cursor = None
+    for _ in range(pages):
+        page = paginator.page(cursor)
+        if not page.has_next():
+            break
+        cursor = page.next_cursor
+    return cursor
+
+
+def default_scenarios(inbox_depth=50):
+    """The standard scenario set, built from the data currently in the database."""
+    available = Property.objects.filter(status=Property.AVAILABLE)
+    counter = UserInquiryCounter.objects.select_related('user').order_by('-received').first()
+    agent = counter.user if counter and counter.received else None
+    listing = available.filter(owner=agent).first() if agent else None
+    listing = listing or available.order_by('-created_at').first()
+    if listing is None:
+        raise BenchmarkError('No available properties to benchmark; load data with perf_seed first.')
+    agent = listing.owner
+    buyer = (
+        Inquiry.objects.exclude(user=agent).values('user').annotate(n=Count('pk')).order_by('-n').first()
+    )
+    buyer = buyer and buyer['user']
+    if buyer is None:
+        raise BenchmarkError('No inquiries from a second user to benchmark; load data with perf_seed first.')
+    buyer = type(agent).objects.get(pk=buyer)
+    word = listing.title.split()[0].lower()
+    list_url = reverse('properties:property_list')
+    detail_url = listing.get_absolute_url()
+    inbox_url = reverse('properties:inquiry_list')
+    scenarios = [
+        Scenario('list', list_url),
+        Scenario('list_page_2', list_url, {'page': 2}),
+        Scenario('list_cursor', list_url, {'cursor': ''}),
+        Scenario('list_search', list_url, {'search': word}),
+        Scenario('list_search_relevance', list_url, {'search': word, 'sort': 'relevance'}),
+        Scenario('list_type', list_url, {'property_type': listing.property_type}),
+        Scenario('list_price_range', list_url, {'min_price': 200_000, 'max_price': 600_000}),
+        Scenario('list_bedrooms', list_url, {'bedrooms': 3}),
+        Scenario('list_bathrooms', list_url, {'bathrooms': 2}),
+        Scenario('list_near', list_url, {'near': listing.zipcode, 'radius': 10}),
+    ]
+    scenarios += [
+        Scenario(f'list_sort_{sort}', list_url, {'sort': sort})
+        for sort in ('price_asc', 'price_desc', 'area_asc', 'area_desc', 'oldest')
+    ]
+    scenarios += [
+        Scenario('detail', detail_url),
+        Scenario('detail_owner', detail_url, user=agent),
+        Scenario('detail_buyer', detail_url, user=buyer),
+        Scenario('inbox', inbox_url, user=agent),
+        Scenario('inbox_sent', inbox_url, {'filter': 'sent'}, user=buyer),
+        Scenario('profile', reverse('accounts:profile'), user=agent),
+        Scenario('create_property', reverse('properties:property_create'), user=agent, expect=302, data={
+            'title': 'Benchmark Bungalow', 'description': 'Created by perf_bench.', 'price': '350000',
+            'address': '1 Benchmark Way', 'city': listing.city, 'state': listing.state, 'zipcode': listing.zipcode,
+            'bedrooms': 3, 'bathrooms': '2.0', 'area': 1500, 'property_type': Property.HOUSE,
+            'status': Property.AVAILABLE,
+        }),
+        Scenario('create_inquiry', reverse('properties:inquiry_create', kwargs={'pk': listing.pk}), user=buyer, expect=302, data={
+            'name': 'Bench Buyer', 'email': 'bench@example.com', 'message': 'Is this still available?',
+        }),
+    ]
+    cursor = _inbox_cursor(agent, inbox_depth)
+    if cursor:
+        scenarios.append(Scenario('inbox_deep', inbox_url, {'cursor': cursor}, user=agent))
+    return scenarios
+
+
+class Benchmark:
+    def __init__(self, scenarios, iterations=50, warmup=5, host='localhost'):
+        self.scenarios = scenarios
+        self.iterations = iterations
+        self.warmup = warmup
+        self.host = host
+
+    def request(self, client, scenario):
+        if scenario.data is not None:
+            return client.post(scenario.path, scenario.data)
+        return client.get(scenario.path, scenario.params)
+
+    def run_scenario(self, scenario):
+        client = Client(HTTP_HOST=self.host)
+        if scenario.user is not None:
+            client.force_login(scenario.user)
+        for _ in range(self.warmup):
+            self.request(client, scenario)
+        timings, queries = [], []
+        for _ in range(self.iterations):
+            with count_queries() as counter:
+                started = time.perf_counter()
+                response = self.request(client, scenario)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                elapsed = time.perf_counter() - started
+            if response.status_code != scenario.expect:
+                raise BenchmarkError(
+                    f'{scenario.name}: expected HTTP {scenario.expect}, got {response.status_code}.'
+                )
+            timings.append(elapsed * 1000)
+            queries.append(counter[0])
+        return {
+            'n': len(timings),
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'p99_ms': round(percentile(timings, 99), 3),
+            'mean_ms': round(statistics.fmean(timings), 3),
+            'queries': max(queries),
+        }
+
+    def run(self, progress=None):
+        results = {}
+        # the create flows write rows; roll everything back afterwards
+        with transaction.atomic():
+            for scenario in self.scenarios:
+                results[scenario.name] = self.run_scenario(scenario)
+                if progress:
+                    progress(scenario.name, results[scenario.name])
+            transaction.set_rollback(True)
+        return {
+            'meta': {
+                'created_at': timezone.now().isoformat(),
+                'iterations': self.iterations,
+                'warmup': self.warmup,
+                'python': platform.python_version(),
+                'database': connection.vendor,
+                'properties': Property.objects.count(),
+                'inquiries': Inquiry.objects.count(),
+            },
+            'scenarios': results,
+        }
+
+
+def compare(results, baseline, threshold=1.2):
+    """Per-scenario p95 ratio and query delta against ``baseline``.
+
+    A scenario regresses when its p95 exceeds ``threshold`` times the
+    baseline's or it issues more queries than it did.
+    """
+    comparison = {}
+    for name, current in results['scenarios'].items():
+        before = baseline.get('scenarios', {}).get(name)
+        if before is None:
+            continue
+        ratio = current['p95_ms'] / before['p95_ms'] if before['p95_ms'] else 1.0
+        comparison[name] = {
+            'p95_ratio': round(ratio, 3),
+            'queries_delta': current['queries'] - before['queries'],
+            'regressed': ratio > threshold or current['queries'] > before['queries'],
+        }
+    return comparison
+
+
+def _load_summary(timings, statuses, seconds, concurrency):
+    errors = sum(1 for status in statuses if status >= 400)
+    return {
+        'requests': len(timings),
+        'concurrency': concurrency,
+        'seconds': round(seconds, 3),
+        'requests_per_second': round(len(timings) / seconds, 1) if seconds else None,
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+        'errors': errors,
+    }
+
+
+def _wsgi_serve(handler, environ):
+    status = []
+    started = time.perf_counter()
+    body = handler(environ, lambda line, response_headers, exc_info=None: status.append(line))
+    try:
+        for _ in body:
+            pass
+    finally:
+        body.close()
+    return (time.perf_counter() - started) * 1000, int(status[0].split()[0])
+
+
+def wsgi_load(paths, requests, concurrency, host='localhost', cookie=''):
+    """Serve ``requests`` GETs, cycling through ``paths``, from a pool of ``concurrency`` threads."""
+    handler = WSGIHandler()
+    factory = RequestFactory()
+    headers = {'HTTP_HOST': host, 'HTTP_COOKIE': cookie}
+
+    def serve(path):
+        return _wsgi_serve(handler, factory.get(path, **headers).environ)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(serve, itertools.islice(itertools.cycle(paths), requests)))
+    seconds = time.perf_counter() - started
+    return _load_summary([r[0] for r in results], [r[1] for r in results], seconds, concurrency)
+
+
+def wsgi_post_load(path, data, requests, concurrency, cookies, host='localhost'):
+    """POST ``data`` to ``path`` ``requests`` times from a pool of ``concurrency`` threads.
+
+    ``cookies`` are Cookie headers (one per signed-in user) used in turn; each
+    must carry a ``csrftoken``, which ``data`` repeats as ``csrfmiddlewaretoken``.
+    A redirect is a success; "database is locked" surfaces as a 500.
+    """
+    handler = WSGIHandler()
+    factory = RequestFactory()
+
+    def serve(cookie):
+        return _wsgi_serve(handler, factory.post(path, data, HTTP_HOST=host, HTTP_COOKIE=cookie).environ)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(serve, itertools.islice(itertools.cycle(cookies), requests)))
+    seconds = time.perf_counter() - started
+    return _load_summary([r[0] for r in results], [r[1] for r in results], seconds, concurrency)
+
+
+def asgi_load(paths, requests, concurrency, host='localhost', cookie=''):
+    """Serve ``requests`` GETs, cycling through ``paths``, ``concurrency`` at a time on one event loop."""
+    handler = ASGIHandler()
+    headers = [(b'host', host.encode())]
+    if cookie:
+        headers.append((b'cookie', cookie.encode()))
+
+    async def serve(path):
+        url = urlsplit(path)
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': url.path, 'raw_path': url.path.encode(), 'query_string': url.query.encode(),
+            'root_path': '', 'headers': headers, 'client': ('127.0.0.1', 0), 'server': (host, 80),
+        }
+        status = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+
+        started = time.perf_counter()
+        await handler(scope, receive, send)
+        return (time.perf_counter() - started) * 1000, status[0]
+
+    async def main():
+        queue = itertools.islice(itertools.cycle(paths), requests)
+        results = []
+
+        async def worker():
+            # the islice is shared, so the workers split the requests between them
+            for path in queue:
+                results.append(await serve(path))
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return results
+
+    started = time.perf_counter()
+    results = asyncio.run(main())
+    seconds = time.perf_counter() - started
+    return _load_summary([r[0] for r in results], [r[1] for r in results], seconds, concurrency)
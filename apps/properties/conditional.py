@@ -0,0 +1,147 @@
+"""Conditional GET (ETag / Last-Modified) for the public property pages.
+
+The validators are cheap: the list page reuses the cached per-filter count
+and latest ``updated_at`` from ``counts.py``, and the detail page runs one
+aggregate query. A matching ``If-None-Match`` or ``If-Modified-Since`` is
+answered with 304 before the view runs its page queries or renders a
+template.
+
+The rendered pages carry per-user parts (navbar, owner buttons, prefilled
+inquiry form, flash messages), so the ETag includes the user and responses
+for signed-in users are marked ``private``. Requests with pending flash
+messages skip the validators and always render. The detail page shows
+signed-in buyers a form carrying a CSRF token, so its ETag also covers the
+CSRF secret: a page kept from before a login or token rotation would post
+a stale token.
+
+``conditional_page`` wraps sync and async views alike; for an async view the
+validators (cache and ORM reads) run in one thread hop before the view.
+"""
+import datetime
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.middleware.csrf import get_token
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from .counts import cached_stats
+from .filters import apply_filters, normalize_filters
+from .models import Property, PropertyImage, PropertyInquiryCounter
+from .sharding import scatter
+
+
+def _user_state(request):
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f'user:{user.pk}'
+    return 'anonymous'
+
+
+def _csrf_state(request):
+    # creates the secret the page will render when the request has none yet
+    get_token(request)
+    # the unmasked secret; get_token's return value is masked afresh on every call
+    return request.META['CSRF_COOKIE']
+
+
+def _etag(*parts):
+    # bump PROPERTY_PAGE_ETAG_VERSION when a deploy changes the templates
+    version = getattr(settings, 'PROPERTY_PAGE_ETAG_VERSION', '1')
+    return hashlib.md5(repr((version,) + parts).encode()).hexdigest()
+
+
+def list_validators(request):
+    filters = normalize_filters(request.GET)
+    # shares its cache entry with the list view's result count
+    stats = cached_stats(filters, scatter(apply_filters(Property.objects.filter(status=Property.AVAILABLE), filters)))
+    params = sorted((key, tuple(values)) for key, values in request.GET.lists())
+    etag = _etag('list', _user_state(request), params, stats['count'], stats['last_modified'])
+    return etag, stats['last_modified']
+
+
+def detail_validators(request, pk):
+    images = PropertyImage.objects.filter(property=OuterRef('pk')).order_by().values('property')
+    unread = PropertyInquiryCounter.objects.filter(property=OuterRef('pk')).values('unread')
+    row = (
+        Property.objects.filter(pk=pk)
+        .annotate(
+            image_count=Coalesce(Subquery(images.annotate(n=Count('pk')).values('n')), 0),
+            images_updated=Subquery(images.annotate(latest=Max('uploaded_at')).values('latest')),
+            unread_count=Coalesce(Subquery(unread), 0),
+        )
+        .values_list('updated_at', 'owner_id', 'image_count', 'images_updated', 'unread_count')
+        .first()
+    )
+    if row is None:
+        # let the view raise its usual 404
+        return None, None
+    updated_at, owner_id, image_count, images_updated, unread_count = row
+    user_state = _user_state(request)
+    # only the owner sees the unread badge
+    is_owner = user_state == f'user:{owner_id}'
+    inquiry_state = unread_count if is_owner else None
+    # the inquiry form, and its CSRF token, is shown to signed-in users other than the owner
+    csrf_state = _csrf_state(request) if request.user.is_authenticated and not is_owner else None
+    etag = _etag('detail', user_state, updated_at, image_count, images_updated, inquiry_state, csrf_state)
+    last_modified = max(filter(None, (updated_at, images_updated)))
+    return etag, last_modified
+
+
+def conditional_page(validators):
+    """Decorate a view so ``validators(request, *args, **kwargs)`` can short-circuit it with 304.
+
+    Behaves like ``django.views.decorators.http.condition`` with both
+    validators computed by one call.
+    """
+    def page_state(request, *args, **kwargs):
+        # evaluating request.user loads the session and user rows
+        signed_in = request.user.is_authenticated
+        if len(get_messages(request)):
+            return None, None, signed_in
+        etag, last_modified = validators(request, *args, **kwargs)
+        if last_modified is not None:
+            if not timezone.is_aware(last_modified):
+                last_modified = timezone.make_aware(last_modified, datetime.timezone.utc)
+            last_modified = int(last_modified.timestamp())
+        return quote_etag(etag) if etag else None, last_modified, signed_in
+
+    def finish(request, response, etag, last_modified, signed_in):
+        if request.method in ('GET', 'HEAD'):
+            if last_modified and not response.has_header('Last-Modified'):
+                response.headers['Last-Modified'] = http_date(last_modified)
+            if etag:
+                response.headers.setdefault('ETag', etag)
+        patch_vary_headers(response, ('Cookie',))
+        if signed_in:
+            patch_cache_control(response, private=True, max_age=0, must_revalidate=True)
+        else:
+            patch_cache_control(response, max_age=0, must_revalidate=True)
+        return response
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                etag, last_modified, signed_in = await sync_to_async(page_state)(request, *args, **kwargs)
+                response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                return finish(request, response, etag, last_modified, signed_in)
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            etag, last_modified, signed_in = page_state(request, *args, **kwargs)
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            return finish(request, response, etag, last_modified, signed_in)
+        return wrapper
+    return decorator
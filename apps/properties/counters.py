@@ -0,0 +1,149 @@
+"""Denormalized inquiry counts for dashboards.
+
+``UserInquiryCounter`` holds each user's received, unread and sent totals
+and ``PropertyInquiryCounter`` each listing's unread total, so the inbox,
+profile and detail pages read a single row instead of counting inquiries.
+
+The signals in ``signals.py`` apply every create, read/unread change and
+delete as an ``F()`` increment in the same transaction as the write, and
+move a listing's counts when its owner changes. ``QuerySet.update()`` bypasses
+them; change ``is_read`` in bulk with ``mark_read()`` instead.
+``reconcile_inquiry_counters`` recomputes everything from the inquiries.
+"""
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, router, transaction
+from django.db.models import Count, F, Q
+
+from .models import Inquiry, PropertyInquiryCounter, UserInquiryCounter
+from .sharding import listing_databases, shard_for_pk, use_shard
+
+
+def _apply(model, pk, **deltas):
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if pk is None or not deltas:
+        return
+    updates = {field: F(field) + delta for field, delta in deltas.items()}
+    if model.objects.filter(pk=pk).update(**updates):
+        return
+    # a missing row is only created for increments: a decrement can come from
+    # a cascade deleting the row's user or listing in this same transaction
+    if any(delta < 0 for delta in deltas.values()):
+        return
+    try:
+        with transaction.atomic(using=router.db_for_write(model)):
+            model.objects.create(pk=pk, **deltas)
+    except IntegrityError:
+        # another transaction created it first
+        model.objects.filter(pk=pk).update(**updates)
+
+
+def inquiry_created(inquiry):
+    unread = 0 if inquiry.is_read else 1
+    _apply(UserInquiryCounter, inquiry.owner_id, received=1, unread=unread)
+    _apply(UserInquiryCounter, inquiry.user_id, sent=1)
+    _apply(PropertyInquiryCounter, inquiry.related_property_id, unread=unread)
+
+
+def inquiry_deleted(inquiry):
+    unread = 0 if inquiry.is_read else -1
+    _apply(UserInquiryCounter, inquiry.owner_id, received=-1, unread=unread)
+    _apply(UserInquiryCounter, inquiry.user_id, sent=-1)
+    _apply(PropertyInquiryCounter, inquiry.related_property_id, unread=unread)
+
+
+def read_changed(inquiry):
+    delta = -1 if inquiry.is_read else 1
+    _apply(UserInquiryCounter, inquiry.owner_id, unread=delta)
+    _apply(PropertyInquiryCounter, inquiry.related_property_id, unread=delta)
+
+
+def owner_changed(property_id, old_owner_id, new_owner_id):
+    """Move a listing's received and unread counts to its new owner."""
+    totals = Inquiry.objects.filter(related_property_id=property_id).aggregate(
+        received=Count('pk'), unread=Count('pk', filter=Q(is_read=False)),
+    )
+    _apply(UserInquiryCounter, old_owner_id, received=-totals['received'], unread=-totals['unread'])
+    _apply(UserInquiryCounter, new_owner_id, received=totals['received'], unread=totals['unread'])
+
+
+def mark_read(queryset, is_read=True):
+    """Set ``is_read`` on every inquiry in ``queryset``, keeping the counters in step."""
+    delta = -1 if is_read else 1
+    by_database = {}
+    for pk in queryset.filter(is_read=not is_read).values_list('pk', flat=True):
+        by_database.setdefault(shard_for_pk(pk), []).append(pk)
+    updated = 0
+    for alias, pks in by_database.items():
+        # inquiries and listing counters live on the inquiries' database, user counters on default
+        with transaction.atomic(using=alias), transaction.atomic(), use_shard(alias):
+            changing = Inquiry.objects.using(alias).filter(pk__in=pks, is_read=not is_read)
+            per_owner = list(changing.order_by().values_list('owner').annotate(n=Count('pk')))
+            per_property = list(changing.order_by().values_list('related_property').annotate(n=Count('pk')))
+            updated += changing.update(is_read=is_read)
+            for owner_id, n in per_owner:
+                _apply(UserInquiryCounter, owner_id, unread=delta * n)
+            for property_id, n in per_property:
+                _apply(PropertyInquiryCounter, property_id, unread=delta * n)
+    return updated
+
+
+def user_counts(user):
+    """The user's counter row; an unsaved all-zero one if they have none yet."""
+    if not user.is_authenticated:
+        return UserInquiryCounter()
+    return UserInquiryCounter.objects.filter(user=user).first() or UserInquiryCounter(user=user)
+
+
+def property_unread(property_id):
+    return PropertyInquiryCounter.objects.filter(property_id=property_id).values_list('unread', flat=True).first() or 0
+
+
+def _sync(model, fields, expected, dry_run, using=DEFAULT_DB_ALIAS):
+    """Make ``model`` rows on ``using`` match ``expected`` ({pk: {field: value}}); returns rows fixed."""
+    zero = dict.fromkeys(fields, 0)
+    existing = {row.pk: row for row in model.objects.using(using).all()}
+    changed, missing = [], []
+    for pk in existing.keys() | expected.keys():
+        values = expected.get(pk, zero)
+        row = existing.get(pk)
+        if row is None:
+            if any(values.values()):
+                missing.append(model(pk=pk, **values))
+        elif any(getattr(row, field) != values[field] for field in fields):
+            for field in fields:
+                setattr(row, field, values[field])
+            changed.append(row)
+    if not dry_run:
+        model.objects.using(using).bulk_update(changed, fields, batch_size=500)
+        model.objects.using(using).bulk_create(missing, batch_size=500)
+    return len(changed) + len(missing)
+
+
+def reconcile(dry_run=False):
+    """Recompute every counter from the inquiries; returns ``(users, properties)`` rows fixed.
+
+    User totals add up the inquiries on every listing database; each listing's
+    unread counter is fixed on the database holding the listing.
+    """
+    unread = Count('pk', filter=Q(is_read=False))
+    users, properties = {}, {}
+    for alias in listing_databases():
+        inquiries = Inquiry.objects.using(alias).order_by()
+        for owner_id, received, owner_unread in (
+            inquiries.values_list('owner').annotate(received=Count('pk'), unread=unread)
+        ):
+            totals = users.setdefault(owner_id, {'received': 0, 'unread': 0, 'sent': 0})
+            totals['received'] += received
+            totals['unread'] += owner_unread
+        for user_id, sent in inquiries.values_list('user').annotate(sent=Count('pk')):
+            users.setdefault(user_id, {'received': 0, 'unread': 0, 'sent': 0})['sent'] += sent
+        properties[alias] = {
+            property_id: {'unread': n}
+            for property_id, n in inquiries.filter(is_read=False).values_list('related_property').annotate(n=Count('pk'))
+        }
+    with transaction.atomic():
+        fixed_users = _sync(UserInquiryCounter, ['received', 'unread', 'sent'], users, dry_run)
+    fixed_properties = 0
+    for alias, expected in properties.items():
+        with transaction.atomic(using=alias):
+            fixed_properties += _sync(PropertyInquiryCounter, ['unread'], expected, dry_run, using=alias)
+    return fixed_users, fixed_properties
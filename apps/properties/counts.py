@@ -0,0 +1,84 @@
+"""Cached result counts for property list searches.
+
+Each entry holds the row count and latest ``updated_at`` for one filter set;
+the list view reads the count and the conditional-GET validators read both.
+Counts are stored in the default cache under a key built from a global
+version number and the normalized filter tuple. Saving or deleting any
+``Property`` bumps the version (see ``signals.py``), which orphans every
+cached count at once instead of trying to work out which filters a change
+affects. Bulk ``QuerySet.update()`` calls bypass the signals; call
+``bump_count_version()`` after them.
+
+With several worker processes the default cache must be shared (Redis,
+Memcached, database) so every worker sees each version bump.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+
+VERSION_KEY = 'properties:count-version'
+COUNT_TIMEOUT = getattr(settings, 'PROPERTY_COUNT_CACHE_TIMEOUT', 60 * 60)
+
+
+def get_count_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # seed from the clock so an evicted version never rewinds onto stale entries
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        version = cache.get(VERSION_KEY, 0)
+    return version
+
+
+async def aget_count_version():
+    version = await cache.aget(VERSION_KEY)
+    if version is None:
+        await cache.aadd(VERSION_KEY, time.time_ns(), None)
+        version = await cache.aget(VERSION_KEY, 0)
+    return version
+
+
+def bump_count_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, time.time_ns(), None)
+
+
+def count_cache_key(filters, version=None):
+    if version is None:
+        version = get_count_version()
+    digest = hashlib.md5(repr(tuple(filters)).encode()).hexdigest()
+    return f'properties:count:{version}:{digest}'
+
+
+def cached_stats(filters, queryset):
+    """Return ``{'count', 'last_modified'}`` for ``queryset``, cached per filter tuple."""
+    key = count_cache_key(filters)
+    stats = cache.get(key)
+    if stats is None:
+        stats = queryset.order_by().aggregate(count=Count('pk'), last_modified=Max('updated_at'))
+        cache.set(key, stats, COUNT_TIMEOUT)
+    return stats
+
+
+async def acached_stats(filters, queryset):
+    """``cached_stats()`` for async views, through the async cache and ORM APIs."""
+    key = count_cache_key(filters, await aget_count_version())
+    stats = await cache.aget(key)
+    if stats is None:
+        stats = await queryset.order_by().aaggregate(count=Count('pk'), last_modified=Max('updated_at'))
+        await cache.aset(key, stats, COUNT_TIMEOUT)
+    return stats
+
+
+def cached_count(filters, queryset):
+    """Return ``queryset.count()``, cached per filter tuple until the next change."""
+    return cached_stats(filters, queryset)['count']
+
+
+async def acached_count(filters, queryset):
+    return (await acached_stats(filters, queryset))['count']
@@ -0,0 +1,88 @@
+"""Hourly and daily inquiry digests for agents.
+
+Owners whose profile ``digest_mode`` is ``HOURLY`` or ``DAILY`` get no email
+per inquiry; ``send_inquiry_digests`` (run from cron) instead sends each of
+them one message listing every inquiry they have not been notified about.
+The pending inquiries of all owners are loaded in one query ordered by
+owner, and all digests of a run go out over a single mail connection.
+"""
+from itertools import groupby
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.accounts.models import UserProfile
+
+from .models import Inquiry
+from .sharding import scatter, shard_aliases, shard_for_pk, with_users
+
+
+def pending_inquiries(frequency):
+    """Unnotified inquiries of every owner on ``frequency``, grouped by owner."""
+    if not shard_aliases():
+        return (
+            Inquiry.objects.filter(notified_at__isnull=True, owner__profile__digest_mode=frequency)
+            .select_related('related_property', 'owner')
+            .order_by('owner_id', 'created_at', 'pk')
+        )
+    # profiles live on default and cannot be joined from a shard
+    owners = list(UserProfile.objects.filter(digest_mode=frequency).values_list('user_id', flat=True))
+    queryset = with_users(Inquiry.objects.filter(notified_at__isnull=True, owner_id__in=owners), 'owner')
+    return scatter(queryset.select_related('related_property').order_by('owner_id', 'created_at', 'pk'))
+
+
+def mark_notified(ids):
+    # inquiries are marked on the database their pk was allocated from
+    for alias, group in groupby(sorted(ids, key=shard_for_pk), key=shard_for_pk):
+        Inquiry.objects.using(alias).filter(pk__in=list(group)).update(notified_at=timezone.now())
+
+
+def build_digest(owner, inquiries, connection=None):
+    site_url = getattr(settings, 'SITE_URL', '').rstrip('/')
+    subject = f"{len(inquiries)} new inquir{'y' if len(inquiries) == 1 else 'ies'} on your listings"
+    body = render_to_string('properties/email/inquiry_digest.txt', {
+        'owner': owner,
+        'inquiries': inquiries,
+        'inbox_url': site_url + reverse('properties:inquiry_list'),
+        'site_url': site_url,
+    })
+    from_email = getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@realestate.com')
+    return EmailMessage(subject, body, from_email, [owner.email], connection=connection)
+
+
+def send_digests(frequency, batch_size=100, dry_run=False):
+    """Send the ``frequency`` digests; returns ``(digests, inquiries)`` counts."""
+    # a run covers at most a day of inquiries, so the list fits in memory, and
+    # SQLite must not be written to while a cursor over the same rows is open
+    pending = list(pending_inquiries(frequency))
+    digests = covered = 0
+    messages, ids = [], []
+    connection = get_connection()
+
+    def flush():
+        nonlocal digests, covered
+        if messages and not dry_run:
+            connection.send_messages(messages)
+        if ids and not dry_run:
+            # marked per batch, so a relay failure only resends its own batch
+            mark_notified(ids)
+        digests += len(messages)
+        covered += len(ids)
+        messages.clear()
+        ids.clear()
+
+    with connection:
+        for _owner_id, group in groupby(pending, key=lambda inquiry: inquiry.owner_id):
+            inquiries = list(group)
+            owner = inquiries[0].owner
+            # owners without an address are marked too, or they would pile up
+            ids.extend(inquiry.pk for inquiry in inquiries)
+            if owner.email:
+                messages.append(build_digest(owner, inquiries, connection))
+            if len(messages) >= batch_size:
+                flush()
+        flush()
+    return digests, covered
@@ -0,0 +1,118 @@
+"""Streaming listings feed for syndication partners.
+
+``/api/listings/`` accepts the same filters and sorts as the list page and
+streams every matching AVAILABLE property as NDJSON (one object per line) or
+as a single JSON document. Rows are read with ``values()`` and
+``iterator(chunk_size=...)`` so only the feed columns are loaded and memory
+stays flat however many listings match.
+
+Every row carries a ``cursor``; passing it back as ``?cursor=`` resumes the
+feed right after that row using the same keyset seek as the list page.
+
+With sharding on, each listing database streams its rows in the feed order
+and the streams are merged, so memory still stays flat.
+"""
+import heapq
+import itertools
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.urls import reverse
+
+from .filters import apply_filters
+from .models import Property
+from .sharding import shard_aliases
+from .pagination import (
+    NEXT, SORT_KEYS, InvalidCursor, decode_cursor, encode_cursor, get_ordering,
+    get_sort_key, seek_filter, serialize_key,
+)
+
+
+FEED_FIELDS = (
+    'id', 'title', 'description', 'price', 'property_type', 'address', 'city', 'state',
+    'zipcode', 'latitude', 'longitude', 'bedrooms', 'bathrooms', 'area', 'featured_image',
+    'created_at', 'updated_at',
+)
+
+NDJSON = 'ndjson'
+JSON = 'json'
+
+
+def feed_sort(sort):
+    # relevance has no column to seek on, so the feed falls back to newest first
+    return sort if sort in SORT_KEYS else ''
+
+
+def feed_queryset(filters, sort='', cursor=None):
+    """AVAILABLE listings matching ``filters`` as feed rows, resumed after ``cursor``."""
+    queryset = apply_filters(Property.objects.filter(status=Property.AVAILABLE), filters)
+    field_name, descending = get_sort_key(sort)
+    if cursor:
+        cursor_sort, raw_value, pk, direction = decode_cursor(cursor)
+        if cursor_sort != sort or direction != NEXT:
+            raise InvalidCursor('Cursor does not match the current sort order.')
+        try:
+            value = Property._meta.get_field(field_name).to_python(raw_value)
+        except ValidationError as exc:
+            raise InvalidCursor('Malformed cursor value.') from exc
+        queryset = queryset.filter(seek_filter(field_name, descending, value, pk))
+    fields = list(FEED_FIELDS)
+    if filters.center is not None:
+        fields.append('distance')
+    return queryset.order_by(*get_ordering(sort)).values(*fields)
+
+
+def iter_rows(queryset, sort='', limit=None, chunk_size=500):
+    """Stream the rows of ``queryset``, merged in ``sort`` order from every listing database."""
+    if limit is not None:
+        queryset = queryset[:limit]
+    if not shard_aliases():
+        return queryset.iterator(chunk_size=chunk_size)
+    field_name, descending = get_sort_key(sort)
+    # default is left to the routers, so its reads can use a replica
+    streams = [queryset, *(queryset.using(alias) for alias in shard_aliases())]
+    merged = heapq.merge(
+        *(stream.iterator(chunk_size=chunk_size) for stream in streams),
+        key=lambda row: (row[field_name], row['id']), reverse=descending,
+    )
+    return itertools.islice(merged, limit)
+
+
+def iter_listings(queryset, request, sort='', limit=None, chunk_size=500):
+    """Yield feed rows with their absolute ``url`` and resumption ``cursor``."""
+    field_name, _descending = get_sort_key(sort)
+    image_storage = Property._meta.get_field('featured_image').storage
+    for row in iter_rows(queryset, sort, limit, chunk_size):
+        row['url'] = request.build_absolute_uri(reverse('properties:property_detail', args=[row['id']]))
+        if row['featured_image']:
+            row['featured_image'] = request.build_absolute_uri(image_storage.url(row['featured_image']))
+        else:
+            row['featured_image'] = None
+        if 'distance' in row:
+            row['distance'] = round(row['distance'], 2)
+        row['cursor'] = encode_cursor(sort, serialize_key(row[field_name]), row['id'], NEXT)
+        yield row
+
+
+def _dumps(value):
+    return json.dumps(value, cls=DjangoJSONEncoder, separators=(',', ':'))
+
+
+def stream_ndjson(rows):
+    for row in rows:
+        yield _dumps(row) + '\n'
+
+
+def stream_json(rows, limit=None):
+    """Stream ``{"results": [...], "next_cursor": ...}`` one row at a time."""
+    yield '{"results":['
+    count = 0
+    last_cursor = None
+    for row in rows:
+        yield (',' if count else '') + _dumps(row)
+        count += 1
+        last_cursor = row['cursor']
+    # a full page may have more rows behind it
+    next_cursor = last_cursor if limit is not None and count == limit else None
+    yield '],"next_cursor":' + _dumps(next_cursor) + '}'
@@ -0,0 +1,111 @@
+"""Parsing and applying the property list filters.
+
+The list view, its result-count cache and anything else that accepts the
+``PropertySearchFilterForm`` parameters go through ``normalize_filters`` so
+equivalent requests (``?bedrooms=03`` vs ``?bedrooms=3``) share one key.
+"""
+import math
+from collections import namedtuple
+from decimal import Decimal, InvalidOperation
+
+from .geo import filter_bbox, filter_radius, geocode_zipcode
+from .search import get_search_backend
+
+
+FILTER_FIELDS = (
+    'search', 'property_type', 'min_price', 'max_price', 'bedrooms', 'bathrooms',
+    'center', 'radius', 'bbox',
+)
+
+MAX_RADIUS_MILES = 500
+
+PropertyFilters = namedtuple('PropertyFilters', FILTER_FIELDS)
+
+
+def _decimal(value):
+    try:
+        number = Decimal(value)
+    except (InvalidOperation, TypeError, ValueError):
+        return None
+    return number.normalize() if number.is_finite() else None
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _float(value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def _center(params):
+    lat, lng = _float(params.get('lat')), _float(params.get('lng'))
+    if lat is not None and lng is not None and -90 <= lat <= 90 and -180 <= lng <= 180:
+        return (round(lat, 6), round(lng, 6))
+    if params.get('near'):
+        return geocode_zipcode(params.get('near'))
+    return None
+
+
+def _bbox(value):
+    # south,west,north,east in degrees
+    parts = [_float(part) for part in (value or '').split(',')]
+    if len(parts) != 4 or None in parts:
+        return None
+    south, west, north, east = parts
+    if not (-90 <= south <= north <= 90 and -180 <= west <= 180 and -180 <= east <= 180):
+        return None
+    return tuple(round(part, 6) for part in parts)
+
+
+def normalize_filters(params):
+    """Build a hashable ``PropertyFilters`` tuple from GET-style params.
+
+    Blank or unparsable values become ``None`` and are ignored when filtering,
+    matching the list view's long-standing lenient behaviour.
+    """
+    search = (params.get('search') or '').strip().lower() or None
+    property_type = (params.get('property_type') or '').strip() or None
+    center = _center(params)
+    radius = _float(params.get('radius')) if center else None
+    if radius is not None and not 0 < radius <= MAX_RADIUS_MILES:
+        radius = None
+    return PropertyFilters(
+        search=search,
+        property_type=property_type,
+        min_price=_decimal(params.get('min_price') or None),
+        max_price=_decimal(params.get('max_price') or None),
+        bedrooms=_int(params.get('bedrooms') or None),
+        bathrooms=_decimal(params.get('bathrooms') or None),
+        center=center if radius is not None else None,
+        radius=radius,
+        bbox=_bbox(params.get('bbox')),
+    )
+
+
+def apply_filters(queryset, filters, rank=False):
+    """Filter ``queryset``; with ``rank`` a search also annotates ``search_rank``."""
+    if filters.search:
+        queryset = get_search_backend().search(queryset, filters.search, rank=rank)
+    if filters.property_type:
+        queryset = queryset.filter(property_type=filters.property_type)
+    if filters.min_price is not None:
+        queryset = queryset.filter(price__gte=filters.min_price)
+    if filters.max_price is not None:
+        queryset = queryset.filter(price__lte=filters.max_price)
+    if filters.bedrooms is not None:
+        queryset = queryset.filter(bedrooms__gte=filters.bedrooms)
+    if filters.bathrooms is not None:
+        queryset = queryset.filter(bathrooms__gte=filters.bathrooms)
+    if filters.center is not None:
+        queryset = filter_radius(queryset, *filters.center, filters.radius)
+    if filters.bbox is not None:
+        queryset = filter_bbox(queryset, *filters.bbox)
+    return queryset
@@ -45,6 +45,12 @@ class PropertyForm(forms.ModelForm):
             'price': 'Enter price in USD',
         }
 
+    def save(self, commit=True):
+        if 'zipcode' in self.changed_data:
+            # re-geocode from the new zipcode on save
+            self.instance.latitude = self.instance.longitude = None
+        return super().save(commit=commit)
+
 
 class PropertyImageForm(forms.ModelForm):
     class Meta:
@@ -60,7 +66,7 @@ class PropertySearchFilterForm(forms.Form):
     search = forms.CharField(
         required=False,
         max_length=100,
-        widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Search by city or state...'}),
+        widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Search by keyword, city or state...'}),
         label='Location Search',
     )
     property_type = forms.ChoiceField(
@@ -95,8 +101,29 @@ class PropertySearchFilterForm(forms.Form):
         widget=forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Any', 'min': '0', 'step': '0.5'}),
         label='Min Bathrooms',
     )
+    near = forms.CharField(
+        required=False,
+        max_length=10,
+        widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'ZIP code'}),
+        label='Near ZIP',
+    )
+    RADIUS_CHOICES = [
+        ('', 'Any distance'),
+        ('5', 'Within 5 miles'),
+        ('10', 'Within 10 miles'),
+        ('25', 'Within 25 miles'),
+        ('50', 'Within 50 miles'),
+        ('100', 'Within 100 miles'),
+    ]
+    radius = forms.ChoiceField(
+        required=False,
+        choices=RADIUS_CHOICES,
+        widget=forms.Select(attrs={'class': 'form-control'}),
+        label='Distance',
+    )
     SORT_CHOICES = [
         ('', 'Newest First'),
+        ('relevance', 'Best Match'),
         ('price_asc', 'Price: Low to High'),
         ('price_desc', 'Price: High to Low'),
         ('area_asc', 'Area: Small to Large'),
@@ -141,7 +168,7 @@ class InquiryForm(forms.ModelForm):
                 if not self.initial.get('email'):
                     self.initial['email'] = user.email
                 # try to prefill phone from profile if available
-                profile = getattr(user, 'userprofile', None)
+                profile = getattr(user, 'profile', None)
                 if profile and getattr(profile, 'phone', None) and not self.initial.get('phone'):
                     self.initial['phone'] = profile.phone
         except Exception:
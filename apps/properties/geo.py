@@ -0,0 +1,203 @@
+"""Offline geocoding and geohash-pruned radius/bounding-box search.
+
+Properties get ``latitude``/``longitude`` from a zipcode-centroid table
+(``data/zip_centroids.csv`` by default; point ``PROPERTY_ZIP_CENTROIDS`` at a
+full gazetteer CSV with ``zipcode,latitude,longitude`` columns for complete
+coverage) and a precision-12 ``geohash`` derived from those coordinates.
+
+Spatial filters first restrict the query to the handful of geohash cells
+covering the search area, as index range scans on ``geohash``, and only then
+apply the exact latitude/longitude bounds and great-circle distance to the
+surviving rows.
+"""
+import csv
+import math
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import ASin, Cos, Power, Radians, Sin, Sqrt
+
+
+EARTH_RADIUS_MILES = 3958.8
+MILES_PER_DEGREE_LAT = 69.0
+GEOHASH_PRECISION = 12
+# stop refining once this many cells would be needed to cover the search area
+MAX_CELLS = 24
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+# sorts after every geohash character, so [prefix, prefix + CELL_END) is one cell
+CELL_END = '{'
+
+DEFAULT_CENTROIDS = Path(__file__).resolve().parent / 'data' / 'zip_centroids.csv'
+
+
+def normalize_zipcode(zipcode):
+    digits = ''.join(ch for ch in str(zipcode or '') if ch.isdigit())[:5]
+    return digits.zfill(5) if digits else ''
+
+
+@lru_cache(maxsize=1)
+def load_zip_centroids():
+    path = getattr(settings, 'PROPERTY_ZIP_CENTROIDS', None) or DEFAULT_CENTROIDS
+    centroids = {}
+    with open(path, newline='') as handle:
+        for row in csv.DictReader(handle):
+            try:
+                centroids[normalize_zipcode(row['zipcode'])] = (float(row['latitude']), float(row['longitude']))
+            except (KeyError, TypeError, ValueError):
+                continue
+    return centroids
+
+
+def geocode_zipcode(zipcode):
+    """Return ``(latitude, longitude)`` for a zipcode centroid, or ``None``."""
+    return load_zip_centroids().get(normalize_zipcode(zipcode))
+
+
+def geohash_encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < precision:
+        rng, value = (lng_range, longitude) if even else (lat_range, latitude)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            rng[0] = mid
+        else:
+            bits <<= 1
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(BASE32[bits])
+            bits, bit_count = 0, 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """Return ``(height, width)`` in degrees of a geohash cell."""
+    total = 5 * precision
+    lng_bits = (total + 1) // 2
+    lat_bits = total // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lng_bits)
+
+
+def _steps(start, stop, step):
+    value = start
+    while value < stop:
+        yield value
+        value += step
+    yield stop
+
+
+def covering_cells(south, west, north, east):
+    """Geohash prefixes covering the box at the finest precision within ``MAX_CELLS``.
+
+    Returns ``None`` when the box is too large to prune usefully.
+    """
+    if west > east:
+        # box crosses the antimeridian
+        left = covering_cells(south, west, north, 180.0)
+        right = covering_cells(south, -180.0, north, east)
+        if left is None or right is None:
+            return None
+        return left | right
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        estimate = (math.ceil((north - south) / height) + 1) * (math.ceil((east - west) / width) + 1)
+        if estimate > MAX_CELLS:
+            continue
+        return {
+            geohash_encode(lat, lng, precision)
+            for lat in _steps(south, north, height)
+            for lng in _steps(west, east, width)
+        }
+    return None
+
+
+def cells_q(cells):
+    query = Q()
+    for cell in sorted(cells):
+        query |= Q(geohash__gte=cell, geohash__lt=cell + CELL_END)
+    return query
+
+
+def radius_bbox(latitude, longitude, miles):
+    lat_delta = miles / MILES_PER_DEGREE_LAT
+    cos_lat = max(math.cos(math.radians(latitude)), 1e-6)
+    lng_delta = min(miles / (MILES_PER_DEGREE_LAT * cos_lat), 180.0)
+    south, north = max(latitude - lat_delta, -90.0), min(latitude + lat_delta, 90.0)
+    west, east = longitude - lng_delta, longitude + lng_delta
+    if west < -180.0:
+        west += 360.0
+    if east > 180.0:
+        east -= 360.0
+    return south, west, north, east
+
+
+def bbox_q(south, west, north, east):
+    query = Q(latitude__gte=south, latitude__lte=north)
+    if west > east:
+        return query & (Q(longitude__gte=west) | Q(longitude__lte=east))
+    return query & Q(longitude__gte=west, longitude__lte=east)
+
+
+def distance_expression(latitude, longitude):
+    """Haversine distance in miles from the given point to each row."""
+    lat1, lng1 = math.radians(latitude), math.radians(longitude)
+    lat2, lng2 = Radians(F('latitude')), Radians(F('longitude'))
+    a = (
+        Power(Sin((lat2 - lat1) / 2), 2)
+        + math.cos(lat1) * Cos(lat2) * Power(Sin((lng2 - lng1) / 2), 2)
+    )
+    return 2 * EARTH_RADIUS_MILES * ASin(Sqrt(a), output_field=FloatField())
+
+
+def filter_bbox(queryset, south, west, north, east):
+    cells = covering_cells(south, west, north, east)
+    if cells is not None:
+        queryset = queryset.filter(cells_q(cells))
+    return queryset.filter(bbox_q(south, west, north, east))
+
+
+def filter_radius(queryset, latitude, longitude, miles):
+    """Rows within ``miles`` of the point, annotated with ``distance``."""
+    queryset = filter_bbox(queryset, *radius_bbox(latitude, longitude, miles))
+    return queryset.annotate(distance=distance_expression(latitude, longitude)).filter(distance__lte=miles)
+
+
+def assign_coordinates(instance, overwrite=False):
+    """Fill coordinates from the zipcode centroid and refresh the geohash.
+
+    Returns ``True`` when the instance has coordinates afterwards.
+    """
+    if overwrite or instance.latitude is None or instance.longitude is None:
+        point = geocode_zipcode(instance.zipcode)
+        if point is not None:
+            instance.latitude, instance.longitude = point
+    if instance.latitude is None or instance.longitude is None:
+        instance.geohash = ''
+        return False
+    instance.geohash = geohash_encode(float(instance.latitude), float(instance.longitude))
+    return True
+
+
+def geocode_properties(queryset, overwrite=False, batch_size=1000):
+    """Bulk geocode ``queryset`` with ``bulk_update``; returns ``(updated, missing)``."""
+    updated = missing = 0
+    batch = []
+    fields = ['latitude', 'longitude', 'geohash']
+    for instance in queryset.only('pk', 'zipcode', *fields).iterator(chunk_size=batch_size):
+        if assign_coordinates(instance, overwrite=overwrite):
+            batch.append(instance)
+            updated += 1
+        else:
+            missing += 1
+        if len(batch) >= batch_size:
+            queryset.model.objects.bulk_update(batch, fields)
+            batch = []
+    if batch:
+        queryset.model.objects.bulk_update(batch, fields)
+    return updated, missing
@@ -0,0 +1,371 @@
+"""Bulk property import from CSV and JSON feeds.
+
+Feeds are parsed as a stream (CSV, NDJSON, or a top-level JSON array read one
+object at a time), validated against the ``Property`` field rules in a pool
+of worker processes, and written with ``bulk_create`` in one transaction per
+batch. A bad row is reported and skipped; it never aborts its batch.
+
+``bulk_create`` skips the Property signals, so the importer geocodes rows
+itself, indexes them for full-text search after each batch and bumps the
+result-count version when it finishes. Web workers pick up the new rows in
+their listing index and autocomplete trie on their next periodic check.
+
+Sync mode (``--sync``) matches rows on ``external_id`` and compares a hash of
+each row's feed values with the stored ``content_hash`` in bulk, so a daily
+re-import only inserts new listings, ``bulk_update``s changed ones and marks
+listings that left the feed as sold; unchanged rows keep their
+``updated_at`` and every cache keyed on it.
+"""
+import csv
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+from collections import Counter, namedtuple
+from decimal import Decimal
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import django
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, connections, transaction
+from django.utils import timezone
+
+from .counts import bump_count_version
+from .geo import assign_coordinates
+from .models import Property
+from .search import get_search_backend
+
+
+CSV = 'csv'
+NDJSON = 'ndjson'
+JSON = 'json'
+FORMATS = {'.csv': CSV, '.ndjson': NDJSON, '.jsonl': NDJSON, '.json': JSON}
+
+IMPORT_FIELDS = (
+    'title', 'description', 'price', 'address', 'city', 'state', 'zipcode', 'latitude',
+    'longitude', 'bedrooms', 'bathrooms', 'area', 'property_type', 'status',
+)
+CHOICE_FIELDS = ('property_type', 'status')
+UPDATE_FIELDS = IMPORT_FIELDS + ('geohash', 'owner', 'external_id', 'content_hash', 'updated_at')
+
+RowError = namedtuple('RowError', 'line message')
+ImportResult = namedtuple('ImportResult', 'created updated unchanged transitioned errors seconds')
+
+
+def detect_format(path):
+    for suffix, feed_format in FORMATS.items():
+        if str(path).lower().endswith(suffix):
+            return feed_format
+    return CSV
+
+
+def iter_json_array(handle, buffer_size=64 * 1024):
+    """Yield the objects of a top-level JSON array without loading the whole file."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = False
+    eof = False
+    while True:
+        buffer = buffer.lstrip()
+        if not started:
+            if buffer:
+                if buffer[0] != '[':
+                    raise ValueError('JSON feeds must be a top-level array of objects.')
+                buffer = buffer[1:]
+                started = True
+                continue
+        elif buffer.startswith(']'):
+            return
+        elif buffer.startswith(','):
+            buffer = buffer[1:]
+            continue
+        elif buffer:
+            try:
+                obj, end = decoder.raw_decode(buffer)
+            except ValueError:
+                # the object runs past the buffer; read more unless the file is done
+                if eof:
+                    raise
+            else:
+                yield obj
+                buffer = buffer[end:]
+                continue
+        if eof:
+            raise ValueError('Unexpected end of JSON feed.')
+        chunk = handle.read(buffer_size)
+        eof = not chunk
+        buffer += chunk
+
+
+def iter_rows(handle, feed_format):
+    """Yield ``(line, row)`` pairs; ``line`` is the CSV line or the record number."""
+    if feed_format == CSV:
+        reader = csv.DictReader(handle)
+        for row in reader:
+            yield reader.line_num, row
+    elif feed_format == NDJSON:
+        # lines are decoded by validate_row, in the worker processes
+        for line, text in enumerate(handle, start=1):
+            if text.strip():
+                yield line, text
+    else:
+        for number, obj in enumerate(iter_json_array(handle), start=1):
+            yield number, obj
+
+
+def validate_row(row):
+    """Clean one feed row against the Property field rules.
+
+    Runs in the worker processes, so it must not touch the database. ``row``
+    is a dict or one NDJSON line. Returns ``(values, None)``, or
+    ``(values, message)`` for an invalid row, where ``values`` holds only the
+    ``external_id`` (or is ``None``) so syncs still know the listing exists.
+    """
+    if isinstance(row, str):
+        try:
+            row = json.loads(row)
+        except ValueError as exc:
+            return None, f'invalid JSON: {exc}'
+    if not isinstance(row, dict):
+        return None, 'row is not an object'
+    # accept Django fixture records as well as flat rows
+    row = row.get('fields', row)
+    external_id = str(row.get('external_id') or '').strip() or None
+    values = {}
+    for name in IMPORT_FIELDS:
+        value = row.get(name)
+        if isinstance(value, str):
+            value = value.strip()
+        if value in ('', None):
+            value = None
+        elif name in CHOICE_FIELDS:
+            value = str(value).upper()
+        values[name] = value
+    if values['status'] is None:
+        values['status'] = Property.AVAILABLE
+    instance = Property(**values)
+    try:
+        instance.clean_fields(exclude=['owner', 'featured_image'])
+    except ValidationError as exc:
+        return {'external_id': external_id}, '; '.join(
+            f'{field}: {" ".join(messages)}' for field, messages in exc.message_dict.items()
+        )
+    # usernames or (in JSON) user ids; resolved by the parent process
+    owner = row.get('owner')
+    owner = owner.strip() if isinstance(owner, str) else owner
+    # hash the feed's own values, before geocoding fills in anything derived
+    content_hash = _content_hash(instance, owner)
+    assign_coordinates(instance)
+    values = {name: getattr(instance, name) for name in IMPORT_FIELDS}
+    values.update(geohash=instance.geohash, owner=owner, external_id=external_id, content_hash=content_hash)
+    return values, None
+
+
+def _content_hash(instance, owner):
+    parts = []
+    for name in IMPORT_FIELDS:
+        value = getattr(instance, name)
+        if isinstance(value, Decimal):
+            # "450000" and "450000.00" are the same price
+            value = value.quantize(Decimal(1).scaleb(-Property._meta.get_field(name).decimal_places))
+        parts.append(None if value is None else str(value))
+    parts.append(None if owner in (None, '') else str(owner))
+    return hashlib.sha1(json.dumps(parts).encode()).hexdigest()
+
+
+def _init_worker():
+    django.setup()
+
+
+class PropertyImporter:
+    """Stream rows from a feed into ``Property`` with batched ``bulk_create``.
+
+    With ``sync=True`` rows are matched on ``external_id``: new listings are
+    created, listings whose ``content_hash`` changed are rewritten with
+    ``bulk_update``, identical ones are left alone, and AVAILABLE/PENDING
+    listings missing from the feed are moved to ``missing_status`` (``None``
+    leaves them untouched).
+    """
+
+    def __init__(self, default_owner=None, batch_size=1000, workers=None, dry_run=False, on_error=None,
+                 sync=False, missing_status=Property.SOLD):
+        self.default_owner = default_owner
+        self.batch_size = batch_size
+        self.workers = workers
+        self.dry_run = dry_run
+        self.on_error = on_error
+        self.sync = sync
+        self.missing_status = missing_status
+        self.owners = {}
+        self.search_backend = get_search_backend()
+
+    def _owner(self, reference):
+        if reference in (None, ''):
+            return self.default_owner
+        if reference not in self.owners:
+            lookup = {'pk': reference} if isinstance(reference, int) else {'username': reference}
+            self.owners[reference] = User.objects.filter(**lookup).first()
+        return self.owners[reference]
+
+    def _error(self, line, message):
+        error = RowError(line, message)
+        self.errors.append(error)
+        if self.on_error is not None:
+            self.on_error(error)
+
+    def _prepare(self, batch, results):
+        instances = []
+        for (line, _row), (values, message) in zip(batch, results):
+            if values and values.get('external_id'):
+                # rows that fail validation still count as present in the feed
+                self.seen.add(values['external_id'])
+            if message:
+                self._error(line, message)
+                continue
+            owner = self._owner(values.pop('owner'))
+            if owner is None:
+                self._error(line, 'owner: no such user (and no --owner default)')
+                continue
+            if self.sync and not values['external_id']:
+                self._error(line, 'external_id: required when syncing')
+                continue
+            instances.append((line, Property(owner=owner, **values)))
+        return instances
+
+    def _create(self, instances):
+        if self.dry_run or not instances:
+            # a dry run counts the rows that would have been created
+            return len(instances)
+        try:
+            with transaction.atomic():
+                created = Property.objects.bulk_create([instance for _line, instance in instances])
+                self.search_backend.index_many(created)
+            return len(created)
+        except DatabaseError:
+            pass
+        # fall back to one savepoint per row so a single bad row only costs itself
+        count = 0
+        with transaction.atomic():
+            for line, instance in instances:
+                try:
+                    with transaction.atomic():
+                        instance.pk = None
+                        Property.objects.bulk_create([instance])
+                        self.search_backend.index_many([instance])
+                    count += 1
+                except DatabaseError as exc:
+                    self._error(line, f'database: {exc}')
+        return count
+
+    def _update(self, instances):
+        if self.dry_run or not instances:
+            return len(instances)
+        now = timezone.now()
+        for instance in instances:
+            # bulk_update does not apply auto_now
+            instance.updated_at = now
+        with transaction.atomic():
+            Property.objects.bulk_update(instances, UPDATE_FIELDS)
+            self.search_backend.index_many(instances)
+        return len(instances)
+
+    def _write(self, batch, results):
+        instances = self._prepare(batch, results)
+        if not self.sync:
+            self.stats['created'] += self._create(instances)
+            return
+        # later rows for the same listing win
+        incoming = {instance.external_id: (line, instance) for line, instance in instances}
+        stored = dict(
+            (external_id, (pk, content_hash))
+            for external_id, pk, content_hash in Property.objects.filter(external_id__in=list(incoming))
+            .values_list('external_id', 'pk', 'content_hash')
+        )
+        new, changed = [], []
+        for external_id, (line, instance) in incoming.items():
+            if external_id not in stored:
+                new.append((line, instance))
+                continue
+            pk, content_hash = stored[external_id]
+            if content_hash == instance.content_hash:
+                self.stats['unchanged'] += 1
+            else:
+                instance.pk = pk
+                changed.append(instance)
+        self.stats['created'] += self._create(new)
+        self.stats['updated'] += self._update(changed)
+
+    def _retire_missing(self):
+        """Move listings absent from the feed to ``missing_status``."""
+        if self.missing_status is None or not self.seen:
+            # an empty or unreadable feed must not retire the whole catalog
+            return 0
+        live = Property.objects.filter(
+            external_id__isnull=False, status__in=[Property.AVAILABLE, Property.PENDING],
+        ).exclude(status=self.missing_status)
+        missing = [
+            pk for pk, external_id in live.values_list('pk', 'external_id').iterator(chunk_size=5000)
+            if external_id not in self.seen
+        ]
+        if self.dry_run:
+            return len(missing)
+        now = timezone.now()
+        for start in range(0, len(missing), self.batch_size):
+            # a cleared hash makes a listing that reappears in the feed rewrite its status
+            Property.objects.filter(pk__in=missing[start:start + self.batch_size]).update(
+                status=self.missing_status, content_hash='', updated_at=now,
+            )
+        return len(missing)
+
+    def run(self, rows):
+        """Import ``(line, row)`` pairs and return an ``ImportResult``.
+
+        ``workers=None`` uses one validation process per CPU; ``workers`` of
+        0 or 1 validates in this process.
+        """
+        started = time.perf_counter()
+        self.stats = Counter()
+        self.errors = []
+        self.seen = set()
+        rows = iter(rows)
+        batches = iter(lambda: list(islice(rows, self.batch_size)), [])
+        workers = self.workers
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if workers <= 1:
+            # a single worker process would only add pickling overhead
+            for batch in batches:
+                self._write(batch, [validate_row(row) for _line, row in batch])
+        else:
+            # forked workers must not share the parent's open database connections
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+                pending = None
+                for batch in batches:
+                    chunksize = max(1, len(batch) // (workers * 4))
+                    # validate the next batch while the current one is written
+                    results = pool.map(validate_row, [row for _line, row in batch], chunksize=chunksize)
+                    if pending is not None:
+                        self._write(*pending)
+                    pending = (batch, results)
+                if pending is not None:
+                    self._write(*pending)
+        if self.sync:
+            self.stats['transitioned'] = self._retire_missing()
+        if not self.dry_run and (self.stats['created'] or self.stats['updated'] or self.stats['transitioned']):
+            # bulk writes skipped the signals that invalidate cached counts
+            bump_count_version()
+        return ImportResult(
+            self.stats['created'], self.stats['updated'], self.stats['unchanged'], self.stats['transitioned'],
+            self.errors, time.perf_counter() - started,
+        )
+
+
+def open_feed(path, encoding='utf-8'):
+    if path == '-':
+        return io.TextIOWrapper(sys.stdin.buffer, encoding=encoding, newline='')
+    return open(path, encoding=encoding, newline='')
@@ -0,0 +1,235 @@
+"""Process-local columnar index for the property list filters and sorts.
+
+Nearly every list request filters AVAILABLE properties by type, price,
+bedrooms and bathrooms and sorts by price, area or date. ``ListingIndex``
+keeps those columns in NumPy arrays so the whole filter-and-sort runs as a
+handful of vectorized comparisons plus one ``lexsort``; only the requested
+page of rows is then fetched with a single ``in_bulk``.
+
+The index is built lazily on first use, patched incrementally from the
+Property signals after each commit, and compared against a cheap aggregate
+of the database every ``PROPERTY_LISTING_INDEX_CHECK_INTERVAL`` seconds so
+writes made by other processes (or behind the signals) are picked up.
+
+It is opt-in (``PROPERTY_LISTING_INDEX = True``) and needs NumPy; without
+NumPy ``get_listing_index()`` returns ``None`` and the list view keeps using
+the database. Full-text searches always go to the database.
+"""
+import operator
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Count, Max, Sum
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+from .models import Property
+from .pagination import get_sort_key
+
+
+COLUMNS = {
+    'pk': 'int64',
+    'price': 'float64',
+    'area': 'int64',
+    'bedrooms': 'int64',
+    'bathrooms': 'float64',
+    'property_type': 'int16',
+    'created_at': 'int64',
+    'updated_at': 'int64',
+}
+
+TYPE_CODES = {value: code for code, (value, _label) in enumerate(Property.PROPERTY_TYPE_CHOICES)}
+
+VALUE_FIELDS = ('pk', 'price', 'area', 'bedrooms', 'bathrooms', 'property_type', 'created_at', 'updated_at')
+
+
+def _micros(dt):
+    return int(dt.timestamp() * 1_000_000) if dt is not None else 0
+
+
+def _encode(row):
+    pk, price, area, bedrooms, bathrooms, property_type, created_at, updated_at = row
+    return (
+        pk, float(price), area, bedrooms, float(bathrooms),
+        TYPE_CODES.get(property_type, -1), _micros(created_at), _micros(updated_at),
+    )
+
+
+class IndexedListing:
+    """Ordered pks from the index that hydrate to Property objects when sliced."""
+
+    def __init__(self, model, pks):
+        self.model = model
+        self.pks = pks
+
+    def __len__(self):
+        return len(self.pks)
+
+    def count(self):
+        return len(self.pks)
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            index = operator.index(key)
+            if index < 0:
+                index += len(self.pks)
+            if not 0 <= index < len(self.pks):
+                raise IndexError('IndexedListing index out of range')
+            return self[index:index + 1][0]
+        pks = self.pks[key].tolist()
+        objects = self.model._default_manager.in_bulk(pks)
+        # rows deleted since the index last heard about them are skipped
+        return [objects[pk] for pk in pks if pk in objects]
+
+
+class ListingIndex:
+    def __init__(self, check_interval=60):
+        self.check_interval = check_interval
+        self.lock = threading.RLock()
+        self.built = False
+        self.last_check = 0.0
+        self._reset(0)
+
+    def _reset(self, capacity):
+        self.size = 0
+        self.dead = 0
+        self.rows = {}
+        self.live = np.zeros(capacity, dtype=bool)
+        self.columns = {name: np.zeros(capacity, dtype=dtype) for name, dtype in COLUMNS.items()}
+
+    def _grow(self, needed):
+        capacity = len(self.live)
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2, 64)
+        self.live = np.resize(self.live, capacity)
+        self.live[self.size:] = False
+        for name in self.columns:
+            self.columns[name] = np.resize(self.columns[name], capacity)
+
+    def build(self):
+        rows = Property.objects.filter(status=Property.AVAILABLE).values_list(*VALUE_FIELDS)
+        encoded = [_encode(row) for row in rows.iterator(chunk_size=5000)]
+        with self.lock:
+            self._reset(len(encoded))
+            for name, values in zip(COLUMNS, zip(*encoded)):
+                self.columns[name][:] = values
+            self.size = len(encoded)
+            self.live[:] = True
+            self.rows = {pk: row for row, pk in enumerate(self.columns['pk'].tolist())}
+            self.built = True
+            self.last_check = time.monotonic()
+
+    def upsert(self, instance):
+        if instance.status != Property.AVAILABLE:
+            self.remove(instance.pk)
+            return
+        values = _encode(tuple(getattr(instance, field) for field in VALUE_FIELDS))
+        with self.lock:
+            if not self.built:
+                return
+            row = self.rows.get(instance.pk)
+            if row is None:
+                self._grow(self.size + 1)
+                row = self.size
+                self.size += 1
+                self.rows[instance.pk] = row
+            for name, value in zip(COLUMNS, values):
+                self.columns[name][row] = value
+            self.live[row] = True
+
+    def remove(self, pk):
+        with self.lock:
+            row = self.rows.pop(pk, None)
+            if row is not None:
+                self.live[row] = False
+                self.dead += 1
+
+    def fingerprint(self):
+        with self.lock:
+            live = self.live[:self.size]
+            if not live.any():
+                return (0, None, None)
+            return (
+                int(live.sum()),
+                int(self.columns['pk'][:self.size][live].sum()),
+                int(self.columns['updated_at'][:self.size][live].max()),
+            )
+
+    def database_fingerprint(self):
+        stats = Property.objects.filter(status=Property.AVAILABLE).aggregate(
+            count=Count('pk'), pk_sum=Sum('pk'), updated=Max('updated_at'),
+        )
+        if not stats['count']:
+            return (0, None, None)
+        return (stats['count'], stats['pk_sum'], _micros(stats['updated']))
+
+    def ensure_fresh(self):
+        # under the lock, so threads finding the index stale rebuild it once
+        # and upserts wait for the rebuild instead of landing in the old arrays
+        with self.lock:
+            # dead slots are only reclaimed by a rebuild
+            if not self.built or self.dead > max(1024, self.size // 2):
+                self.build()
+                return
+            if time.monotonic() - self.last_check < self.check_interval:
+                return
+            self.last_check = time.monotonic()
+            if self.fingerprint() != self.database_fingerprint():
+                self.build()
+
+    @staticmethod
+    def supports(filters):
+        # text and spatial filters need the database's search and geohash indexes
+        return not (filters.search or filters.center or filters.bbox)
+
+    def query(self, filters, sort=None):
+        """Return an ``IndexedListing`` for the AVAILABLE rows matching ``filters``."""
+        self.ensure_fresh()
+        with self.lock:
+            n = self.size
+            cols = {name: values[:n] for name, values in self.columns.items()}
+            mask = self.live[:n].copy()
+            if filters.property_type:
+                code = TYPE_CODES.get(filters.property_type)
+                mask &= cols['property_type'] == (code if code is not None else -2)
+            if filters.min_price is not None:
+                mask &= cols['price'] >= float(filters.min_price)
+            if filters.max_price is not None:
+                mask &= cols['price'] <= float(filters.max_price)
+            if filters.bedrooms is not None:
+                mask &= cols['bedrooms'] >= filters.bedrooms
+            if filters.bathrooms is not None:
+                mask &= cols['bathrooms'] >= float(filters.bathrooms)
+            field, descending = get_sort_key(sort)
+            keys = cols[field][mask]
+            pks = cols['pk'][mask]
+        # lexsort sorts by the last key first; pk breaks ties like get_ordering()
+        order = np.lexsort((-pks, -keys)) if descending else np.lexsort((pks, keys))
+        return IndexedListing(Property, pks[order])
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_listing_index():
+    """Return the shared index, or ``None`` when disabled or NumPy is missing."""
+    global _index
+    if np is None or not getattr(settings, 'PROPERTY_LISTING_INDEX', False):
+        return None
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = ListingIndex(getattr(settings, 'PROPERTY_LISTING_INDEX_CHECK_INTERVAL', 60))
+    return _index
+
+
+def reset_listing_index():
+    global _index
+    with _index_lock:
+        _index = None
@@ -0,0 +1,83 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from apps.properties.benchmark import asgi_load, wsgi_load
+from apps.properties.models import Property
+
+
+MODES = {'wsgi': wsgi_load, 'asgi': asgi_load}
+
+
+class Command(BaseCommand):
+    help = 'Compare page throughput under WSGI (sync views, thread pool) and ASGI (async views, event loop).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', choices=['both', *MODES], default='both')
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=64)
+        parser.add_argument('--path', action='append', dest='paths', help='Page to request; repeat for several.')
+        parser.add_argument('--user', help='Request the pages signed in as this username (adds the inbox).')
+        parser.add_argument('--host', default='localhost', help='Host header sent with each request.')
+
+    def handle(self, *args, **options):
+        if options['mode'] == 'both':
+            results = {mode: self.run_child(mode, options) for mode in MODES}
+            wsgi, asgi = results['wsgi']['requests_per_second'], results['asgi']['requests_per_second']
+            results['asgi_speedup'] = round(asgi / wsgi, 2) if wsgi and asgi else None
+        else:
+            results = self.run_mode(options['mode'], options)
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def run_child(self, mode, options):
+        # URL patterns pick sync or async views at import, so each mode gets a fresh process
+        command = [
+            sys.executable, str(settings.BASE_DIR / 'manage.py'), 'bench_concurrency', '--mode', mode,
+            '--requests', str(options['requests']), '--concurrency', str(options['concurrency']),
+            '--host', options['host'],
+        ]
+        for path in options['paths'] or []:
+            command += ['--path', path]
+        if options['user']:
+            command += ['--user', options['user']]
+        env = dict(os.environ, PROPERTY_ASYNC_VIEWS='1' if mode == 'asgi' else '0')
+        child = subprocess.run(command, env=env, capture_output=True, text=True)
+        if child.returncode:
+            raise CommandError(f'{mode} run failed:\n{child.stderr}')
+        return json.loads(child.stdout)
+
+    def default_paths(self, signed_in):
+        listing = Property.objects.filter(status=Property.AVAILABLE).order_by('-created_at').first()
+        if listing is None:
+            raise CommandError('No available properties to request; load data with perf_seed first.')
+        list_url = reverse('properties:property_list')
+        paths = [list_url, f'{list_url}?sort=price_asc', f'{list_url}?cursor=', listing.get_absolute_url()]
+        if signed_in:
+            paths.append(reverse('properties:inquiry_list'))
+        return paths
+
+    def run_mode(self, mode, options):
+        cookie, client = '', None
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"No user named {options['user']!r}.")
+            client = Client()
+            client.force_login(user)
+            cookie = f'{settings.SESSION_COOKIE_NAME}={client.session.session_key}'
+        paths = options['paths'] or self.default_paths(bool(cookie))
+        try:
+            result = MODES[mode](paths, options['requests'], options['concurrency'], options['host'], cookie)
+        finally:
+            if client is not None:
+                client.logout()
+        result.update(mode=mode, async_views=settings.PROPERTY_ASYNC_VIEWS, paths=paths)
+        return result
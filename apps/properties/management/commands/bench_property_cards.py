@@ -0,0 +1,48 @@
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.template.loader import get_template
+from django.test import RequestFactory
+
+from apps.properties.views import PropertyListView
+
+
+class Command(BaseCommand):
+    help = 'Measure property list page rendering with cold and warm card fragment caches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--per-page', type=int, default=PropertyListView.paginate_by)
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        view = PropertyListView(paginate_by=options['per_page'])
+        view.setup(request)
+        view.object_list = view.get_queryset()
+        context = view.get_context_data()
+        # hydrate the page once so only template rendering is timed
+        context['properties'] = list(context['properties'])
+        template = get_template(PropertyListView.template_name)
+        fragments = caches['fragments']
+
+        def timed(clear):
+            started = time.perf_counter()
+            for _ in range(iterations):
+                if clear:
+                    fragments.clear()
+                template.render(context, request)
+            return (time.perf_counter() - started) * 1000 / iterations
+
+        cold = timed(clear=True)
+        template.render(context, request)
+        warm = timed(clear=False)
+        cards = len(context['properties'])
+        self.stdout.write(f'cards per page: {cards}')
+        self.stdout.write(f'cold render:    {cold:.3f} ms')
+        self.stdout.write(f'warm render:    {warm:.3f} ms')
+        if warm:
+            self.stdout.write(self.style.SUCCESS(f'speedup:        {cold / warm:.2f}x'))
@@ -0,0 +1,97 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+
+from apps.jobs.models import Job
+from apps.properties.benchmark import wsgi_post_load
+from apps.properties.models import Inquiry, Property
+
+
+PROFILES = ('stock', 'production')
+
+
+class Command(BaseCommand):
+    help = 'Measure inquiry write throughput under concurrent submissions, with the stock and production SQLite profiles.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profile', choices=['both', *PROFILES], default='both')
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--users', type=int, default=8, help='Signed-in buyers the submissions are spread over.')
+        parser.add_argument('--host', default='localhost', help='Host header sent with each request.')
+
+    def handle(self, *args, **options):
+        if options['profile'] == 'both':
+            results = {profile: self.run_child(profile, options) for profile in PROFILES}
+            stock, production = results['stock']['requests_per_second'], results['production']['requests_per_second']
+            results['production_speedup'] = round(production / stock, 2) if stock and production else None
+        else:
+            results = self.run_profile(options)
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def run_child(self, profile, options):
+        # the profile is chosen in settings at startup, so each gets a fresh process
+        command = [
+            sys.executable, str(settings.BASE_DIR / 'manage.py'), 'bench_sqlite_writes', '--profile', profile,
+            '--requests', str(options['requests']), '--concurrency', str(options['concurrency']),
+            '--users', str(options['users']), '--host', options['host'],
+        ]
+        env = dict(os.environ, SQLITE_PRODUCTION='1' if profile == 'production' else '0')
+        child = subprocess.run(command, env=env, capture_output=True, text=True)
+        if child.returncode:
+            raise CommandError(f'{profile} run failed:\n{child.stderr}')
+        return json.loads(child.stdout)
+
+    def run_profile(self, options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('This benchmark measures the SQLite profiles; the default database is not SQLite.')
+        if not settings.SQLITE_PRODUCTION:
+            # WAL is stored in the file, so undo an earlier production run for a fair baseline
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode = DELETE')
+        listing = Property.objects.filter(status=Property.AVAILABLE).order_by('-created_at').first()
+        if listing is None:
+            raise CommandError('No available properties to inquire on; load data with perf_seed first.')
+        buyers = list(User.objects.exclude(pk=listing.owner_id).order_by('pk')[:options['users']])
+        if not buyers:
+            raise CommandError('No users besides the listing owner; load data with perf_seed first.')
+        token = get_random_string(32)
+        clients, cookies = [], []
+        for buyer in buyers:
+            client = Client()
+            client.force_login(buyer)
+            clients.append(client)
+            cookies.append(f'{settings.SESSION_COOKIE_NAME}={client.session.session_key}; {settings.CSRF_COOKIE_NAME}={token}')
+        path = reverse('properties:inquiry_create', kwargs={'pk': listing.pk})
+        data = {
+            'name': 'Bench Buyer', 'email': 'bench@example.com', 'message': 'Is this still available?',
+            'csrfmiddlewaretoken': token,
+        }
+        last_inquiry = Inquiry.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        last_job = Job.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        try:
+            result = wsgi_post_load(path, data, options['requests'], options['concurrency'], cookies, options['host'])
+            result['inquiries_written'] = Inquiry.objects.filter(related_property=listing, pk__gt=last_inquiry).count()
+        finally:
+            # the posts commit for real; remove them (and their notification jobs) again
+            Inquiry.objects.filter(related_property=listing, pk__gt=last_inquiry).delete()
+            Job.objects.filter(pk__gt=last_job).delete()
+            for client in clients:
+                client.logout()
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            journal_mode = cursor.fetchone()[0]
+        result.update(
+            profile='production' if settings.SQLITE_PRODUCTION else 'stock', journal_mode=journal_mode,
+            transaction_mode=getattr(connection, 'transaction_mode', None) or 'DEFERRED',
+        )
+        return result
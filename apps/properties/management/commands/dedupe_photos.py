@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from apps.properties.counts import bump_count_version
+from apps.properties.models import Property, PropertyImage
+from apps.properties.storage import blob_name, content_hash, delete_with_renditions, is_blob, photo_storage
+
+
+class Command(BaseCommand):
+    help = 'Move listing photos stored before content addressing into deduplicated blobs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report what would move without changing anything.')
+        parser.add_argument('--keep-originals', action='store_true', help='Leave the old files in place after moving.')
+
+    def handle(self, *args, **options):
+        storage = photo_storage()
+        names = set(Property.objects.exclude(featured_image='').exclude(featured_image__isnull=True).values_list('featured_image', flat=True))
+        names.update(PropertyImage.objects.values_list('image', flat=True))
+        legacy = sorted(name for name in names if not is_blob(name) and storage.exists(name))
+        moved = freed = 0
+        blobs = set()
+        for name in legacy:
+            size = storage.size(name)
+            with storage.open(name, 'rb') as handle:
+                blob = blob_name(content_hash(handle), name)
+                if not options['dry_run']:
+                    blob = storage.save(name, handle)
+            if not options['dry_run']:
+                with transaction.atomic():
+                    # a new updated_at also retires cached cards pointing at the old name
+                    Property.objects.filter(featured_image=name).update(featured_image=blob, updated_at=timezone.now())
+                    PropertyImage.objects.filter(image=name).update(image=blob)
+                if not options['keep_originals']:
+                    delete_with_renditions(storage, name)
+            if blob in blobs:
+                freed += size
+            blobs.add(blob)
+            moved += 1
+        if moved and not options['dry_run']:
+            # update() sends no signals; retire the cached list stats and ETags pointing at the old names
+            bump_count_version()
+        verb = 'Would move' if options['dry_run'] else 'Moved'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {moved} photos into {len(blobs)} blobs ({freed / 1024:.0f} KB of duplicates).'
+        ))
+        if moved and not options['dry_run']:
+            self.stdout.write('Run generate_renditions to render the new blobs.')
@@ -0,0 +1,28 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from apps.properties.models import Property, PropertyImage
+from apps.properties.renditions import generate_many
+
+
+class Command(BaseCommand):
+    help = 'Generate resized WebP/JPEG renditions for existing listing photos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Re-render renditions that already exist.')
+        parser.add_argument('--workers', type=int, default=None, help='Rendering processes (default: one per CPU).')
+
+    def handle(self, *args, **options):
+        names = set(Property.objects.exclude(featured_image='').exclude(featured_image__isnull=True).values_list('featured_image', flat=True))
+        names.update(PropertyImage.objects.values_list('image', flat=True))
+        names = sorted(name for name in names if default_storage.exists(name))
+        rendered = written = 0
+        for name, files in generate_many(names, workers=options['workers'], force=options['force']):
+            if files:
+                rendered += 1
+                written += len(files)
+                if options['verbosity'] > 1:
+                    self.stdout.write(f'{name}: {len(files)} renditions')
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {written} renditions for {rendered} of {len(names)} images.'
+        ))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from apps.properties.counts import bump_count_version
+from apps.properties.geo import geocode_properties
+from apps.properties.models import Property
+
+
+class Command(BaseCommand):
+    help = 'Fill property coordinates and geohashes from the offline zipcode-centroid table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--overwrite', action='store_true', help='Re-geocode properties that already have coordinates.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        queryset = Property.objects.all()
+        if not options['overwrite']:
+            queryset = queryset.filter(geohash='')
+        updated, missing = geocode_properties(queryset, overwrite=options['overwrite'], batch_size=options['batch_size'])
+        # bulk_update skips the signals that normally invalidate cached counts
+        bump_count_version()
+        self.stdout.write(self.style.SUCCESS(f'Geocoded {updated} properties.'))
+        if missing:
+            self.stdout.write(self.style.WARNING(f'{missing} properties have zipcodes missing from the centroid table.'))
@@ -0,0 +1,70 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.properties.importer import FORMATS, PropertyImporter, detect_format, iter_rows, open_feed
+from apps.properties.models import Property
+
+
+class Command(BaseCommand):
+    help = 'Bulk import properties from a CSV, NDJSON or JSON feed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Feed file, or '-' for stdin.")
+        parser.add_argument('--format', choices=sorted(set(FORMATS.values())), help='Defaults to the file extension.')
+        parser.add_argument('--owner', help='Username that owns rows without an owner column.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk_create and transaction.')
+        parser.add_argument('--workers', type=int, default=None, help='Validation processes (default: one per CPU); 0 validates in this process.')
+        parser.add_argument('--dry-run', action='store_true', help='Validate and report without writing.')
+        parser.add_argument('--sync', action='store_true', help='Upsert on external_id and retire listings missing from the feed.')
+        parser.add_argument(
+            '--missing-status', default=Property.SOLD,
+            choices=[Property.SOLD, Property.RENTED, Property.PENDING, 'keep'],
+            help="Status for listings that left the feed when syncing, or 'keep'.",
+        )
+        parser.add_argument('--encoding', default='utf-8')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+        default_owner = None
+        if options['owner']:
+            default_owner = User.objects.filter(username=options['owner']).first()
+            if default_owner is None:
+                raise CommandError(f"No user named '{options['owner']}'.")
+        feed_format = options['format'] or detect_format(options['path'])
+
+        def report(error):
+            self.stderr.write(f'row {error.line}: {error.message}')
+
+        importer = PropertyImporter(
+            default_owner=default_owner,
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+            dry_run=options['dry_run'],
+            on_error=report,
+            sync=options['sync'],
+            missing_status=None if options['missing_status'] == 'keep' else options['missing_status'],
+        )
+        try:
+            with open_feed(options['path'], options['encoding']) as handle:
+                result = importer.run(iter_rows(handle, feed_format))
+        except OSError as exc:
+            raise CommandError(f'Cannot read feed: {exc}')
+        except ValueError as exc:
+            raise CommandError(f'Cannot parse feed: {exc}')
+
+        rows = result.created + result.updated + result.unchanged + len(result.errors)
+        verb = 'Validated' if options['dry_run'] else 'Imported'
+        if options['sync']:
+            verb = 'Checked' if options['dry_run'] else 'Synced'
+            self.stdout.write(self.style.SUCCESS(f'{verb} {rows} feed rows in {result.seconds:.2f}s.'))
+            self.stdout.write(f'  created:   {result.created}')
+            self.stdout.write(f'  updated:   {result.updated}')
+            self.stdout.write(f'  unchanged: {result.unchanged}')
+            if options['missing_status'] != 'keep':
+                self.stdout.write(f"  marked {options['missing_status']}: {result.transitioned}")
+        else:
+            self.stdout.write(self.style.SUCCESS(f'{verb} {result.created} properties in {result.seconds:.2f}s.'))
+        if result.errors:
+            self.stdout.write(self.style.WARNING(f'{len(result.errors)} rows skipped with errors.'))
+        self.stdout.write(f'throughput: {rows / max(result.seconds, 1e-9):.0f} rows/sec')
@@ -0,0 +1,52 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.properties.benchmark import Benchmark, BenchmarkError, compare, default_scenarios
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the main pages end to end and report latency percentiles and queries per view as JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--only', nargs='+', metavar='SCENARIO', help='Run only these scenarios.')
+        parser.add_argument('--host', default='localhost', help='Host header sent with each request.')
+        parser.add_argument('--output', help='Write the JSON results to this file.')
+        parser.add_argument('--baseline', help='Compare against the JSON results of an earlier run.')
+        parser.add_argument('--threshold', type=float, default=1.2, help='p95 ratio above which a scenario regressed.')
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **options):
+        try:
+            scenarios = default_scenarios()
+        except BenchmarkError as exc:
+            raise CommandError(exc)
+        if options['only']:
+            unknown = set(options['only']) - {scenario.name for scenario in scenarios}
+            if unknown:
+                raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}.")
+            scenarios = [scenario for scenario in scenarios if scenario.name in options['only']]
+
+        def progress(name, result):
+            if options['verbosity'] > 1:
+                self.stderr.write(f"{name}: p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms, {result['queries']} queries")
+
+        benchmark = Benchmark(scenarios, options['iterations'], options['warmup'], options['host'])
+        try:
+            results = benchmark.run(progress)
+        except BenchmarkError as exc:
+            raise CommandError(exc)
+        regressed = []
+        if options['baseline']:
+            with open(options['baseline']) as fh:
+                results['comparison'] = compare(results, json.load(fh), options['threshold'])
+            regressed = [name for name, row in results['comparison'].items() if row['regressed']]
+        output = json.dumps(results, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                fh.write(output + '\n')
+        self.stdout.write(output)
+        if regressed and options['fail_on_regression']:
+            raise CommandError(f"Regressed against the baseline: {', '.join(regressed)}.")
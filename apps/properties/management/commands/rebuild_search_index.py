@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.properties.search import get_search_backend
+from apps.properties.sharding import listing_databases
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for property listings.'
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        indexed = 0
+        # default and every shard keep their own index
+        for using in listing_databases():
+            with transaction.atomic(using=using):
+                indexed += backend.rebuild(using=using)
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} properties with {type(backend).__name__}.'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from apps.properties.counters import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized inquiry counters from the inquiries table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report drifted counters without fixing them.')
+
+    def handle(self, *args, **options):
+        users, properties = reconcile(options['dry_run'])
+        verb = 'Would fix' if options['dry_run'] else 'Fixed'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {users} user counters and {properties} property counters.'))
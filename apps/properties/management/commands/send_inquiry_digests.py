@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from apps.accounts.models import UserProfile
+from apps.properties.digests import send_digests
+
+
+class Command(BaseCommand):
+    help = 'Email hourly or daily digests of new inquiries to owners who chose them.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('frequency', choices=['hourly', 'daily'], help='Which digest subscribers to send to.')
+        parser.add_argument('--batch-size', type=int, default=100, help='Digests handed to the mail connection at once.')
+        parser.add_argument('--dry-run', action='store_true', help='Count the digests without sending them.')
+
+    def handle(self, *args, **options):
+        frequency = UserProfile.HOURLY if options['frequency'] == 'hourly' else UserProfile.DAILY
+        digests, inquiries = send_digests(frequency, options['batch_size'], options['dry_run'])
+        verb = 'Would send' if options['dry_run'] else 'Sent'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {digests} digests covering {inquiries} inquiries.'))
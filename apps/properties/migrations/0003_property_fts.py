@@ -0,0 +1,36 @@
+from django.db import migrations
+
+
+FTS_TABLE = 'properties_property_fts'
+FTS_COLUMNS = 'title, description, address, city, state'
+
+
+def create_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        f"{FTS_COLUMNS}, tokenize='unicode61 remove_diacritics 2')"
+    )
+    schema_editor.execute(
+        f"INSERT INTO {FTS_TABLE} (rowid, {FTS_COLUMNS}) "
+        f"SELECT id, {FTS_COLUMNS} FROM properties_property"
+    )
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0002_property_keyset_indexes'),
+    ]
+
+    operations = [
+        # every listing database (default and each shard) keeps its own index
+        migrations.RunPython(create_fts_table, drop_fts_table, hints={'sharded': True}),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:38
+
+import apps.properties.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0005_property_feed_sync'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='property',
+            name='featured_image',
+            field=models.ImageField(blank=True, db_index=True, null=True, storage=apps.properties.storage.photo_storage, upload_to='properties/'),
+        ),
+        migrations.AlterField(
+            model_name='propertyimage',
+            name='image',
+            field=models.ImageField(db_index=True, storage=apps.properties.storage.photo_storage, upload_to='properties/gallery/'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:43
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def mark_existing_notified(apps, schema_editor):
+    # every inquiry made before digests was already emailed by the view
+    Inquiry = apps.get_model('properties', 'Inquiry')
+    Inquiry.objects.update(notified_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0006_photo_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inquiry',
+            name='notified_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(mark_existing_notified, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='inquiry',
+            index=models.Index(condition=models.Q(('notified_at__isnull', True)), fields=['created_at'], name='inquiry_unnotified_idx'),
+        ),
+    ]
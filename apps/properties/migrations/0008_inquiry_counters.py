@@ -0,0 +1,63 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:46
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+import django.db.models.deletion
+
+
+def fill_counters(apps, schema_editor):
+    Inquiry = apps.get_model('properties', 'Inquiry')
+    UserInquiryCounter = apps.get_model('properties', 'UserInquiryCounter')
+    PropertyInquiryCounter = apps.get_model('properties', 'PropertyInquiryCounter')
+    unread = Count('pk', filter=Q(is_read=False))
+    users = {}
+    for owner_id, received, owner_unread in (
+        Inquiry.objects.order_by().values_list('related_property__owner').annotate(received=Count('pk'), unread=unread)
+    ):
+        users[owner_id] = UserInquiryCounter(user_id=owner_id, received=received, unread=owner_unread)
+    for user_id, sent in Inquiry.objects.order_by().values_list('user').annotate(sent=Count('pk')):
+        users.setdefault(user_id, UserInquiryCounter(user_id=user_id)).sent = sent
+    UserInquiryCounter.objects.bulk_create(users.values(), batch_size=500)
+    PropertyInquiryCounter.objects.bulk_create(
+        (PropertyInquiryCounter(property_id=property_id, unread=n) for property_id, n in (
+            Inquiry.objects.filter(is_read=False).order_by().values_list('related_property').annotate(n=Count('pk'))
+        )),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('properties', '0007_inquiry_notified_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PropertyInquiryCounter',
+            fields=[
+                ('property', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='inquiry_counter', serialize=False, to='properties.property')),
+                ('unread', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Property Inquiry Counter',
+                'verbose_name_plural': 'Property Inquiry Counters',
+            },
+        ),
+        migrations.CreateModel(
+            name='UserInquiryCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='inquiry_counter', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('received', models.IntegerField(default=0)),
+                ('unread', models.IntegerField(default=0)),
+                ('sent', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'User Inquiry Counter',
+                'verbose_name_plural': 'User Inquiry Counters',
+            },
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def fill_owner(apps, schema_editor):
+    Inquiry = apps.get_model('properties', 'Inquiry')
+    Property = apps.get_model('properties', 'Property')
+    Inquiry.objects.update(
+        owner=Subquery(Property.objects.filter(pk=OuterRef('related_property_id')).values('owner_id')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('properties', '0008_inquiry_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inquiry',
+            name='owner',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='inquiries_received', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(fill_owner, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='inquiry',
+            name='owner',
+            field=models.ForeignKey(db_index=False, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='inquiries_received', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='inquiry',
+            index=models.Index(fields=['owner', 'is_read', 'created_at'], name='inquiry_inbox_idx'),
+        ),
+    ]
@@ -2,6 +2,9 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.urls import reverse
 
+from .sharding import ShardedQuerySet
+from .storage import photo_storage
+
 
 class Property(models.Model):
     HOUSE = 'HOUSE'
@@ -39,20 +42,38 @@ class Property(models.Model):
     city = models.CharField(max_length=100)
     state = models.CharField(max_length=100)
     zipcode = models.CharField(max_length=20)
+    latitude = models.FloatField(blank=True, null=True)
+    longitude = models.FloatField(blank=True, null=True)
+    # derived from latitude/longitude; prefix ranges prune radius and map queries
+    geohash = models.CharField(max_length=12, blank=True, db_index=True, editable=False)
     bedrooms = models.PositiveIntegerField()
     bathrooms = models.DecimalField(max_digits=3, decimal_places=1)
     area = models.PositiveIntegerField(help_text='Area in square feet')
     property_type = models.CharField(max_length=50, choices=PROPERTY_TYPE_CHOICES)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=AVAILABLE)
-    featured_image = models.ImageField(upload_to='properties/', blank=True, null=True)
+    # stored by content hash, so duplicate uploads share one file
+    featured_image = models.ImageField(upload_to='properties/', storage=photo_storage, blank=True, null=True, db_index=True)
+    # unconstrained on shard databases, which hold no user table
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='properties')
+    # listing id in the source feed; feed syncs match rows on it
+    external_id = models.CharField(max_length=64, unique=True, blank=True, null=True)
+    # hash of the feed values last applied, so unchanged rows are never rewritten
+    content_hash = models.CharField(max_length=40, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ShardedQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
         verbose_name = 'Property'
         verbose_name_plural = 'Properties'
+        # composite (status, sort key, id) indexes back the keyset pagination seeks
+        indexes = [
+            models.Index(fields=['status', 'price', 'id'], name='property_status_price_idx'),
+            models.Index(fields=['status', 'area', 'id'], name='property_status_area_idx'),
+            models.Index(fields=['status', 'created_at', 'id'], name='property_status_created_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -75,10 +96,12 @@ class Property(models.Model):
 
 class PropertyImage(models.Model):
     property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='images')
-    image = models.ImageField(upload_to='properties/gallery/')
+    image = models.ImageField(upload_to='properties/gallery/', storage=photo_storage, db_index=True)
     caption = models.CharField(max_length=200, blank=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
+    objects = ShardedQuerySet.as_manager()
+
     class Meta:
         ordering = ['uploaded_at']
         verbose_name = 'Property Image'
@@ -90,13 +113,20 @@ class PropertyImage(models.Model):
 
 class Inquiry(models.Model):
     related_property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='inquiries')
+    # like Property.owner, the user foreign keys are unconstrained on shards
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='inquiries_sent')
+    # copy of related_property.owner so the inbox needs no join; kept in step by signals
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='inquiries_received', editable=False, db_index=False)
     name = models.CharField(max_length=100)
     email = models.EmailField()
     phone = models.CharField(max_length=20, blank=True, null=True)
     message = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     is_read = models.BooleanField(default=False)
+    # when the owner was emailed about it, immediately or in a digest
+    notified_at = models.DateTimeField(blank=True, null=True, editable=False)
+
+    objects = ShardedQuerySet.as_manager()
 
     class Meta:
         ordering = ['-created_at']
@@ -105,6 +135,10 @@ class Inquiry(models.Model):
         indexes = [
             models.Index(fields=['related_property', 'created_at']),
             models.Index(fields=['user', 'created_at']),
+            # the received inbox: unread first, newest first, per owner
+            models.Index(fields=['owner', 'is_read', 'created_at'], name='inquiry_inbox_idx'),
+            # only inquiries still waiting for a digest
+            models.Index(fields=['created_at'], condition=models.Q(notified_at__isnull=True), name='inquiry_unnotified_idx'),
         ]
 
     def __str__(self):
@@ -114,3 +148,33 @@ class Inquiry(models.Model):
     @property
     def property_owner(self):
         return self.related_property.owner
+
+
+class UserInquiryCounter(models.Model):
+    """Inquiry totals for one user, kept in step by ``counters.py``."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='inquiry_counter')
+    received = models.IntegerField(default=0)
+    unread = models.IntegerField(default=0)
+    sent = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'User Inquiry Counter'
+        verbose_name_plural = 'User Inquiry Counters'
+
+    def __str__(self):
+        return f"{self.user_id}: {self.received} received, {self.unread} unread, {self.sent} sent"
+
+
+class PropertyInquiryCounter(models.Model):
+    """Unread inquiries for one listing, kept in step by ``counters.py``."""
+    property = models.OneToOneField(Property, on_delete=models.CASCADE, primary_key=True, related_name='inquiry_counter')
+    unread = models.IntegerField(default=0)
+
+    objects = ShardedQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Property Inquiry Counter'
+        verbose_name_plural = 'Property Inquiry Counters'
+
+    def __str__(self):
+        return f"{self.property_id}: {self.unread} unread"
@@ -0,0 +1,269 @@
+"""Keyset (cursor) pagination for property listings and the inquiry inbox.
+
+OFFSET pagination makes the database walk and discard every skipped row, so
+deep pages get slower as the catalog grows. Keyset pagination instead seeks
+directly to the last row of the previous page using the (sort key, pk) pair,
+which the composite indexes on ``Property`` can serve in constant time.
+``InboxPaginator`` does the same for received inquiries, unread first.
+"""
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+# sort option -> (field, descending); pk is always used as the tie-breaker
+SORT_KEYS = {
+    '': ('created_at', True),
+    'price_asc': ('price', False),
+    'price_desc': ('price', True),
+    'area_asc': ('area', False),
+    'area_desc': ('area', True),
+    'oldest': ('created_at', False),
+}
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def get_sort_key(sort):
+    return SORT_KEYS.get(sort or '', SORT_KEYS[''])
+
+
+def get_ordering(sort, reverse=False):
+    field, descending = get_sort_key(sort)
+    if reverse:
+        descending = not descending
+    prefix = '-' if descending else ''
+    return [f'{prefix}{field}', f'{prefix}pk']
+
+
+def serialize_key(value):
+    """Render a sort-key value the way cursors store it."""
+    if value is None:
+        return None
+    return value.isoformat() if hasattr(value, 'isoformat') else str(value)
+
+
+def seek_filter(field_name, descending, value, pk):
+    """Rows strictly after ``(value, pk)`` in the given sort direction."""
+    op = 'lt' if descending else 'gt'
+    return Q(**{f'{field_name}__{op}': value}) | Q(**{field_name: value, f'pk__{op}': pk})
+
+
+def encode_cursor(sort, value, pk, direction):
+    payload = json.dumps({'s': sort or '', 'v': value, 'k': pk, 'd': direction}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return data['s'], data['v'], int(data['k']), data['d']
+    except (ValueError, TypeError, KeyError, binascii.Error) as exc:
+        raise InvalidCursor('Malformed cursor.') from exc
+
+
+class CursorPage:
+    """A page of results plus the opaque tokens for its neighbours."""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Paginate a queryset by seeking on (sort key, pk) instead of OFFSET.
+
+    The queryset must not already be sliced; its ordering is replaced with the
+    one matching ``sort``. No COUNT query is issued.
+    """
+
+    def __init__(self, queryset, per_page, sort=''):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.sort = sort or ''
+        self.field_name, self.descending = get_sort_key(self.sort)
+        self.field = queryset.model._meta.get_field(self.field_name)
+
+    def _serialize(self, obj):
+        return serialize_key(getattr(obj, self.field_name))
+
+    def _seek(self, value, pk, forward):
+        # rows strictly after (value, pk) in the direction of travel
+        descending = self.descending if forward else not self.descending
+        return seek_filter(self.field_name, descending, value, pk)
+
+    def _queryset(self, cursor):
+        queryset = self.queryset
+        direction = NEXT
+        if cursor:
+            sort, raw_value, pk, direction = decode_cursor(cursor)
+            if sort != self.sort or direction not in (NEXT, PREVIOUS):
+                raise InvalidCursor('Cursor does not match the current sort order.')
+            try:
+                value = self.field.to_python(raw_value)
+            except ValidationError as exc:
+                raise InvalidCursor('Malformed cursor value.') from exc
+            queryset = queryset.filter(self._seek(value, pk, forward=direction == NEXT))
+
+        forward = direction == NEXT
+        return queryset.order_by(*get_ordering(self.sort, reverse=not forward))[:self.per_page + 1], forward
+
+    def _page(self, rows, forward, cursor):
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not forward:
+            rows.reverse()
+
+        if forward:
+            has_next, has_previous = has_more, bool(cursor)
+        else:
+            has_next, has_previous = True, has_more
+
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            last = rows[-1]
+            next_cursor = encode_cursor(self.sort, self._serialize(last), last.pk, NEXT)
+        if rows and has_previous:
+            first = rows[0]
+            previous_cursor = encode_cursor(self.sort, self._serialize(first), first.pk, PREVIOUS)
+        return CursorPage(rows, next_cursor, previous_cursor)
+
+    def page(self, cursor=None):
+        queryset, forward = self._queryset(cursor)
+        return self._page(list(queryset), forward, cursor)
+
+    async def apage(self, cursor=None):
+        queryset, forward = self._queryset(cursor)
+        return self._page([row async for row in queryset.aiterator()], forward, cursor)
+
+
+class InboxPaginator:
+    """Keyset pages of received inquiries: unread first, then newest first.
+
+    Each ``is_read`` value is paged as its own (created_at, pk) run, so every
+    page is one or two index range scans on ``(owner, is_read, created_at)``
+    however deep it is; a page spanning the end of the unread run is topped
+    up from the start of the read run. No COUNT query is issued.
+    """
+    sort = 'inbox'
+    # is_read values in display order
+    segments = (False, True)
+
+    def __init__(self, queryset, per_page):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.created_field = queryset.model._meta.get_field('created_at')
+
+    def _cursor(self, obj, direction):
+        return encode_cursor(self.sort, [obj.is_read, serialize_key(obj.created_at)], obj.pk, direction)
+
+    def _decode(self, cursor):
+        sort, raw_value, pk, direction = decode_cursor(cursor)
+        if sort != self.sort or direction not in (NEXT, PREVIOUS):
+            raise InvalidCursor('Cursor does not match the inbox order.')
+        try:
+            is_read, raw_created = raw_value
+            created_at = self.created_field.to_python(raw_created)
+        except (TypeError, ValueError, ValidationError) as exc:
+            raise InvalidCursor('Malformed cursor value.') from exc
+        if not isinstance(is_read, bool) or created_at is None:
+            raise InvalidCursor('Malformed cursor value.')
+        return is_read, created_at, pk, direction
+
+    def _segments(self, cursor):
+        """``(forward, [(segment queryset), ...])`` to read, in order, for the page."""
+        direction, start = NEXT, None
+        if cursor:
+            is_read, created_at, pk, direction = self._decode(cursor)
+            start = is_read
+        forward = direction == NEXT
+        segments = self.segments if forward else self.segments[::-1]
+        if start is not None:
+            segments = segments[segments.index(start):]
+        ordering = get_ordering('', reverse=not forward)
+        querysets = []
+        for segment in segments:
+            # is_read=False renders as NOT is_read, which SQLite cannot seek on
+            queryset = self.queryset.filter(is_read__in=[segment])
+            if segment == start:
+                queryset = queryset.filter(seek_filter('created_at', forward, created_at, pk))
+            querysets.append(queryset.order_by(*ordering))
+        return forward, querysets
+
+    def _page(self, rows, forward, cursor):
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not forward:
+            rows.reverse()
+
+        if forward:
+            has_next, has_previous = has_more, bool(cursor)
+        else:
+            has_next, has_previous = True, has_more
+        next_cursor = self._cursor(rows[-1], NEXT) if rows and has_next else None
+        previous_cursor = self._cursor(rows[0], PREVIOUS) if rows and has_previous else None
+        return CursorPage(rows, next_cursor, previous_cursor)
+
+    def page(self, cursor=None):
+        forward, querysets = self._segments(cursor)
+        rows = []
+        for queryset in querysets:
+            wanted = self.per_page + 1 - len(rows)
+            if wanted <= 0:
+                break
+            rows.extend(queryset[:wanted])
+        return self._page(rows, forward, cursor)
+
+    async def apage(self, cursor=None):
+        forward, querysets = self._segments(cursor)
+        rows = []
+        for queryset in querysets:
+            wanted = self.per_page + 1 - len(rows)
+            if wanted <= 0:
+                break
+            rows.extend([row async for row in queryset[:wanted].aiterator()])
+        return self._page(rows, forward, cursor)
+
+
+class CachedCountPaginator(Paginator):
+    """Offset paginator that takes its total from ``count_func`` instead of COUNT(*)."""
+
+    def __init__(self, object_list, per_page, count_func=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_func = count_func
+
+    @cached_property
+    def count(self):
+        if self.count_func is None:
+            return super().count
+        return self.count_func()
@@ -0,0 +1,135 @@
+"""Resized WebP/JPEG renditions of listing photos.
+
+Uploaded originals are often several hundred kilobytes, far more than a
+400px-wide card needs. Each original gets a fixed set of renditions stored
+next to it under predictable names (``1.jpg`` -> ``1.card.webp``,
+``1.card.jpg``, ...), and the ``responsive_image`` template tag offers them
+to the browser as a ``<picture>`` with ``srcset``.
+
+Originals are never overwritten in place (a new upload gets a new name), so
+an existing rendition is always current and generation can skip it. New
+uploads are rendered after commit in a small process pool
+(``PROPERTY_RENDITION_WORKERS``; 0 renders inline); the
+``generate_renditions`` command backfills existing media.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+import django
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+
+logger = logging.getLogger(__name__)
+
+# name -> maximum width in pixels; images are never upscaled
+RENDITIONS = {
+    'gallery': 300,
+    'card': 400,
+    'retina': 800,
+    'detail': 1200,
+}
+# extension -> (Pillow format, save options)
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def rendition_name(name, rendition, extension):
+    stem, _ext = os.path.splitext(name)
+    return f'{stem}.{rendition}.{extension}'
+
+
+def load_image(handle):
+    """Open an upload as an upright RGB image."""
+    image = Image.open(handle)
+    image = ImageOps.exif_transpose(image)
+    return image.convert('RGB')
+
+
+def encode_image(original, width, extension, quality=None):
+    """Return ``original`` scaled down to at most ``width`` pixels, encoded as ``extension``."""
+    image = original.copy()
+    image.thumbnail((width, width * 4), Image.LANCZOS)
+    image_format, options = FORMATS[extension]
+    if quality is not None:
+        options = dict(options, quality=quality)
+    buffer = BytesIO()
+    image.save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+def generate_renditions(name, force=False, storage=None):
+    """Write every missing rendition of the stored image ``name``.
+
+    Returns the rendition names written. Safe to run in worker processes:
+    it only touches storage, never the database.
+    """
+    storage = storage or default_storage
+    targets = [
+        (rendition, width, extension)
+        for rendition, width in RENDITIONS.items()
+        for extension in FORMATS
+        if force or not storage.exists(rendition_name(name, rendition, extension))
+    ]
+    if not targets:
+        return []
+    try:
+        with storage.open(name, 'rb') as handle:
+            original = load_image(handle)
+    except (OSError, ValueError, Image.DecompressionBombError) as exc:
+        logger.warning('Cannot render %s: %s', name, exc)
+        return []
+    written = []
+    for rendition, width, extension in targets:
+        data = encode_image(original, width, extension)
+        target = rendition_name(name, rendition, extension)
+        if storage.exists(target):
+            storage.delete(target)
+        written.append(storage.save(target, ContentFile(data)))
+    return written
+
+
+def _init_worker():
+    django.setup()
+
+
+def _render_quietly(name):
+    try:
+        generate_renditions(name)
+    except Exception:  # a bad upload must not kill the pool
+        logger.exception('Rendering %s failed', name)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def schedule_renditions(name):
+    """Render ``name`` in the background pool, or inline when it is disabled."""
+    global _pool
+    workers = getattr(settings, 'PROPERTY_RENDITION_WORKERS', 2)
+    if not workers:
+        _render_quietly(name)
+        return
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+        _pool.submit(_render_quietly, name)
+
+
+def generate_many(names, workers=None, force=False):
+    """Render ``names`` in a process pool; yields ``(name, written)`` pairs."""
+    workers = workers if workers is not None else (os.cpu_count() or 1)
+    if workers <= 1:
+        for name in names:
+            yield name, generate_renditions(name, force=force)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        yield from zip(names, pool.map(generate_renditions, names, [force] * len(names)))
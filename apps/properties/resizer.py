@@ -0,0 +1,206 @@
+"""On-demand resizing of media images for partner embeds.
+
+``/images/<width>/<quality>/<path>`` serves any image under ``MEDIA_ROOT``
+scaled to one of the whitelisted ``PROPERTY_RESIZE_WIDTHS`` and
+``PROPERTY_RESIZE_QUALITIES``. Results are kept in a disk cache under
+``PROPERTY_RESIZE_CACHE_DIR`` and evicted least-recently-used first once the
+cache grows past ``PROPERTY_RESIZE_CACHE_BYTES``.
+
+Cache keys include the source file's modification time, so replacing an
+original never serves a stale resize. Concurrent requests for the same
+missing resize wait on one striped lock (a ``flock`` where available, which
+also covers other worker processes) and share a single encode.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.utils._os import safe_join
+from PIL import Image
+
+from .renditions import encode_image, load_image
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+
+SOURCE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.gif')
+CONTENT_TYPES = {'jpg': 'image/jpeg', 'webp': 'image/webp'}
+LOCK_STRIPES = 256
+# hits refresh an entry's recency at most this often, to spare a utime per request
+TOUCH_INTERVAL = 60
+
+
+class ResizeError(Exception):
+    pass
+
+
+class DiskLRUCache:
+    """Files keyed by hex digest, evicted oldest-mtime first beyond ``max_bytes``."""
+
+    def __init__(self, directory, max_bytes):
+        self.directory = str(directory)
+        self.max_bytes = max_bytes
+        self.size = None
+        self.lock = threading.Lock()
+        self.thread_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+
+    def path(self, key, extension):
+        return os.path.join(self.directory, key[:2], f'{key}.{extension}')
+
+    def get(self, key, extension):
+        path = self.path(key, extension)
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            return None
+        if time.time() - mtime > TOUCH_INTERVAL:
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                # evicted by another process between stat and utime
+                return None
+        return path
+
+    def put(self, key, extension, data):
+        path = self.path(key, extension)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write then rename, so readers never see a partial file
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as handle:
+            handle.write(data)
+        os.replace(tmp, path)
+        with self.lock:
+            if self.size is None:
+                self.size = self._scan_size()
+            else:
+                self.size += len(data)
+            if self.size > self.max_bytes:
+                self.size = self._evict()
+        return path
+
+    def _entries(self):
+        for root, _dirs, files in os.walk(self.directory):
+            for filename in files:
+                if filename.endswith(('.tmp', '.lock')):
+                    continue
+                path = os.path.join(root, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield stat.st_mtime, stat.st_size, path
+
+    def _scan_size(self):
+        return sum(size for _mtime, size, _path in self._entries())
+
+    def _evict(self):
+        # trim to 90% of the budget so the next few writes do not rescan
+        target = self.max_bytes * 0.9
+        entries = sorted(self._entries())
+        total = sum(size for _mtime, size, _path in entries)
+        for _mtime, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        return total
+
+    @contextmanager
+    def key_lock(self, key):
+        """Serialize work on ``key`` across threads and, with flock, processes."""
+        stripe = int(key[:2], 16) % LOCK_STRIPES
+        with self.thread_locks[stripe]:
+            if fcntl is None:
+                yield
+                return
+            locks = os.path.join(self.directory, 'locks')
+            os.makedirs(locks, exist_ok=True)
+            with open(os.path.join(locks, f'{stripe:02x}.lock'), 'a') as handle:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def source_path(name):
+    """Absolute path of ``name`` under MEDIA_ROOT; raises ``ResizeError`` if unusable."""
+    if not name.lower().endswith(SOURCE_EXTENSIONS):
+        raise ResizeError('Not an image.')
+    try:
+        path = safe_join(settings.MEDIA_ROOT, name)
+    except SuspiciousFileOperation as exc:
+        raise ResizeError('Invalid path.') from exc
+    if not os.path.isfile(path):
+        raise ResizeError('No such image.')
+    return path
+
+
+def check_preset(width, quality, extension):
+    if width not in getattr(settings, 'PROPERTY_RESIZE_WIDTHS', ()):
+        raise ResizeError('Width is not an allowed preset.')
+    if quality not in getattr(settings, 'PROPERTY_RESIZE_QUALITIES', ()):
+        raise ResizeError('Quality is not an allowed preset.')
+    if extension not in CONTENT_TYPES:
+        raise ResizeError('Unsupported format.')
+
+
+def cache_key(path, width, quality, extension):
+    stat = os.stat(path)
+    raw = f'{path}:{stat.st_mtime_ns}:{stat.st_size}:{width}:{quality}:{extension}'
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_resize_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = DiskLRUCache(
+                    getattr(settings, 'PROPERTY_RESIZE_CACHE_DIR', os.path.join(settings.BASE_DIR, 'cache', 'resized')),
+                    getattr(settings, 'PROPERTY_RESIZE_CACHE_BYTES', 512 * 1024 * 1024),
+                )
+    return _cache
+
+
+def reset_resize_cache():
+    global _cache
+    with _cache_lock:
+        _cache = None
+
+
+def resized_path(name, width, quality, extension='jpg'):
+    """Return ``(cache path, key)`` for the resize, encoding it on a miss."""
+    check_preset(width, quality, extension)
+    path = source_path(name)
+    key = cache_key(path, width, quality, extension)
+    cache = get_resize_cache()
+    cached = cache.get(key, extension)
+    if cached is not None:
+        return cached, key
+    with cache.key_lock(key):
+        # another request may have finished the encode while we waited
+        cached = cache.get(key, extension)
+        if cached is not None:
+            return cached, key
+        try:
+            with open(path, 'rb') as handle:
+                original = load_image(handle)
+        except (OSError, ValueError, Image.DecompressionBombError) as exc:
+            raise ResizeError('Unreadable image.') from exc
+        return cache.put(key, extension, encode_image(original, width, extension, quality)), key
@@ -0,0 +1,165 @@
+"""Full-text search backends for property listings.
+
+``PropertyListView`` used to run ``city__icontains``/``state__icontains``,
+which no index can serve. The backends here match the search terms against
+title, description, address, city and state and can rank by relevance:
+
+- ``SQLiteFTSBackend`` keeps an FTS5 table (created by migration 0003) in sync
+  through the Property signals and ranks with ``bm25()``.
+- ``PostgresSearchBackend`` builds a weighted ``tsvector`` with
+  ``django.contrib.postgres.search`` and ranks with ``ts_rank``.
+- ``BasicSearchBackend`` is the old icontains lookup, for other databases.
+
+Pick one with ``PROPERTY_SEARCH_BACKEND`` (a dotted path, or ``'auto'`` to
+choose from the default database vendor). Rebuild the index with
+``python manage.py rebuild_search_index``.
+"""
+import re
+
+from django.conf import settings
+from itertools import groupby
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+
+TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _database(instance):
+    return instance._state.db or DEFAULT_DB_ALIAS
+
+
+def tokenize(query):
+    return TERM_RE.findall((query or '').lower())
+
+
+class BasicSearchBackend:
+    """Substring match on city/state; no index and no ranking."""
+
+    def search(self, queryset, query, rank=False):
+        for term in tokenize(query):
+            queryset = queryset.filter(Q(city__icontains=term) | Q(state__icontains=term))
+        if rank:
+            queryset = queryset.annotate(search_rank=RawSQL('0', [], output_field=FloatField()))
+        return queryset
+
+    def index(self, instance):
+        pass
+
+    def index_many(self, instances):
+        for instance in instances:
+            self.index(instance)
+
+    def remove(self, pk, using=DEFAULT_DB_ALIAS):
+        pass
+
+    def rebuild(self, using=DEFAULT_DB_ALIAS):
+        return 0
+
+
+class SQLiteFTSBackend(BasicSearchBackend):
+    table = 'properties_property_fts'
+    columns = ('title', 'description', 'address', 'city', 'state')
+    # bm25 column weights, in ``columns`` order
+    weights = (10.0, 1.0, 2.0, 5.0, 3.0)
+
+    def match_expression(self, query):
+        # quote every term so user input can never be parsed as FTS5 syntax
+        return ' '.join(f'"{term}"*' for term in tokenize(query))
+
+    def search(self, queryset, query, rank=False):
+        match = self.match_expression(query)
+        if not match:
+            return queryset
+        queryset = queryset.filter(pk__in=RawSQL(f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s', [match]))
+        if rank:
+            model_table = queryset.model._meta.db_table
+            weights = ', '.join(str(w) for w in self.weights)
+            # bm25() is lower-is-better; negate so higher ranks sort first like ts_rank
+            queryset = queryset.annotate(search_rank=RawSQL(
+                f'SELECT -bm25({self.table}, {weights}) FROM {self.table} '
+                f'WHERE {self.table} MATCH %s AND rowid = "{model_table}"."id"',
+                [match],
+                output_field=FloatField(),
+            ))
+        return queryset
+
+    def index(self, instance):
+        placeholders = ', '.join(['%s'] * (len(self.columns) + 1))
+        # each listing database (default or a shard) indexes its own rows
+        with connections[_database(instance)].cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid = %s', [instance.pk])
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, {", ".join(self.columns)}) VALUES ({placeholders})',
+                [instance.pk] + [getattr(instance, column) or '' for column in self.columns],
+            )
+
+    def index_many(self, instances):
+        placeholders = ', '.join(['%s'] * (len(self.columns) + 1))
+        for using, group in groupby(sorted(instances, key=_database), key=_database):
+            rows = [[instance.pk] + [getattr(instance, column) or '' for column in self.columns] for instance in group]
+            with connections[using].cursor() as cursor:
+                cursor.executemany(f'DELETE FROM {self.table} WHERE rowid = %s', [row[:1] for row in rows])
+                cursor.executemany(
+                    f'INSERT INTO {self.table} (rowid, {", ".join(self.columns)}) VALUES ({placeholders})', rows,
+                )
+
+    def remove(self, pk, using=DEFAULT_DB_ALIAS):
+        with connections[using].cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid = %s', [pk])
+
+    def rebuild(self, using=DEFAULT_DB_ALIAS):
+        from .models import Property
+        columns = ', '.join(self.columns)
+        with connections[using].cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, {columns}) SELECT id, {columns} FROM {Property._meta.db_table}'
+            )
+            cursor.execute(f"INSERT INTO {self.table} ({self.table}) VALUES ('optimize')")
+        return Property.objects.using(using).count()
+
+
+class PostgresSearchBackend(BasicSearchBackend):
+    """Weighted tsvector search; the vector is computed from the row, so it never drifts."""
+
+    config = 'english'
+
+    def search(self, queryset, query, rank=False):
+        from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+
+        terms = tokenize(query)
+        if not terms:
+            return queryset
+        vector = (
+            SearchVector('title', weight='A', config=self.config)
+            + SearchVector('city', 'state', weight='B', config=self.config)
+            + SearchVector('address', weight='C', config=self.config)
+            + SearchVector('description', weight='D', config=self.config)
+        )
+        search_query = SearchQuery(' & '.join(f'{term}:*' for term in terms), search_type='raw', config=self.config)
+        queryset = queryset.annotate(search_vector=vector).filter(search_vector=search_query)
+        if rank:
+            queryset = queryset.annotate(search_rank=SearchRank(vector, search_query))
+        return queryset
+
+
+BACKENDS = {
+    'sqlite': 'apps.properties.search.SQLiteFTSBackend',
+    'postgresql': 'apps.properties.search.PostgresSearchBackend',
+}
+
+_backend = None
+
+
+def get_search_backend():
+    global _backend
+    if _backend is None:
+        path = getattr(settings, 'PROPERTY_SEARCH_BACKEND', 'auto')
+        if path == 'auto':
+            path = BACKENDS.get(connection.vendor, 'apps.properties.search.BasicSearchBackend')
+        _backend = import_string(path)()
+    return _backend
@@ -0,0 +1,283 @@
+"""Synthetic production-scale data for ``perf_seed``.
+
+Listings are spread over real markets (zipcodes from the centroid file, so
+radius search works) with per-market and per-type price levels and a
+log-normal spread, realistic bedroom/area/status mixes and three years of
+creation dates. A few agents own most listings and a few listings draw most
+inquiries (Zipf-like weights), as on the live site.
+
+Rows go in with ``bulk_create`` in batches, which skips the model signals,
+so the generator does their work itself: it sets coordinates, inquiry owners
+and ``notified_at`` on each row, indexes listings for search, and rebuilds
+the inquiry counters, list count cache and in-memory indexes at the end.
+"""
+import itertools
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from apps.accounts.models import UserProfile
+
+from .autocomplete import reset_autocomplete_index
+from .counters import reconcile
+from .counts import bump_count_version
+from .geo import assign_coordinates
+from .listing_index import reset_listing_index
+from .models import Inquiry, Property, PropertyImage
+from .search import get_search_backend
+
+
+# city, state, zipcodes, share of listings, median price
+MARKETS = [
+    ('New York', 'New York', ['10001', '10016'], 14, 950_000),
+    ('Los Angeles', 'California', ['90012', '90210'], 12, 900_000),
+    ('Chicago', 'Illinois', ['60601'], 8, 380_000),
+    ('Houston', 'Texas', ['77002'], 7, 320_000),
+    ('Dallas', 'Texas', ['75201'], 6, 400_000),
+    ('Phoenix', 'Arizona', ['85001'], 6, 420_000),
+    ('Philadelphia', 'Pennsylvania', ['19103'], 5, 300_000),
+    ('Austin', 'Texas', ['78701', '78702'], 5, 550_000),
+    ('San Diego', 'California', ['92101'], 4, 850_000),
+    ('San Francisco', 'California', ['94102', '94105'], 4, 1_300_000),
+    ('Seattle', 'Washington', ['98101', '98102'], 4, 800_000),
+    ('Denver', 'Colorado', ['80201', '80202'], 4, 600_000),
+    ('Miami', 'Florida', ['33130', '33139'], 4, 600_000),
+    ('Atlanta', 'Georgia', ['30303'], 4, 400_000),
+    ('Boston', 'Massachusetts', ['02101', '02108'], 3, 800_000),
+    ('Charlotte', 'North Carolina', ['28202'], 3, 380_000),
+    ('Washington', 'District of Columbia', ['20001'], 3, 700_000),
+    ('Scottsdale', 'Arizona', ['85250'], 2, 750_000),
+    ('Nashville', 'Tennessee', ['37203'], 2, 450_000),
+    ('Detroit', 'Michigan', ['48226'], 2, 220_000),
+    ('Minneapolis', 'Minnesota', ['55401'], 2, 350_000),
+    ('Portland', 'Oregon', ['97201', '97209'], 2, 520_000),
+    ('Las Vegas', 'Nevada', ['89101'], 2, 420_000),
+    ('Salt Lake City', 'Utah', ['84101'], 1, 500_000),
+    ('Honolulu', 'Hawaii', ['96813'], 1, 900_000),
+]
+
+# type, share of listings, price factor, bedroom range, square feet per bedroom
+PROPERTY_TYPES = [
+    (Property.HOUSE, 40, 1.0, (2, 6), 650),
+    (Property.APARTMENT, 25, 0.55, (0, 3), 450),
+    (Property.CONDO, 15, 0.7, (1, 3), 500),
+    (Property.TOWNHOUSE, 10, 0.8, (2, 4), 550),
+    (Property.LAND, 5, 0.35, (0, 0), 0),
+    (Property.COMMERCIAL, 5, 1.6, (0, 0), 0),
+]
+
+STATUSES = [(Property.AVAILABLE, 70), (Property.SOLD, 15), (Property.PENDING, 10), (Property.RENTED, 5)]
+
+ADJECTIVES = ['Bright', 'Charming', 'Modern', 'Spacious', 'Renovated', 'Cozy', 'Elegant', 'Sunny', 'Quiet', 'Historic']
+STREETS = ['Oak', 'Maple', 'Cedar', 'Pine', 'Lake', 'Hill', 'Park', 'Main', 'Elm', 'Washington', 'River', 'Sunset']
+STREET_SUFFIXES = ['Street', 'Avenue', 'Drive', 'Lane', 'Road', 'Court', 'Boulevard']
+FEATURES = [
+    'hardwood floors', 'an updated kitchen', 'a private backyard', 'floor-to-ceiling windows', 'a two-car garage',
+    'a rooftop terrace', 'walk-in closets', 'a home office', 'mountain views', 'a renovated bathroom',
+    'central air conditioning', 'a finished basement', 'a gas fireplace', 'in-unit laundry', 'a swimming pool',
+]
+MESSAGES = [
+    'Is this property still available? I would like to schedule a viewing this weekend.',
+    'Could you share the HOA fees and property taxes for this listing?',
+    'We are relocating for work next month. Is the seller open to offers?',
+    'Are pets allowed? We have a small dog.',
+    'What is the earliest move-in date, and are any appliances included?',
+    'I am pre-approved for a mortgage and very interested. Can we talk this week?',
+]
+FIRST_NAMES = ['James', 'Maria', 'Wei', 'Aisha', 'Carlos', 'Emma', 'Noah', 'Priya', 'Liam', 'Sofia', 'Omar', 'Hana']
+LAST_NAMES = ['Smith', 'Garcia', 'Chen', 'Johnson', 'Patel', 'Kim', 'Nguyen', 'Brown', 'Lopez', 'Okafor', 'Rossi']
+# the sample photos shipped in media/
+PHOTOS = [f'{n}.jpg' for n in range(1, 16)]
+
+SEED_PREFIX = 'perf_'
+
+
+def zipf_weights(count, exponent):
+    """Cumulative weights where item ``i`` is ``1 / (i + 1) ** exponent`` as popular."""
+    return list(itertools.accumulate(1 / (rank + 1) ** exponent for rank in range(count)))
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Let ``bulk_create`` keep the ``auto_now``/``auto_now_add`` values we set."""
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Seeder:
+    def __init__(self, users=2_000, properties=100_000, inquiries=1_000_000, images_per_property=3,
+                 agent_share=0.1, batch_size=5_000, seed=42, password='perf-pass', log=None):
+        self.user_count = users
+        self.property_count = properties
+        self.inquiry_count = inquiries
+        self.images_per_property = images_per_property
+        self.agent_share = agent_share
+        self.batch_size = batch_size
+        self.random = random.Random(seed)
+        self.password = password
+        self.log = log or (lambda message: None)
+        self.now = timezone.now()
+
+    def _pick(self, choices):
+        return self.random.choices([choice[0] for choice in choices], weights=[choice[1] for choice in choices])[0]
+
+    # -- users ---------------------------------------------------------------
+
+    def seed_users(self):
+        agents = max(1, int(self.user_count * self.agent_share))
+        # hashing is deliberately slow, so every seeded user shares one hash
+        password = make_password(self.password)
+        rows = []
+        for n in range(self.user_count):
+            role = 'agent' if n < agents else 'buyer'
+            first, last = self.random.choice(FIRST_NAMES), self.random.choice(LAST_NAMES)
+            username = f'{SEED_PREFIX}{role}_{n:06d}'
+            rows.append(User(
+                username=username, email=f'{username}@example.com', first_name=first, last_name=last,
+                password=password, date_joined=self.now - timedelta(days=self.random.randint(0, 1500)),
+            ))
+        for batch in batched(rows, self.batch_size):
+            User.objects.bulk_create(batch)
+        users = list(User.objects.filter(username__startswith=SEED_PREFIX).order_by('pk').values_list('pk', flat=True))
+        self.agent_ids, self.buyer_ids = users[:agents], users[agents:] or users[:agents]
+        profiles = []
+        for user_id in self.agent_ids:
+            digest = self._pick([(UserProfile.IMMEDIATE, 80), (UserProfile.HOURLY, 15), (UserProfile.DAILY, 5)])
+            profiles.append(UserProfile(user_id=user_id, role=UserProfile.AGENT, digest_mode=digest,
+                                        phone=f'555-{self.random.randint(0, 9999):04d}'))
+        profiles.extend(UserProfile(user_id=user_id, role=UserProfile.BUYER) for user_id in users[agents:])
+        for batch in batched(profiles, self.batch_size):
+            UserProfile.objects.bulk_create(batch)
+        self.log(f'users: {len(users)} ({len(self.agent_ids)} agents)')
+
+    # -- listings ------------------------------------------------------------
+
+    def make_property(self, owner_id):
+        city, state, zipcodes, _share, median = self.random.choices(MARKETS, weights=[m[3] for m in MARKETS])[0]
+        kind, _share, factor, (low, high), per_bedroom = self.random.choices(PROPERTY_TYPES, weights=[t[1] for t in PROPERTY_TYPES])[0]
+        bedrooms = self.random.randint(low, high)
+        if per_bedroom:
+            area = int(max(bedrooms, 1) * per_bedroom * self.random.uniform(0.8, 1.4))
+            bathrooms = Decimal(max(1, min(bedrooms, round(bedrooms * self.random.uniform(0.5, 1.0) * 2) / 2)))
+        else:
+            area = self.random.randint(2_000, 40_000)
+            bathrooms = Decimal(0 if kind == Property.LAND else self.random.randint(1, 4))
+        price = median * factor * (area / 1500) ** 0.5 * self.random.lognormvariate(0, 0.35)
+        created = self.now - timedelta(days=self.random.uniform(0, 3 * 365))
+        label = dict(Property.PROPERTY_TYPE_CHOICES)[kind]
+        features = self.random.sample(FEATURES, 3)
+        prop = Property(
+            title=f"{self.random.choice(ADJECTIVES)} {f'{bedrooms}-Bed ' if bedrooms else ''}{label} in {city}",
+            description=(
+                f'{label} in {city}, {state} with {features[0]}, {features[1]} and {features[2]}. '
+                f'{area:,} square feet, close to shops, schools and transit.'
+            ),
+            price=Decimal(max(25_000, round(price, -3))),
+            address=f'{self.random.randint(1, 9999)} {self.random.choice(STREETS)} {self.random.choice(STREET_SUFFIXES)}',
+            city=city, state=state, zipcode=self.random.choice(zipcodes),
+            bedrooms=bedrooms, bathrooms=bathrooms, area=area, property_type=kind,
+            status=self._pick(STATUSES), owner_id=owner_id,
+            featured_image=self.random.choice(PHOTOS) if self.random.random() < 0.9 else None,
+            created_at=created, updated_at=created + timedelta(days=self.random.uniform(0, 30)),
+        )
+        assign_coordinates(prop)
+        return prop
+
+    def seed_properties(self):
+        search = get_search_backend()
+        owners = zipf_weights(len(self.agent_ids), 1.1)
+        created = 0
+        for start in range(0, self.property_count, self.batch_size):
+            size = min(self.batch_size, self.property_count - start)
+            owner_ids = self.random.choices(self.agent_ids, cum_weights=owners, k=size)
+            with transaction.atomic():
+                batch = Property.objects.bulk_create([self.make_property(owner_id) for owner_id in owner_ids])
+                search.index_many(batch)
+            created += len(batch)
+            self.log(f'properties: {created}/{self.property_count}')
+        rows = Property.objects.filter(owner_id__in=self.agent_ids).order_by('pk').values_list('pk', 'owner_id', 'created_at')
+        self.properties = list(rows)
+
+    def seed_images(self):
+        images = []
+        for property_id, _owner_id, created in self.properties:
+            count = min(12, int(self.random.expovariate(1 / self.images_per_property))) if self.images_per_property else 0
+            images.extend(
+                PropertyImage(property_id=property_id, image=self.random.choice(PHOTOS), caption=f'Photo {n + 1}', uploaded_at=created)
+                for n in range(count)
+            )
+        for batch in batched(images, self.batch_size):
+            PropertyImage.objects.bulk_create(batch)
+        self.log(f'gallery images: {len(images)}')
+
+    # -- inquiries -----------------------------------------------------------
+
+    def make_inquiry(self, prop, buyer_id):
+        property_id, owner_id, listed = prop
+        created = listed + (self.now - listed) * self.random.random() ** 2
+        age_days = (self.now - created).days
+        first, last = self.random.choice(FIRST_NAMES), self.random.choice(LAST_NAMES)
+        return Inquiry(
+            related_property_id=property_id, owner_id=owner_id, user_id=buyer_id,
+            name=f'{first} {last}', email=f'{first}.{last}@example.com'.lower(),
+            phone=f'555-{self.random.randint(0, 9999):04d}' if self.random.random() < 0.6 else None,
+            message=self.random.choice(MESSAGES),
+            created_at=created, notified_at=created,
+            # agents have read most of last month's leads, few of today's
+            is_read=self.random.random() < min(0.95, 0.3 + age_days / 40),
+        )
+
+    def seed_inquiries(self):
+        popularity = zipf_weights(len(self.properties), 0.8)
+        # rank order is shuffled so popular listings are not just the oldest ones
+        ranked = self.properties[:]
+        self.random.shuffle(ranked)
+        created = 0
+        for start in range(0, self.inquiry_count, self.batch_size):
+            size = min(self.batch_size, self.inquiry_count - start)
+            targets = self.random.choices(ranked, cum_weights=popularity, k=size)
+            buyers = self.random.choices(self.buyer_ids, k=size)
+            with transaction.atomic():
+                Inquiry.objects.bulk_create([self.make_inquiry(prop, buyer) for prop, buyer in zip(targets, buyers)])
+            created += size
+            if created % (self.batch_size * 20) == 0 or created == self.inquiry_count:
+                self.log(f'inquiries: {created}/{self.inquiry_count}')
+
+    def run(self):
+        with explicit_timestamps(Property, PropertyImage, Inquiry):
+            self.seed_users()
+            self.seed_properties()
+            self.seed_images()
+            if self.properties and self.buyer_ids:
+                self.seed_inquiries()
+        reconcile()
+        bump_count_version()
+        reset_listing_index()
+        reset_autocomplete_index()
+        return {
+            'users': self.user_count,
+            'properties': len(self.properties),
+            'inquiries': self.inquiry_count if self.properties else 0,
+        }
@@ -0,0 +1,361 @@
+"""Geographic sharding of listings across databases.
+
+With ``PROPERTY_SHARDS`` set, new listings are stored on a shard chosen by
+their state: ``PROPERTY_SHARD_STATES`` pins named states, and any other state
+is spread by a stable hash. A listing's photos, inquiries and unread counter
+live on the same shard. Users, profiles, jobs and everything else stay on
+``default``, which also keeps the listings created before sharding was
+turned on (shard 0).
+
+Each shard hands out primary keys from its own range, ``index << 40``
+upwards (set up by ``reserve_pk_ranges`` after ``migrate --database``), so
+a pk alone says which database holds the row. ``ShardRouter`` routes saves
+by the row's shard, URLs carrying a pk are scoped to its shard by
+``shard_by_pk``, and the unscoped list and inbox pages read every shard
+through ``ScatterQuerySet``, which merges the sorted rows of each.
+
+Shard aliases must keep their order in ``PROPERTY_SHARDS``: appending is
+fine, reordering or removing one reassigns pk ranges.
+"""
+import functools
+import heapq
+import itertools
+import zlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Count, Max, Min, QuerySet, Sum
+from django.db.models.fields import AutoFieldMixin
+
+
+SHARD_PK_BITS = 40
+
+# sharded model -> field holding the pk of the listing it belongs to
+SHARD_KEYS = {
+    'property': 'pk',
+    'propertyimage': 'property_id',
+    'inquiry': 'related_property_id',
+    'propertyinquirycounter': 'property_id',
+}
+
+# aggregates ScatterQuerySet can combine from per-shard results
+COMBINE = {Count: sum, Sum: sum, Max: max, Min: min}
+
+_scope = ContextVar('property_shard', default=None)
+
+
+def shard_aliases():
+    return list(getattr(settings, 'PROPERTY_SHARDS', []))
+
+
+def listing_databases():
+    """Every database holding listings: ``default`` first, then the shards."""
+    return [DEFAULT_DB_ALIAS, *shard_aliases()]
+
+
+def is_sharded_model(model):
+    return model._meta.app_label == 'properties' and model._meta.model_name in SHARD_KEYS
+
+
+def shard_for_state(state):
+    shards = shard_aliases()
+    if not shards:
+        return DEFAULT_DB_ALIAS
+    key = (state or '').strip().casefold()
+    pinned = {name.strip().casefold(): alias for name, alias in getattr(settings, 'PROPERTY_SHARD_STATES', {}).items()}
+    if key in pinned:
+        return pinned[key]
+    return shards[zlib.crc32(key.encode()) % len(shards)]
+
+
+def shard_for_pk(pk):
+    """The database holding the listing-side row with this pk."""
+    shards = shard_aliases()
+    try:
+        index = int(pk) >> SHARD_PK_BITS
+    except (TypeError, ValueError):
+        return DEFAULT_DB_ALIAS
+    # index 0 is default; an unknown index can only be a bogus pk, which default 404s
+    return shards[index - 1] if 0 < index <= len(shards) else DEFAULT_DB_ALIAS
+
+
+def pk_range_start(alias):
+    return (shard_aliases().index(alias) + 1) << SHARD_PK_BITS
+
+
+def shard_for_instance(obj):
+    """The database a sharded model instance belongs on, or None when it cannot tell yet."""
+    field = SHARD_KEYS[obj._meta.model_name]
+    if field == 'pk' and obj.pk is None:
+        return shard_for_state(obj.state)
+    # read without loading: a deferred key, or one not assigned yet in __init__, is unknown
+    value = obj.__dict__.get(field)
+    return None if value is None else shard_for_pk(value)
+
+
+@contextmanager
+def use_shard(alias):
+    """Send unhinted queries on the sharded models to ``alias`` for the block."""
+    token = _scope.set(alias)
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+def shard_by_pk(view):
+    """Scope a view to the shard of the listing, photo or inquiry named by its ``pk`` kwarg."""
+    if iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            with use_shard(shard_for_pk(kwargs.get('pk'))):
+                return await view(request, *args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with use_shard(shard_for_pk(kwargs.get('pk'))):
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+def on_signal_database(receiver):
+    """Run a signal receiver scoped to the database the signal's save or delete used."""
+    @functools.wraps(receiver)
+    def wrapper(sender, **kwargs):
+        with use_shard(kwargs.get('using', DEFAULT_DB_ALIAS)):
+            return receiver(sender, **kwargs)
+    return wrapper
+
+
+def with_users(queryset, *fields):
+    """``select_related`` for user relations, which cannot be joined from a shard."""
+    if shard_aliases():
+        return queryset.prefetch_related(*fields)
+    return queryset.select_related(*fields)
+
+
+class ShardedQuerySet(QuerySet):
+    def create(self, **kwargs):
+        # QuerySet.create picks the database before the row exists; let save() place it instead
+        if self._db is not None or not shard_aliases():
+            return super().create(**kwargs)
+        obj = self.model(**kwargs)
+        self._for_write = True
+        obj.save(force_insert=True)
+        return obj
+
+
+class ShardRouter:
+    """Route the sharded models; returns None for everything else."""
+
+    def db_for_read(self, model, **hints):
+        if not is_sharded_model(model):
+            return None
+        instance = hints.get('instance')
+        if instance is not None and is_sharded_model(instance):
+            return self.shard_only(instance._state.db or shard_for_instance(instance))
+        return self.shard_only(_scope.get())
+
+    def db_for_write(self, model, **hints):
+        if not is_sharded_model(model):
+            return None
+        instance = hints.get('instance')
+        if instance is not None and is_sharded_model(instance):
+            return self.shard_only(shard_for_instance(instance) or instance._state.db)
+        return self.shard_only(_scope.get())
+
+    def shard_only(self, alias):
+        # default is left to the next router, so replicas and sticky writes keep working
+        return alias if alias in shard_aliases() else None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = listing_databases()
+        if not shard_aliases() or obj1._state.db not in databases or obj2._state.db not in databases:
+            return None
+        if is_sharded_model(obj1) and is_sharded_model(obj2):
+            # a row not yet tied to a listing is placed by it when saved
+            first, second = shard_for_instance(obj1), shard_for_instance(obj2)
+            return first is None or second is None or first == second
+        # listings reference users on default
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db not in shard_aliases():
+            return None
+        if model_name is not None:
+            return app_label == 'properties' and model_name in SHARD_KEYS
+        # data migrations only backfill default; hints={'sharded': True} marks per-shard setup
+        return app_label == 'properties' and hints.get('sharded', False)
+
+
+def reserve_pk_ranges(using=DEFAULT_DB_ALIAS, **kwargs):
+    """Start each sharded table's pk sequence on shard ``using`` at its range."""
+    if using not in shard_aliases():
+        return
+    from django.apps import apps
+    connection = connections[using]
+    start = pk_range_start(using)
+    with connection.cursor() as cursor:
+        for model in apps.get_app_config('properties').get_models():
+            if not is_sharded_model(model) or not isinstance(model._meta.pk, AutoFieldMixin):
+                continue
+            table = model._meta.db_table
+            if connection.vendor == 'sqlite':
+                cursor.execute('UPDATE sqlite_sequence SET seq = %s WHERE name = %s AND seq < %s', [start, table, start])
+                cursor.execute(
+                    'INSERT INTO sqlite_sequence (name, seq) SELECT %s, %s '
+                    'WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = %s)',
+                    [table, start, table],
+                )
+            elif connection.vendor == 'postgresql':
+                cursor.execute(
+                    f"SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+                    f'GREATEST(%s, (SELECT COALESCE(MAX(id), 0) FROM {connection.ops.quote_name(table)})))',
+                    [table, start],
+                )
+            else:
+                raise ImproperlyConfigured(f'Shard pk ranges need SQLite or PostgreSQL, not {connection.vendor}.')
+
+
+def _sort_fields(queryset):
+    ordering = queryset.query.order_by or queryset.model._meta.ordering
+    for name in ordering:
+        if not isinstance(name, str) or '__' in name or name.startswith('?'):
+            raise ValueError(f'Cannot merge shard results ordered by {name!r}.')
+    fields = [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+    if not any(name in ('pk', 'id') for name, _ in fields):
+        fields.append(('pk', False))
+    return fields
+
+
+def _merge_key(fields):
+    def compare(a, b):
+        for name, descending in fields:
+            x, y = getattr(a, name), getattr(b, name)
+            if x != y:
+                before = x > y if descending else x < y
+                return -1 if before else 1
+        return 0
+    return functools.cmp_to_key(compare)
+
+
+class ScatterQuerySet:
+    """A listing-side queryset read from every database in ``listing_databases()``.
+
+    Filtering and ordering apply to each database's query. Slicing fetches
+    up to the slice's end from each database in the queryset's order (which
+    must be plain fields, ending in a unique one such as pk) and merges them,
+    so ``[100:110]`` reads 110 rows per database; keyset (cursor) pages read
+    only a page from each. ``count()`` and ``aggregate()`` with Count, Sum,
+    Max and Min add up the per-database results.
+    """
+    ordered = True
+
+    def __init__(self, queryset, low=0, high=None):
+        self.queryset = queryset
+        self.low = low
+        self.high = high
+        self._result = None
+
+    @property
+    def model(self):
+        return self.queryset.model
+
+    def _clone(self, queryset):
+        if self.low or self.high is not None:
+            raise TypeError('Cannot filter a sliced ScatterQuerySet.')
+        return ScatterQuerySet(queryset)
+
+    def filter(self, *args, **kwargs):
+        return self._clone(self.queryset.filter(*args, **kwargs))
+
+    def exclude(self, *args, **kwargs):
+        return self._clone(self.queryset.exclude(*args, **kwargs))
+
+    def order_by(self, *fields):
+        return self._clone(self.queryset.order_by(*fields))
+
+    def select_related(self, *fields):
+        return self._clone(self.queryset.select_related(*fields))
+
+    def prefetch_related(self, *lookups):
+        return self._clone(self.queryset.prefetch_related(*lookups))
+
+    def annotate(self, *args, **kwargs):
+        return self._clone(self.queryset.annotate(*args, **kwargs))
+
+    def querysets(self):
+        # outside a shard scope default is left to the routers, so its reads can use a replica
+        default = self.queryset.using(None if _scope.get() is None else DEFAULT_DB_ALIAS)
+        return [default, *(self.queryset.using(alias) for alias in shard_aliases())]
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            rows = list(self[key:key + 1])
+            if not rows:
+                raise IndexError(key)
+            return rows[0]
+        if key.step is not None or (key.start or 0) < 0 or (key.stop is not None and key.stop < 0):
+            raise ValueError('ScatterQuerySet only supports non-negative slices without a step.')
+        low = self.low + (key.start or 0)
+        high = self.high
+        if key.stop is not None:
+            stop = self.low + key.stop
+            high = stop if high is None else min(high, stop)
+        return ScatterQuerySet(self.queryset, low, max(low, high) if high is not None else None)
+
+    def _fetch(self):
+        if self._result is None:
+            fields = _sort_fields(self.queryset)
+            parts = [list(qs if self.high is None else qs[:self.high]) for qs in self.querysets()]
+            merged = heapq.merge(*parts, key=_merge_key(fields))
+            self._result = list(itertools.islice(merged, self.low, self.high))
+        return self._result
+
+    def __iter__(self):
+        return iter(self._fetch())
+
+    def __len__(self):
+        return len(self._fetch())
+
+    def __bool__(self):
+        return bool(self._fetch())
+
+    def count(self):
+        if self.low or self.high is not None:
+            return len(self._fetch())
+        return sum(qs.count() for qs in self.querysets())
+
+    def exists(self):
+        return any(qs.exists() for qs in self.querysets())
+
+    def aggregate(self, **aggregates):
+        for name, aggregate in aggregates.items():
+            if type(aggregate) not in COMBINE or getattr(aggregate, 'distinct', False):
+                raise TypeError(f'Cannot combine {type(aggregate).__name__} across shards ({name}).')
+        results = [qs.aggregate(**aggregates) for qs in self.querysets()]
+        combined = {}
+        for name, aggregate in aggregates.items():
+            values = [result[name] for result in results if result[name] is not None]
+            combined[name] = COMBINE[type(aggregate)](values) if values else (0 if type(aggregate) is Count else None)
+        return combined
+
+    async def aiterator(self, chunk_size=None):
+        for row in await sync_to_async(self._fetch)():
+            yield row
+
+    async def acount(self):
+        return await sync_to_async(self.count)()
+
+    async def aaggregate(self, **aggregates):
+        return await sync_to_async(self.aggregate)(**aggregates)
+
+
+def scatter(queryset):
+    """``queryset`` across every listing database when sharding is on; unchanged otherwise."""
+    return ScatterQuerySet(queryset) if shard_aliases() else queryset
@@ -0,0 +1,200 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.db import transaction
+from django.dispatch import receiver
+from .models import Property, PropertyImage, Inquiry
+from . import counters
+from .counts import bump_count_version
+from .search import get_search_backend
+from .listing_index import get_listing_index
+from .geo import assign_coordinates
+from .autocomplete import get_autocomplete_index
+from .renditions import rendition_name, schedule_renditions
+from .storage import release_blob
+from .sharding import on_signal_database
+
+
+@receiver(pre_save, sender=Property)
+def geocode_property(sender, instance, **kwargs):
+    """Fill missing coordinates from the zipcode and keep the geohash current."""
+    assign_coordinates(instance)
+
+
+def _photo_field(sender):
+    return 'featured_image' if sender is Property else 'image'
+
+
+def _stored_fields(sender, instance, raw):
+    """The columns the post_save receivers below compare against for this save."""
+    if sender is Inquiry:
+        # read/unread changes, for the counters
+        return [] if raw else ['is_read']
+    fields = []
+    if sender is Property:
+        # city/state/status, for moving the listing between autocomplete terms
+        if get_autocomplete_index().built:
+            fields += ['city', 'state', 'status']
+        # the owner, for handing the inquiries over on a transfer
+        if not raw:
+            fields.append('owner_id')
+    # the photo, when a new upload (not yet committed) or a clear may replace it
+    image = getattr(instance, _photo_field(sender))
+    if not raw and not (image and getattr(image, '_committed', True)):
+        fields.append(_photo_field(sender))
+    return fields
+
+
+@receiver(pre_save, sender=Property)
+@receiver(pre_save, sender=PropertyImage)
+@receiver(pre_save, sender=Inquiry)
+@on_signal_database
+def remember_stored_state(sender, instance, raw=False, **kwargs):
+    """Note the stored values the post_save receivers need, read in one query."""
+    instance._stored = {}
+    fields = _stored_fields(sender, instance, raw)
+    if instance.pk and fields:
+        instance._stored = sender.objects.filter(pk=instance.pk).values(*fields).first() or {}
+
+
+@receiver(post_save, sender=Property)
+@receiver(post_delete, sender=Property)
+def invalidate_property_counts(sender, instance, using, **kwargs):
+    """Invalidate cached list counts whenever a listing changes."""
+    # after commit, or a request in between could cache the old count under the new version
+    transaction.on_commit(bump_count_version, using=using)
+
+
+@receiver(post_save, sender=Property)
+def index_property(sender, instance, **kwargs):
+    """Keep the full-text search index in step with the listing."""
+    get_search_backend().index(instance)
+
+
+@receiver(post_delete, sender=Property)
+def unindex_property(sender, instance, using, **kwargs):
+    """Drop a deleted listing from the full-text search index."""
+    get_search_backend().remove(instance.pk, using=using)
+
+
+@receiver(post_save, sender=Property)
+def update_listing_index(sender, instance, **kwargs):
+    """Patch the in-memory listing index once the write is committed."""
+    index = get_listing_index()
+    if index is not None:
+        transaction.on_commit(lambda: index.upsert(instance))
+
+
+@receiver(post_delete, sender=Property)
+def remove_from_listing_index(sender, instance, **kwargs):
+    """Drop a deleted listing from the in-memory index once committed."""
+    index = get_listing_index()
+    if index is not None:
+        pk = instance.pk
+        transaction.on_commit(lambda: index.remove(pk))
+
+
+@receiver(post_save, sender=Property)
+def update_autocomplete(sender, instance, **kwargs):
+    """Move the listing between autocomplete terms once the write is committed."""
+    index = get_autocomplete_index()
+    if not index.built:
+        return
+    stored = getattr(instance, '_stored', {})
+    current = (instance.city, instance.state, instance.status)
+
+    def apply():
+        if stored.get('status') == Property.AVAILABLE:
+            index.apply(stored['city'], stored['state'], -1)
+        if current[2] == Property.AVAILABLE:
+            index.apply(current[0], current[1], 1)
+    transaction.on_commit(apply)
+
+
+@receiver(post_delete, sender=Property)
+def remove_from_autocomplete(sender, instance, **kwargs):
+    """Drop a deleted listing from the autocomplete counts once committed."""
+    index = get_autocomplete_index()
+    if index.built and instance.status == Property.AVAILABLE:
+        city, state = instance.city, instance.state
+        transaction.on_commit(lambda: index.apply(city, state, -1))
+
+
+def _needs_renditions(image):
+    if not image:
+        return False
+    storage = image.storage
+    return storage.exists(image.name) and not storage.exists(rendition_name(image.name, 'card', 'jpg'))
+
+
+@receiver(post_save, sender=Property)
+@receiver(post_save, sender=PropertyImage)
+def render_uploaded_image(sender, instance, raw=False, **kwargs):
+    """Queue WebP/JPEG renditions for a newly uploaded photo once committed."""
+    image = instance.featured_image if sender is Property else instance.image
+    if not raw and _needs_renditions(image):
+        name = image.name
+        transaction.on_commit(lambda: schedule_renditions(name))
+
+
+@receiver(post_save, sender=Property)
+@receiver(post_save, sender=PropertyImage)
+def release_replaced_photo(sender, instance, using, **kwargs):
+    """Delete a replaced photo's blob once nothing references it."""
+    previous = getattr(instance, '_stored', {}).get(_photo_field(sender))
+    image = getattr(instance, _photo_field(sender))
+    if previous and previous != image.name:
+        storage = image.storage
+        transaction.on_commit(lambda: release_blob(storage, previous), using=using)
+
+
+@receiver(post_delete, sender=Property)
+@receiver(post_delete, sender=PropertyImage)
+def release_deleted_photo(sender, instance, using, **kwargs):
+    """Delete a removed listing photo's blob once nothing references it."""
+    image = getattr(instance, _photo_field(sender))
+    if image:
+        storage, name = image.storage, image.name
+        transaction.on_commit(lambda: release_blob(storage, name), using=using)
+
+
+@receiver(pre_save, sender=Inquiry)
+def assign_inquiry_owner(sender, instance, raw=False, using=None, **kwargs):
+    """Copy the listing's owner onto the inquiry for the received inbox."""
+    if not instance.related_property_id:
+        return
+    if not raw:
+        instance.owner_id = instance.related_property.owner_id
+    elif instance.owner_id is None:
+        # fixtures saved before inquiries had an owner leave it out
+        instance.owner_id = (
+            Property.objects.using(using).filter(pk=instance.related_property_id)
+            .values_list('owner_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Inquiry)
+@on_signal_database
+def count_inquiry(sender, instance, created, raw=False, **kwargs):
+    """Apply a new inquiry or a read/unread change to the counters."""
+    if raw:
+        return
+    if created:
+        counters.inquiry_created(instance)
+    elif getattr(instance, '_stored', {}).get('is_read') not in (None, instance.is_read):
+        counters.read_changed(instance)
+
+
+@receiver(post_delete, sender=Inquiry)
+@on_signal_database
+def uncount_inquiry(sender, instance, **kwargs):
+    """Take a deleted inquiry off the counters."""
+    counters.inquiry_deleted(instance)
+
+
+@receiver(post_save, sender=Property)
+@on_signal_database
+def transfer_inquiries(sender, instance, **kwargs):
+    """Hand a listing's inquiries and their counts to its new owner."""
+    previous = getattr(instance, '_stored', {}).get('owner_id')
+    if previous is not None and previous != instance.owner_id:
+        Inquiry.objects.filter(related_property=instance).update(owner_id=instance.owner_id)
+        counters.owner_changed(instance.pk, previous, instance.owner_id)
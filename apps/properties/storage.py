@@ -0,0 +1,88 @@
+"""Content-addressed storage for listing photos.
+
+Agents often upload the same photo to several listings. ``PhotoStorage``
+names every upload after the SHA-256 of its bytes
+(``blobs/ab/cd/abcd...ef.jpg``), so a duplicate upload resolves to the blob
+that is already stored instead of writing another copy, and renditions
+(named after the blob) are rendered once per unique image.
+
+A blob is shared by every ``Property.featured_image`` and
+``PropertyImage.image`` that points at it; ``blob_references`` counts them,
+and the signals delete a blob and its renditions only when the last
+reference goes away. Files stored before this backend keep their old names.
+"""
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+from .renditions import FORMATS, RENDITIONS, rendition_name
+
+
+BLOB_PREFIX = 'blobs/'
+
+
+def content_hash(content, chunk_size=64 * 1024):
+    """SHA-256 hex digest of a Django ``File``, read in chunks."""
+    digest = hashlib.sha256()
+    for chunk in content.chunks(chunk_size):
+        digest.update(chunk)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return digest.hexdigest()
+
+
+def blob_name(digest, original_name):
+    extension = os.path.splitext(original_name)[1].lower()
+    return f'{BLOB_PREFIX}{digest[:2]}/{digest[2:4]}/{digest}{extension}'
+
+
+class PhotoStorage(FileSystemStorage):
+    """File system storage that names files by content and stores each once."""
+
+    def save(self, name, content, max_length=None):
+        if content is None:
+            raise ValueError('No content to save.')
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = blob_name(content_hash(content), name or getattr(content, 'name', ''))
+        if self.exists(name):
+            return name
+        # a concurrent upload of the same bytes can still win the race; the
+        # default name collision handling then stores one extra copy
+        return super().save(name, content, max_length=max_length)
+
+
+def photo_storage():
+    return PhotoStorage()
+
+
+def is_blob(name):
+    return bool(name) and name.startswith(BLOB_PREFIX)
+
+
+def blob_references(name):
+    """Number of Property and PropertyImage rows, on every listing database, using the stored file ``name``."""
+    from .models import Property, PropertyImage
+    from .sharding import listing_databases
+    return sum(
+        Property.objects.using(alias).filter(featured_image=name).count()
+        + PropertyImage.objects.using(alias).filter(image=name).count()
+        for alias in listing_databases()
+    )
+
+
+def delete_with_renditions(storage, name):
+    for rendition in RENDITIONS:
+        for extension in FORMATS:
+            storage.delete(rendition_name(name, rendition, extension))
+    storage.delete(name)
+
+
+def release_blob(storage, name):
+    """Delete an unreferenced blob and its renditions; returns whether it was deleted."""
+    if not is_blob(name) or blob_references(name):
+        return False
+    delete_with_renditions(storage, name)
+    return True
@@ -0,0 +1,59 @@
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.utils import timezone
+
+from apps.accounts.models import UserProfile
+from apps.jobs.queue import enqueue, task
+
+from .models import Inquiry
+from .sharding import shard_for_pk, use_shard, with_users
+
+
+SEND_INQUIRY_NOTIFICATION = 'properties.send_inquiry_notification'
+
+
+def wants_digest(owner_id):
+    # owners without a profile keep the default one-email-per-inquiry
+    return UserProfile.objects.filter(user_id=owner_id).exclude(digest_mode=UserProfile.IMMEDIATE).exists()
+
+
+def notify_owner(inquiry, property_url):
+    """Queue the owner's email, unless they get inquiries in a digest."""
+    if wants_digest(inquiry.owner_id):
+        return None
+    return enqueue(SEND_INQUIRY_NOTIFICATION, {'inquiry_id': inquiry.pk, 'property_url': property_url})
+
+
+@task(SEND_INQUIRY_NOTIFICATION)
+def send_inquiry_notification(payload, context):
+    """Email the listing owner about a new inquiry."""
+    with use_shard(shard_for_pk(payload['inquiry_id'])):
+        _send_inquiry_notification(payload, context)
+
+
+def _send_inquiry_notification(payload, context):
+    inquiry = (
+        with_users(Inquiry.objects.select_related('related_property'), 'owner')
+        .filter(pk=payload['inquiry_id'])
+        .first()
+    )
+    if inquiry is None or inquiry.notified_at:
+        # deleted before the worker got to it, or already sent
+        return
+    property_obj = inquiry.related_property
+    if wants_digest(inquiry.owner_id):
+        # the owner switched to digests since the inquiry was queued
+        return
+    if not inquiry.owner.email:
+        return
+    subject = f"New Inquiry for {property_obj.title}"
+    message = (
+        f"You have received a new inquiry for your property '{property_obj.title}'.\n\n"
+        f"From: {inquiry.name} ({inquiry.email})\n"
+        f"Phone: {inquiry.phone or 'N/A'}\n\n"
+        f"Message:\n{inquiry.message}\n\n"
+        f"View property: {payload['property_url']}\n"
+    )
+    from_email = getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@realestate.com')
+    EmailMessage(subject, message, from_email, [inquiry.owner.email], connection=context.mail_connection).send()
+    Inquiry.objects.filter(pk=inquiry.pk).update(notified_at=timezone.now())
@@ -0,0 +1,41 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from ..renditions import RENDITIONS, rendition_name
+
+register = template.Library()
+
+
+@register.filter
+def renditions_ready(image, rendition='card'):
+    """Whether ``rendition`` of ``image`` has been generated; part of cache keys for fragments using it."""
+    return bool(image) and image.storage.exists(rendition_name(image.name, rendition, 'jpg'))
+
+
+@register.simple_tag
+def responsive_image(image, rendition='card', sizes='100vw', alt='', loading='lazy', lightbox=False, **attrs):
+    """Render ``image`` as a ``<picture>`` offering every WebP/JPEG rendition.
+
+    Falls back to the original file until its renditions have been generated.
+    With ``lightbox`` the largest rendition is exposed as ``data-full``.
+    """
+    storage, name = image.storage, image.name
+    ready = renditions_ready(image, rendition)
+    if lightbox:
+        attrs['data-full'] = storage.url(rendition_name(name, 'detail', 'jpg')) if ready else image.url
+    extra = format_html_join('', ' {}="{}"', sorted(attrs.items()))
+    if not ready:
+        return format_html('<img src="{}" alt="{}"{}>', image.url, alt, extra)
+
+    def srcset(extension):
+        # nominal widths; an original narrower than a rendition is not upscaled
+        return ', '.join(
+            f'{storage.url(rendition_name(name, key, extension))} {width}w'
+            for key, width in sorted(RENDITIONS.items(), key=lambda item: item[1])
+        )
+
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" loading="{}" decoding="async"{}></picture>',
+        srcset('webp'), sizes, storage.url(rendition_name(name, rendition, 'jpg')), srcset('jpg'), sizes, alt, loading, extra,
+    )
@@ -1,3 +1,1577 @@
-from django.test import TestCase
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock, skipIf
 
-# Tests for properties app will be added in Phase 8 (integration and unit tests).
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.contrib.sessions.backends.db import SessionStore
+from django.conf import settings
+from django.core import mail
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.db.models import Avg, Max, Sum
+from django.http import Http404
+from django.test import AsyncRequestFactory, SimpleTestCase, TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from django.urls import reverse
+from PIL import Image
+
+from realestate_project.backends.sqlite3.base import DatabaseWrapper as ProductionSQLiteWrapper
+
+from apps.accounts.models import UserProfile
+from apps.jobs.models import Job
+
+from .autocomplete import get_autocomplete_index, reset_autocomplete_index
+from .benchmark import compare, percentile
+from .counters import mark_read, reconcile
+from .digests import pending_inquiries, send_digests
+from .filters import apply_filters, normalize_filters
+from .forms import PropertySearchFilterForm
+from .geo import covering_cells, filter_bbox, filter_radius, geohash_encode, radius_bbox
+from .importer import iter_json_array
+from .listing_index import get_listing_index, reset_listing_index, np
+from .models import Property, PropertyImage, Inquiry, PropertyInquiryCounter, UserInquiryCounter
+from .views import AsyncInquiryListView, AsyncPropertyDetailView, AsyncPropertyListView
+from .pagination import CursorPaginator, InboxPaginator, InvalidCursor, encode_cursor, get_ordering, NEXT
+from .renditions import RENDITIONS, encode_image, generate_renditions, rendition_name
+from .resizer import DiskLRUCache, reset_resize_cache, resized_path
+from .search import get_search_backend
+from .sharding import SHARD_PK_BITS, ScatterQuerySet, ShardRouter, shard_for_pk, shard_for_state
+from .storage import blob_references, is_blob
+
+
+def make_property(owner, **overrides):
+    fields = {
+        'title': 'Test Property',
+        'description': 'A lovely test property',
+        'price': Decimal('250000.00'),
+        'address': '1 Test Street',
+        'city': 'Austin',
+        'state': 'Texas',
+        'zipcode': '73301',
+        'bedrooms': 3,
+        'bathrooms': Decimal('2.0'),
+        'area': 1500,
+        'property_type': Property.HOUSE,
+        'status': Property.AVAILABLE,
+        'owner': owner,
+    }
+    fields.update(overrides)
+    return Property.objects.create(**fields)
+
+
+class CursorPaginationTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.owner = User.objects.create_user(username='agent', password='testpass123')
+        # duplicate prices/areas make sure the pk tie-breaker is exercised
+        for i in range(7):
+            make_property(
+                self.owner,
+                title=f'Property {i}',
+                price=Decimal(100000 + (i // 2) * 50000),
+                area=1000 + (i % 3) * 250,
+            )
+        make_property(self.owner, title='Sold', status=Property.SOLD)
+        self.list_url = reverse('properties:property_list')
+
+    def walk(self, sort, per_page=3):
+        qs = Property.objects.filter(status=Property.AVAILABLE)
+        paginator = CursorPaginator(qs, per_page, sort=sort)
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(pages[-1].next_cursor))
+        return paginator, pages
+
+    def test_forward_walk_matches_offset_ordering_for_every_sort(self):
+        """Test cursor pages cover every row in the same order as order_by"""
+        for sort, _label in PropertySearchFilterForm.SORT_CHOICES:
+            _paginator, pages = self.walk(sort)
+            walked = [p.pk for page in pages for p in page]
+            expected = list(Property.objects.filter(status=Property.AVAILABLE).order_by(*get_ordering(sort)).values_list('pk', flat=True))
+            self.assertEqual(walked, expected, sort)
+
+    def test_previous_cursor_returns_prior_page(self):
+        """Test following a previous token lands back on the earlier page"""
+        paginator, pages = self.walk('price_asc')
+        self.assertFalse(pages[0].has_previous())
+        back = paginator.page(pages[1].previous_cursor)
+        self.assertEqual([p.pk for p in back], [p.pk for p in pages[0]])
+        self.assertFalse(back.has_previous())
+        self.assertTrue(back.has_next())
+
+    def test_cursor_from_other_sort_is_rejected(self):
+        """Test a token minted for one sort order cannot be replayed on another"""
+        token = encode_cursor('price_asc', '100000.00', 1, NEXT)
+        paginator = CursorPaginator(Property.objects.all(), 3, sort='area_desc')
+        with self.assertRaises(InvalidCursor):
+            paginator.page(token)
+
+    def test_list_view_cursor_mode(self):
+        """Test the list view serves keyset pages when a cursor param is present"""
+        response = self.client.get(self.list_url, {'cursor': '', 'sort': 'area_desc'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['cursor_pagination'])
+        self.assertEqual(len(response.context['properties']), 7)
+
+    def test_list_view_invalid_cursor_404(self):
+        """Test a garbage cursor returns 404 like an invalid page number"""
+        response = self.client.get(self.list_url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+class PropertyCountCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.owner = User.objects.create_user(username='agent', password='testpass123')
+        for i in range(3):
+            make_property(self.owner, title=f'Property {i}', bedrooms=i + 1)
+        self.list_url = reverse('properties:property_list')
+
+    def test_normalize_filters_equivalent_params(self):
+        """Test equivalent filter params normalize to the same tuple"""
+        a = normalize_filters({'search': ' Austin ', 'bedrooms': '03', 'min_price': '1000.00'})
+        b = normalize_filters({'search': 'austin', 'bedrooms': '3', 'min_price': '1000', 'sort': 'price_asc'})
+        self.assertEqual(a, b)
+
+    def test_normalize_filters_ignores_invalid_values(self):
+        """Test unparsable numbers are dropped instead of raising"""
+        filters = normalize_filters({'min_price': 'abc', 'bedrooms': 'many', 'bathrooms': 'NaN'})
+        self.assertEqual(filters, normalize_filters({}))
+
+    def test_list_view_counts_once_per_change(self):
+        """Test a repeated list request skips COUNT and a save invalidates it"""
+        response = self.client.get(self.list_url, {'bedrooms': '2'})
+        self.assertEqual(response.context['total_properties'], 2)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(self.list_url, {'bedrooms': '2'})
+        self.assertFalse([q for q in ctx.captured_queries if 'COUNT(' in q['sql']])
+        with self.captureOnCommitCallbacks(execute=True):
+            make_property(self.owner, title='New', bedrooms=5)
+        response = self.client.get(self.list_url, {'bedrooms': '2'})
+        self.assertEqual(response.context['total_properties'], 3)
+
+    def test_delete_invalidates_count(self):
+        """Test deleting a listing bumps the cached count version"""
+        self.client.get(self.list_url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Property.objects.first().delete() # type: ignore
+        response = self.client.get(self.list_url)
+        self.assertEqual(response.context['total_properties'], 2)
+
+    def test_count_version_bumped_after_commit(self):
+        """Test a count read before the save commits is not kept under the new version"""
+        self.client.get(self.list_url)
+        with self.captureOnCommitCallbacks(execute=True):
+            make_property(self.owner, title='Pending')
+            # still in the transaction: the cached count stands until commit
+            self.assertEqual(self.client.get(self.list_url).context['total_properties'], 3)
+        self.assertEqual(self.client.get(self.list_url).context['total_properties'], 4)
+
+
+class PropertySearchTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.owner = User.objects.create_user(username='agent', password='testpass123')
+        self.villa = make_property(self.owner, title='Modern Villa', description='Infinity pool and mountain views', city='Los Angeles', state='California')
+        self.loft = make_property(self.owner, title='Downtown Loft', description='Exposed brick near the villa district', city='New York', state='New York')
+        self.ranch = make_property(self.owner, title='Ranch House', description='Quiet acreage', city='Austin', state='Texas')
+        self.list_url = reverse('properties:property_list')
+
+    def search(self, query, rank=False):
+        qs = Property.objects.all()
+        return get_search_backend().search(qs, query, rank=rank)
+
+    def test_matches_title_description_and_location(self):
+        """Test search covers title, description, city and state"""
+        self.assertEqual(set(self.search('villa')), {self.villa, self.loft})
+        self.assertEqual(list(self.search('texas')), [self.ranch])
+        self.assertEqual(list(self.search('infinity pool')), [self.villa])
+
+    def test_prefix_and_case_insensitive(self):
+        """Test partial words match as prefixes regardless of case"""
+        self.assertEqual(list(self.search('AUST')), [self.ranch])
+
+    def test_syntax_characters_are_safe(self):
+        """Test FTS operators in user input are treated as plain words"""
+        self.assertEqual(list(self.search('"villa" OR (NEAR')), [])
+        self.assertEqual(set(self.search('villa*')), {self.villa, self.loft})
+
+    def test_relevance_ranks_title_matches_first(self):
+        """Test title hits outrank description hits"""
+        results = list(self.search('villa', rank=True).order_by('-search_rank'))
+        self.assertEqual(results, [self.villa, self.loft])
+
+    def test_index_follows_save_and_delete(self):
+        """Test signals keep the index in sync with edits and deletes"""
+        self.ranch.city = 'Denver'
+        self.ranch.save()
+        self.assertEqual(list(self.search('austin')), [])
+        self.assertEqual(list(self.search('denver')), [self.ranch])
+        self.ranch.delete()
+        self.assertEqual(list(self.search('denver')), [])
+
+    def test_rebuild_command(self):
+        """Test the rebuild command restores rows written behind the signals"""
+        Property.objects.filter(pk=self.ranch.pk).update(title='Barn Conversion')
+        self.assertEqual(list(self.search('barn')), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(list(self.search('barn')), [self.ranch])
+
+    def test_list_view_relevance_sort(self):
+        """Test the list view orders by relevance when asked"""
+        response = self.client.get(self.list_url, {'search': 'villa', 'sort': 'relevance'})
+        self.assertEqual(list(response.context['properties']), [self.villa, self.loft])
+        self.assertEqual(response.context['total_properties'], 2)
+
+
+@skipIf(np is None, 'numpy is not installed')
+@override_settings(PROPERTY_LISTING_INDEX=True, PROPERTY_LISTING_INDEX_CHECK_INTERVAL=0)
+class ListingIndexTest(TestCase):
+    def setUp(self):
+        reset_listing_index()
+        self.addCleanup(reset_listing_index)
+        self.client = Client()
+        self.owner = User.objects.create_user(username='agent', password='testpass123')
+        for i in range(8):
+            make_property(
+                self.owner,
+                title=f'Property {i}',
+                price=Decimal(100000 + (i % 4) * 75000),
+                bedrooms=1 + i % 3,
+                bathrooms=Decimal('1.5') if i % 2 else Decimal('2.0'),
+                property_type=Property.CONDO if i % 2 else Property.HOUSE,
+            )
+        make_property(self.owner, title='Pending', status=Property.PENDING)
+        self.list_url = reverse('properties:property_list')
+
+    def assert_matches_database(self, params):
+        filters = normalize_filters(params)
+        hits = get_listing_index().query(filters, params.get('sort')) # type: ignore
+        qs = apply_filters(Property.objects.filter(status=Property.AVAILABLE), filters)
+        expected = list(qs.order_by(*get_ordering(params.get('sort'))).values_list('pk', flat=True))
+        self.assertEqual(hits.pks.tolist(), expected, params)
+
+    def test_filters_and_sorts_match_database(self):
+        """Test every sort and filter combination agrees with the ORM"""
+        for sort, _label in PropertySearchFilterForm.SORT_CHOICES:
+            self.assert_matches_database({'sort': sort})
+            self.assert_matches_database({'sort': sort, 'min_price': '150000', 'max_price': '250000'})
+            self.assert_matches_database({'sort': sort, 'bedrooms': '2', 'bathrooms': '2'})
+            self.assert_matches_database({'sort': sort, 'property_type': Property.CONDO})
+        self.assert_matches_database({'property_type': 'CASTLE'})
+
+    def test_signals_update_index_after_commit(self):
+        """Test saves and deletes patch the index without a rebuild"""
+        index = get_listing_index()
+        index.query(normalize_filters({})) # type: ignore
+        index.check_interval = 3600 # type: ignore
+        with self.captureOnCommitCallbacks(execute=True):
+            new = make_property(self.owner, title='Fresh', bedrooms=9)
+        self.assertEqual(index.query(normalize_filters({'bedrooms': '9'})).pks.tolist(), [new.pk]) # type: ignore
+        with self.captureOnCommitCallbacks(execute=True):
+            new.status = Property.SOLD
+            new.save()
+        self.assertEqual(len(index.query(normalize_filters({'bedrooms': '9'}))), 0) # type: ignore
+
+    def test_consistency_check_rebuilds_after_hidden_write(self):
+        """Test writes that bypass the signals are caught by the periodic check"""
+        index = get_listing_index()
+        self.assertEqual(len(index.query(normalize_filters({}))), 8) # type: ignore
+        Property.objects.filter(title='Property 0').update(status=Property.SOLD)
+        self.assertEqual(len(index.query(normalize_filters({}))), 7) # type: ignore
+
+    def test_integer_indexes(self):
+        """Test single items count from either end and stop at the ends"""
+        hits = get_listing_index().query(normalize_filters({}), 'price_asc') # type: ignore
+        pks = hits.pks.tolist()
+        self.assertEqual(hits[0].pk, pks[0])
+        self.assertEqual(hits[-1].pk, pks[-1])
+        self.assertEqual(hits[-len(pks)].pk, pks[0])
+        for key in (len(pks), -len(pks) - 1):
+            with self.assertRaises(IndexError):
+                hits[key]
+
+    def test_concurrent_stale_checks_build_once(self):
+        """Test threads finding the index unbuilt wait for one rebuild instead of each running their own"""
+        index = get_listing_index()
+        builds = []
+
+        def build():
+            builds.append(threading.get_ident())
+            time.sleep(0.05)
+            index.built, index.last_check = True, time.monotonic()
+
+        index.check_interval = 3600 # type: ignore
+        with mock.patch.object(index, 'build', build):
+            threads = [threading.Thread(target=index.ensure_fresh) for _ in range(4)] # type: ignore
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(builds), 1)
+
+    def test_list_view_hydrates_one_page(self):
+        """Test the list view answers from the index with one bulk fetch"""
+        self.client.get(self.list_url)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.list_url, {'sort': 'price_desc', 'bedrooms': '2'})
+        self.assertEqual(response.context['total_properties'], 5)
+        prices = [p.price for p in response.context['properties']]
+        self.assertEqual(prices, sorted(prices, reverse=True))
+        property_queries = [q for q in ctx.captured_queries if 'FROM "properties_property"' in q['sql'] and 'COUNT(' not in q['sql']]
+        self.assertEqual(len([q for q in property_queries if ' IN (' in q['sql']]), 1)
+
+
+class GeoSearchTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.owner = User.objects.create_user(username='agent', password='testpass123')
+        self.seattle = make_property(self.owner, title='Seattle', zipcode='98101')
+        self.capitol_hill = make_property(self.owner, title='Capitol Hill', zipcode='98102')
+        self.portland = make_property(self.owner, title='Portland', zipcode='97201')
+        self.unknown = make_property(self.owner, title='Nowhere', zipcode='00000')
+        self.list_url = reverse('properties:property_list')
+
+    def test_geocoded_on_save(self):
+        """Test coordinates and geohash are filled from the zipcode table"""
+        self.assertAlmostEqual(self.seattle.latitude, 47.6114) # type: ignore
+        self.assertEqual(self.seattle.geohash, geohash_encode(self.seattle.latitude, self.seattle.longitude))
+        self.assertTrue(self.seattle.geohash.startswith('c23n'))
+        self.assertIsNone(self.unknown.latitude)
+        self.assertEqual(self.unknown.geohash, '')
+
+    def test_geohash_known_value(self):
+        """Test the encoder against a published reference geohash"""
+        self.assertEqual(geohash_encode(57.64911, 10.40744, 11), 'u4pruydqqvj')
+
+    def test_radius_filter(self):
+        """Test radius search keeps nearby listings and drops distant ones"""
+        qs = filter_radius(Property.objects.all(), 47.6062, -122.3321, 10)
+        self.assertEqual(set(qs), {self.seattle, self.capitol_hill})
+        qs = filter_radius(Property.objects.all(), 47.6062, -122.3321, 200)
+        self.assertEqual(set(qs), {self.seattle, self.capitol_hill, self.portland})
+
+    def test_bbox_filter(self):
+        """Test bounding-box search returns listings inside the box"""
+        qs = filter_bbox(Property.objects.all(), 45.0, -123.0, 46.0, -122.0)
+        self.assertEqual(list(qs), [self.portland])
+
+    def test_covering_cells_contain_points(self):
+        """Test the pruning cells always include the matching rows"""
+        cells = covering_cells(*radius_bbox(47.6062, -122.3321, 10))
+        self.assertLessEqual(len(cells), 24) # type: ignore
+        for prop in (self.seattle, self.capitol_hill):
+            self.assertTrue(any(prop.geohash.startswith(cell) for cell in cells)) # type: ignore
+
+    def test_list_view_near_zip(self):
+        """Test the list view accepts a zipcode and radius"""
+        response = self.client.get(self.list_url, {'near': '98101', 'radius': '10'})
+        self.assertEqual(set(response.context['properties']), {self.seattle, self.capitol_hill})
+        self.assertTrue(response.context['has_filters'])
+
+    def test_geocode_command_fills_missing(self):
+        """Test the bulk geocoder fills rows written without coordinates"""
+        Property.objects.filter(pk=self.portland.pk).update(latitude=None, longitude=None, geohash='')
+        call_command('geocode_properties', stdout=StringIO())
+        self.portland.refresh_from_db()
+        self.assertTrue(self.portland.geohash.startswith('c20'))
+
+
+class AutocompleteTest(TestCase):
+    def setUp(self):
+        reset_autocomplete_index()
+        self.addCleanup(reset_autocomplete_index)
+        self.client = Client()
+        self.owner = User.objects.create_user(username='agent', password='testpass123')
+        make_property(self.owner, city='Austin', state='Texas')
+        make_property(self.owner, city='Austin', state='Texas')
+        make_property(self.owner, city='Aurora', state='Colorado')
+        make_property(self.owner, city='New York', state='New York')
+        make_property(self.owner, city='Atlanta', state='Georgia', status=Property.SOLD)
+        self.url = reverse('properties:autocomplete')
+
+    def labels(self, prefix):
+        return [(r['label'], r['count']) for r in get_autocomplete_index().suggest(prefix)]
+
+    def test_prefix_ranked_by_count(self):
+        """Test suggestions match the prefix and rank by listing count"""
+        self.assertEqual(self.labels('au'), [('Austin, Texas', 2), ('Aurora, Colorado', 1)])
+        self.assertEqual(self.labels('AUS'), [('Austin, Texas', 2)])
+        self.assertEqual(self.labels('zz'), [])
+
+    def test_matches_later_words_and_states(self):
+        """Test inner words and state names are searchable"""
+        self.assertEqual(self.labels('york'), [('New York', 1), ('New York, New York', 1)])
+        self.assertEqual(self.labels('tex'), [('Texas', 2)])
+
+    def test_incremental_updates(self):
+        """Test saves, status changes and deletes adjust counts without a rebuild"""
+        index = get_autocomplete_index()
+        index.suggest('a')
+        with self.captureOnCommitCallbacks(execute=True):
+            aurora = make_property(self.owner, city='Aurora', state='Colorado')
+            make_property(self.owner, city='Aurora', state='Colorado')
+        self.assertEqual(self.labels('au')[0], ('Aurora, Colorado', 3))
+        with self.captureOnCommitCallbacks(execute=True):
+            aurora.city = 'Boulder'
+            aurora.save()
+        self.assertEqual(self.labels('boul'), [('Boulder, Colorado', 1)])
+        with self.captureOnCommitCallbacks(execute=True):
+            aurora.delete()
+        self.assertEqual(self.labels('boul'), [])
+        with self.assertNumQueries(0):
+            self.labels('a')
+
+    def test_save_reads_stored_row_once(self):
+        """Test the receivers comparing against the stored listing share one SELECT of it"""
+        get_autocomplete_index().suggest('a')
+        listing = make_property(self.owner, city='Austin', state='Texas', featured_image='properties/old.jpg')
+        listing.city, listing.owner, listing.featured_image = 'Aurora', User.objects.create_user(username='next'), None
+        with CaptureQueriesContext(connection) as queries:
+            listing.save()
+        reads = [q['sql'] for q in queries if q['sql'].startswith('SELECT') and 'FROM "properties_property"' in q['sql']]
+        self.assertEqual(len(reads), 1)
+        self.assertEqual(listing._stored, {
+            'city': 'Austin', 'state': 'Texas', 'status': Property.AVAILABLE,
+            'owner_id': self.owner.pk, 'featured_image': 'properties/old.jpg',
+        })
+
+    def test_endpoint_json(self):
+        """Test the endpoint returns JSON suggestions"""
+        response = self.client.get(self.url, {'q': 'new'})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['results'][0]['value'], 'New York')
+        self.assertEqual(data['results'][0]['count'], 1)
+
+
+class PropertyCardCacheTest(TestCase):
+    def setUp(self):
+        caches['fragments'].clear()
+        self.client = Client()
+        self.owner = User.objects.create_user(username='agent', password='testpass123')
+        self.other = User.objects.create_user(username='buyer', password='testpass123')
+        self.prop = make_property(self.owner, title='Cached Cottage')
+        self.list_url = reverse('properties:property_list')
+        self.edit_url = reverse('properties:property_update', kwargs={'pk': self.prop.pk})
+
+    def test_card_reused_across_users(self):
+        """Test one shared card fragment while owner buttons stay per-user"""
+        self.client.login(username='agent', password='testpass123')
+        response = self.client.get(self.list_url)
+        self.assertContains(response, self.edit_url)
+        self.client.logout()
+        self.client.login(username='buyer', password='testpass123')
+        response = self.client.get(self.list_url)
+        self.assertContains(response, 'Cached Cottage')
+        self.assertNotContains(response, self.edit_url)
+
+    def test_save_refreshes_card(self):
+        """Test editing a listing renders a fresh card"""
+        self.client.get(self.list_url)
+        self.prop.title = 'Renamed Cottage'
+        self.prop.save()
+        response = self.client.get(self.list_url)
+        self.assertContains(response, 'Renamed Cottage')
+        self.assertNotContains(response, 'Cached Cottage')
+
+    def test_bench_command_runs(self):
+        """Test the card benchmark reports cold and warm timings"""
+        out = StringIO()
+        call_command('bench_property_cards', iterations=2, stdout=out)
+        self.assertIn('warm render', out.getvalue())
+
+
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.owner = User.objects.create_user(username='agent', password='testpass123')
+        self.buyer = User.objects.create_user(username='buyer', password='testpass123')
+        self.prop = make_property(self.owner, title='Validated Villa')
+        self.list_url = reverse('properties:property_list')
+        self.detail_url = reverse('properties:property_detail', kwargs={'pk': self.prop.pk})
+
+    def revalidate(self, url, response, **params):
+        return self.client.get(url, params, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_list_304_without_page_queries(self):
+        """Test an unchanged list answers 304 from the cached validators"""
+        first = self.client.get(self.list_url, {'bedrooms': '2'})
+        self.assertTrue(first.has_header('ETag'))
+        with self.assertNumQueries(0):
+            second = self.revalidate(self.list_url, first, bedrooms='2')
+        self.assertEqual(second.status_code, 304)
+
+    def test_list_etag_changes_with_data_and_params(self):
+        """Test edits, other filters and other pages get a fresh response"""
+        first = self.client.get(self.list_url)
+        self.assertEqual(self.revalidate(self.list_url, first, page='2').status_code, 404)
+        self.assertEqual(self.revalidate(self.list_url, first, sort='price_asc').status_code, 200)
+        self.prop.price = Decimal('1.00')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.prop.save()
+        self.assertEqual(self.revalidate(self.list_url, first).status_code, 200)
+
+    def test_detail_304_and_image_changes(self):
+        """Test detail revalidates until a gallery image is added"""
+        first = self.client.get(self.detail_url)
+        self.assertEqual(self.revalidate(self.detail_url, first).status_code, 304)
+        PropertyImage.objects.create(property=self.prop, image='properties/gallery/x.jpg')
+        self.assertEqual(self.revalidate(self.detail_url, first).status_code, 200)
+
+    def test_detail_owner_unread_changes(self):
+        """Test a new inquiry invalidates the owner's page but not a buyer's"""
+        self.client.login(username='agent', password='testpass123')
+        owner_first = self.client.get(self.detail_url)
+        self.assertIn('private', owner_first['Cache-Control'])
+        buyer = Client()
+        buyer.login(username='buyer', password='testpass123')
+        buyer_first = buyer.get(self.detail_url)
+        self.assertNotEqual(owner_first['ETag'], buyer_first['ETag'])
+        Inquiry.objects.create(related_property=self.prop, user=self.buyer, name='B', email='b@example.com', message='Hi')
+        self.assertEqual(self.revalidate(self.detail_url, owner_first).status_code, 200)
+        self.assertEqual(buyer.get(self.detail_url, HTTP_IF_NONE_MATCH=buyer_first['ETag']).status_code, 304)
+
+    def test_detail_etag_follows_csrf_token(self):
+        """Test a buyer's detail page, which holds a CSRF token, is not revalidated after the token changes"""
+        self.client.login(username='buyer', password='testpass123')
+        first = self.client.get(self.detail_url)
+        self.assertContains(first, 'csrfmiddlewaretoken')
+        self.assertEqual(self.revalidate(self.detail_url, first).status_code, 304)
+        self.client.cookies[settings.CSRF_COOKIE_NAME] = 'x' * 32
+        self.assertEqual(self.revalidate(self.detail_url, first).status_code, 200)
+
+    def test_pending_messages_always_render(self):
+        """Test a page with a flash message is never answered with 304"""
+        first = self.client.get(self.detail_url)
+        self.client.login(username='buyer', password='testpass123')
+        logged_in = self.client.get(self.detail_url)
+        self.client.post(reverse('properties:inquiry_create', kwargs={'pk': self.prop.pk}), {'name': 'B', 'email': 'b@example.com', 'message': 'Hello'})
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=logged_in['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(first['ETag'], logged_in['ETag'])
+
+
+class ListingFeedTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.owner = User.objects.create_user(username='agent', password='testpass123')
+        for price in range(1, 8):
+            make_property(self.owner, title=f'Feed {price}', price=Decimal(price * 100000), bedrooms=price)
+        make_property(self.owner, title='Sold Feed', status=Property.SOLD)
+        self.url = reverse('properties:listing_feed')
+
+    def read(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def ndjson(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        return [json.loads(line) for line in self.read(response).splitlines()]
+
+    def test_ndjson_streams_filtered_rows(self):
+        """Test the feed streams every matching available listing in sort order"""
+        rows = self.ndjson(bedrooms='3', sort='price_asc')
+        self.assertEqual([row['title'] for row in rows], [f'Feed {n}' for n in range(3, 8)])
+        self.assertTrue(rows[0]['url'].endswith(reverse('properties:property_detail', args=[rows[0]['id']])))
+        self.assertNotIn('owner', rows[0])
+
+    def test_cursor_resumes_after_row(self):
+        """Test a row's cursor resumes the feed right after that row"""
+        rows = self.ndjson(sort='price_desc')
+        resumed = self.ndjson(sort='price_desc', cursor=rows[2]['cursor'])
+        self.assertEqual([row['id'] for row in resumed], [row['id'] for row in rows[3:]])
+
+    def test_json_pages_with_limit(self):
+        """Test the JSON format pages with limit and next_cursor"""
+        response = self.client.get(self.url, {'format': 'json', 'limit': 4, 'sort': 'oldest'})
+        first = json.loads(self.read(response))
+        self.assertEqual(len(first['results']), 4)
+        response = self.client.get(self.url, {'format': 'json', 'limit': 4, 'sort': 'oldest', 'cursor': first['next_cursor']})
+        second = json.loads(self.read(response))
+        self.assertEqual(len(second['results']), 3)
+        self.assertIsNone(second['next_cursor'])
+
+    def test_bad_parameters_rejected(self):
+        """Test malformed or mismatched cursors and bad formats return 400"""
+        cursor = encode_cursor('price_asc', '100000', 1, NEXT)
+        self.assertEqual(self.client.get(self.url, {'cursor': 'garbage'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'cursor': cursor, 'sort': 'area_asc'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'format': 'xml'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'limit': '0'}).status_code, 400)
+
+
+class ImportPropertiesTest(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='agent', password='testpass123')
+        self.other = User.objects.create_user(username='other', password='testpass123')
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def feed(self, name, content):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'w', newline='') as handle:
+            handle.write(content)
+        return path
+
+    def run_import(self, path, *args):
+        out, err = StringIO(), StringIO()
+        call_command('import_properties', path, '--workers', '0', *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_csv_import_reports_bad_rows(self):
+        """Test valid CSV rows are created and bad rows reported by line"""
+        header = 'title,description,price,address,city,state,zipcode,bedrooms,bathrooms,area,property_type,owner\n'
+        path = self.feed('feed.csv', header + (
+            'Lake House,Quiet,450000,1 Lake Rd,Austin,Texas,78701,3,2.5,1800,house,\n'
+            'Bad Price,Oops,cheap,2 Lake Rd,Austin,Texas,73301,3,2,1800,HOUSE,\n'
+            'City Flat,Central,300000,3 Main St,Seattle,Washington,98101,2,1,900,APARTMENT,other\n'
+            'Ghost,Nobody,1,4 Main St,Seattle,Washington,98101,1,1,500,CONDO,missing\n'
+        ))
+        out, err = self.run_import(path, '--owner', 'agent', '--batch-size', '2')
+        self.assertIn('Imported 2 properties', out)
+        self.assertIn('rows/sec', out)
+        self.assertIn('row 3: price:', err)
+        self.assertIn('row 5: owner:', err)
+        lake = Property.objects.get(title='Lake House')
+        self.assertEqual((lake.owner, lake.property_type), (self.owner, Property.HOUSE))
+        self.assertTrue(lake.geohash)
+        self.assertEqual(Property.objects.get(title='City Flat').owner, self.other)
+        results = apply_filters(Property.objects.all(), normalize_filters({'search': 'lake'}))
+        self.assertEqual(list(results), [lake])
+
+    def test_json_array_and_ndjson(self):
+        """Test JSON arrays stream across buffer boundaries and bad NDJSON lines are skipped"""
+        rows = [
+            {'fields': {'title': f'Json {n}', 'description': 'd', 'price': '1000', 'address': 'a', 'city': 'Austin',
+                        'state': 'Texas', 'zipcode': '73301', 'bedrooms': n, 'bathrooms': '1', 'area': 500,
+                        'property_type': 'LAND', 'owner': self.owner.pk}}
+            for n in range(5)
+        ]
+        with open(self.feed('feed.json', json.dumps(rows))) as handle:
+            self.assertEqual(len(list(iter_json_array(handle, buffer_size=16))), 5)
+        self.run_import(self.feed('feed.json', json.dumps(rows)))
+        self.assertEqual(Property.objects.filter(title__startswith='Json').count(), 5)
+        ndjson = json.dumps(rows[0]['fields']).replace('Json 0', 'Line') + '\n{not json\n'
+        out, err = self.run_import(self.feed('feed.ndjson', ndjson))
+        self.assertIn('Imported 1 properties', out)
+        self.assertIn('row 2: invalid JSON', err)
+
+    def test_dry_run_writes_nothing(self):
+        """Test --dry-run validates without creating rows"""
+        header = 'title,description,price,address,city,state,zipcode,bedrooms,bathrooms,area,property_type\n'
+        path = self.feed('feed.csv', header + 'Dry,d,1,a,Austin,Texas,73301,1,1,1,HOUSE\n')
+        out, _err = self.run_import(path, '--owner', 'agent', '--dry-run')
+        self.assertIn('Validated 1 properties', out)
+        self.assertFalse(Property.objects.exists())
+
+
+class FeedSyncTest(TestCase):
+    HEADER = 'external_id,title,description,price,address,city,state,zipcode,bedrooms,bathrooms,area,property_type\n'
+
+    def setUp(self):
+        self.owner = User.objects.create_user(username='agent', password='testpass123')
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def sync(self, *rows, extra=()):
+        path = os.path.join(self.tmp.name, 'feed.csv')
+        with open(path, 'w', newline='') as handle:
+            handle.write(self.HEADER + ''.join(row + '\n' for row in rows))
+        out = StringIO()
+        call_command('import_properties', path, '--sync', '--owner', 'agent', '--workers', '0', *extra, stdout=out, stderr=StringIO())
+        return out.getvalue()
+
+    def test_sync_applies_only_changes(self):
+        """Test a re-sync inserts new rows, rewrites changed ones and leaves the rest untouched"""
+        self.sync('A1,Alpha,d,100000,1 A St,Austin,Texas,78701,2,1,900,HOUSE', 'B2,Beta,d,200000,2 B St,Austin,Texas,78701,3,2,1200,CONDO')
+        alpha = Property.objects.get(external_id='A1')
+        beta = Property.objects.get(external_id='B2')
+        out = self.sync(
+            'A1,Alpha,d,100000.00,1 A St,Austin,Texas,78701,2,1,900,HOUSE',
+            'B2,Beta,d,210000,2 B St,Austin,Texas,78701,3,2,1200,CONDO',
+            'C3,Gamma,d,300000,3 C St,Austin,Texas,78701,4,3,2000,HOUSE',
+        )
+        self.assertIn('created:   1', out)
+        self.assertIn('updated:   1', out)
+        self.assertIn('unchanged: 1', out)
+        self.assertEqual(Property.objects.get(pk=alpha.pk).updated_at, alpha.updated_at)
+        beta_after = Property.objects.get(pk=beta.pk)
+        self.assertEqual(beta_after.price, Decimal('210000'))
+        self.assertGreater(beta_after.updated_at, beta.updated_at)
+
+    def test_missing_listings_transition_and_return(self):
+        """Test listings that leave the feed are marked sold and revived when they return"""
+        row_a = 'A1,Alpha,d,100000,1 A St,Austin,Texas,78701,2,1,900,HOUSE'
+        row_b = 'B2,Beta,d,200000,2 B St,Austin,Texas,78701,3,2,1200,CONDO'
+        self.sync(row_a, row_b)
+        out = self.sync(row_a)
+        self.assertIn('marked SOLD: 1', out)
+        self.assertEqual(Property.objects.get(external_id='B2').status, Property.SOLD)
+        self.sync(row_a, row_b, extra=('--missing-status', 'keep'))
+        self.assertEqual(Property.objects.get(external_id='B2').status, Property.AVAILABLE)
+
+    def test_invalid_row_is_not_retired(self):
+        """Test a listing whose row fails validation still counts as present"""
+        self.sync('A1,Alpha,d,100000,1 A St,Austin,Texas,78701,2,1,900,HOUSE')
+        self.sync('A1,Alpha,d,not-a-price,1 A St,Austin,Texas,78701,2,1,900,HOUSE')
+        self.assertEqual(Property.objects.get(external_id='A1').status, Property.AVAILABLE)
+
+
+@override_settings(PROPERTY_RENDITION_WORKERS=0)
+class ImageRenditionTest(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        media = override_settings(MEDIA_ROOT=self.tmp.name)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.owner = User.objects.create_user(username='agent', password='testpass123')
+
+    def photo(self, name, size=(1600, 1000)):
+        buffer = BytesIO()
+        Image.new('RGB', size, (40, 120, 200)).save(buffer, 'JPEG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+    def test_renditions_written_next_to_original(self):
+        """Test every rendition is written in both formats without upscaling"""
+        name = default_storage.save('properties/house.jpg', self.photo('house.jpg', size=(600, 400)))
+        written = generate_renditions(name)
+        self.assertEqual(len(written), len(RENDITIONS) * 2)
+        with default_storage.open(rendition_name(name, 'card', 'webp')) as handle:
+            self.assertEqual(Image.open(handle).size, (400, 267))
+        with default_storage.open(rendition_name(name, 'detail', 'jpg')) as handle:
+            self.assertEqual(Image.open(handle).size, (600, 400))
+        self.assertEqual(generate_renditions(name), [])
+
+    def test_upload_renders_after_commit_and_template_uses_srcset(self):
+        """Test a saved upload gets renditions and the list card offers them as srcset"""
+        with self.captureOnCommitCallbacks(execute=True):
+            prop = make_property(self.owner, featured_image=self.photo('villa.jpg'))
+        card = rendition_name(prop.featured_image.name, 'card', 'webp')
+        self.assertTrue(default_storage.exists(card))
+        response = self.client.get(reverse('properties:property_list'))
+        self.assertContains(response, '<source type="image/webp"')
+        self.assertContains(response, default_storage.url(card) + ' 400w')
+
+    def test_template_falls_back_to_original(self):
+        """Test images without renditions still render the original"""
+        name = default_storage.save('properties/plain.jpg', self.photo('plain.jpg'))
+        make_property(self.owner, featured_image=name)
+        response = self.client.get(reverse('properties:property_list'))
+        self.assertContains(response, f'src="{default_storage.url(name)}"')
+        self.assertNotContains(response, '<picture>')
+
+    def test_cached_card_picks_up_renditions(self):
+        """Test a card cached before its renditions existed offers them once they do"""
+        caches['fragments'].clear()
+        name = default_storage.save('properties/late.jpg', self.photo('late.jpg'))
+        make_property(self.owner, featured_image=name)
+        url = reverse('properties:property_list')
+        self.assertNotContains(self.client.get(url), '<picture>')
+        generate_renditions(name)
+        self.assertContains(self.client.get(url), '<picture>')
+
+    def test_backfill_command(self):
+        """Test generate_renditions renders existing photos and skips them on rerun"""
+        prop = make_property(self.owner)
+        name = default_storage.save('properties/gallery/old.jpg', self.photo('old.jpg'))
+        PropertyImage.objects.create(property=prop, image=name)
+        out = StringIO()
+        call_command('generate_renditions', '--workers', '0', stdout=out)
+        self.assertIn(f'Wrote {len(RENDITIONS) * 2} renditions for 1 of 1 images', out.getvalue())
+        out = StringIO()
+        call_command('generate_renditions', '--workers', '0', stdout=out)
+        self.assertIn('Wrote 0 renditions', out.getvalue())
+
+
+class ResizedImageTest(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        media = os.path.join(self.tmp.name, 'media')
+        os.makedirs(os.path.join(media, 'properties'))
+        Image.new('RGB', (1000, 500), (200, 80, 40)).save(os.path.join(media, 'properties', 'a.jpg'))
+        overrides = override_settings(MEDIA_ROOT=media, PROPERTY_RESIZE_CACHE_DIR=os.path.join(self.tmp.name, 'cache'))
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        reset_resize_cache()
+        self.addCleanup(reset_resize_cache)
+
+    def url(self, width=320, quality=70, name='properties/a.jpg'):
+        return reverse('properties:resized_image', kwargs={'width': width, 'quality': quality, 'name': name})
+
+    def test_resizes_and_caches(self):
+        """Test a preset is encoded once, then served from the disk cache with long-lived headers"""
+        with mock.patch('apps.properties.resizer.encode_image', wraps=encode_image) as encode:
+            first = self.client.get(self.url(), {'format': 'webp'})
+            second = self.client.get(self.url(), {'format': 'webp'})
+        self.assertEqual(encode.call_count, 1)
+        self.assertEqual(first['Content-Type'], 'image/webp')
+        self.assertIn('immutable', second['Cache-Control'])
+        self.assertEqual(Image.open(BytesIO(b''.join(second.streaming_content))).size, (320, 160))
+        revalidated = self.client.get(self.url(), {'format': 'webp'}, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+
+    def test_rejects_unknown_presets_and_paths(self):
+        """Test widths, qualities and paths outside the whitelist and MEDIA_ROOT 404"""
+        self.assertEqual(self.client.get(self.url(width=333)).status_code, 404)
+        self.assertEqual(self.client.get(self.url(quality=99)).status_code, 404)
+        self.assertEqual(self.client.get(self.url(name='../secret.jpg')).status_code, 404)
+        self.assertEqual(self.client.get(self.url(name='properties/missing.jpg')).status_code, 404)
+
+    def test_concurrent_misses_share_one_encode(self):
+        """Test simultaneous requests for the same missing resize encode it once"""
+        def slow_encode(*args, **kwargs):
+            time.sleep(0.05)
+            return encode_image(*args, **kwargs)
+
+        with mock.patch('apps.properties.resizer.encode_image', side_effect=slow_encode) as encode:
+            threads = [threading.Thread(target=resized_path, args=('properties/a.jpg', 480, 50)) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(encode.call_count, 1)
+
+    def test_lru_eviction(self):
+        """Test the disk cache evicts least recently used files beyond its budget"""
+        lru = DiskLRUCache(os.path.join(self.tmp.name, 'lru'), max_bytes=250)
+        old = lru.put('aa' + '0' * 38, 'jpg', b'x' * 100)
+        recent = lru.put('bb' + '0' * 38, 'jpg', b'x' * 100)
+        os.utime(old, (1, 1))
+        os.utime(recent, (2, 2))
+        self.assertEqual(lru.get('bb' + '0' * 38, 'jpg'), recent)
+        lru.put('cc' + '0' * 38, 'jpg', b'x' * 100)
+        self.assertIsNone(lru.get('aa' + '0' * 38, 'jpg'))
+        self.assertTrue(os.path.exists(recent))
+
+
+@override_settings(PROPERTY_RENDITION_WORKERS=0)
+class PhotoStorageTest(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        media = override_settings(MEDIA_ROOT=self.tmp.name)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.owner = User.objects.create_user(username='agent', password='testpass123')
+        buffer = BytesIO()
+        Image.new('RGB', (64, 48), (10, 200, 90)).save(buffer, 'JPEG')
+        self.photo_bytes = buffer.getvalue()
+
+    def upload(self, name='photo.JPG'):
+        return SimpleUploadedFile(name, self.photo_bytes, content_type='image/jpeg')
+
+    def blob_count(self):
+        return sum(len(files) for _root, _dirs, files in os.walk(os.path.join(self.tmp.name, 'blobs')))
+
+    def test_duplicate_uploads_share_one_blob(self):
+        """Test the same bytes uploaded to two listings and a gallery are stored once"""
+        with self.captureOnCommitCallbacks(execute=True):
+            first = make_property(self.owner, featured_image=self.upload('a.jpg'))
+            second = make_property(self.owner, featured_image=self.upload('b.JPG'))
+            gallery = PropertyImage.objects.create(property=second, image=self.upload('c.jpg'))
+        digest = hashlib.sha256(self.photo_bytes).hexdigest()
+        self.assertEqual(first.featured_image.name, f'blobs/{digest[:2]}/{digest[2:4]}/{digest}.jpg')
+        self.assertEqual({second.featured_image.name, gallery.image.name}, {first.featured_image.name})
+        self.assertEqual(blob_references(first.featured_image.name), 3)
+        # one original plus one set of renditions
+        self.assertEqual(self.blob_count(), 1 + len(RENDITIONS) * 2)
+
+    def test_blob_deleted_with_last_reference(self):
+        """Test a blob survives until the last listing using it lets go"""
+        with self.captureOnCommitCallbacks(execute=True):
+            first = make_property(self.owner, featured_image=self.upload())
+            second = make_property(self.owner, featured_image=self.upload())
+        name = first.featured_image.name
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(default_storage.exists(name))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.featured_image = None
+            second.save()
+        self.assertFalse(default_storage.exists(name))
+        self.assertEqual(self.blob_count(), 0)
+
+    def test_dedupe_command_moves_legacy_files(self):
+        """Test dedupe_photos moves old per-upload copies into shared blobs"""
+        legacy = [default_storage.save(f'properties/{n}.jpg', ContentFile(self.photo_bytes)) for n in range(3)]
+        props = [make_property(self.owner, featured_image=name) for name in legacy]
+        out = StringIO()
+        call_command('dedupe_photos', stdout=out)
+        self.assertIn('Moved 3 photos into 1 blobs', out.getvalue())
+        names = {Property.objects.get(pk=prop.pk).featured_image.name for prop in props}
+        self.assertEqual(len(names), 1)
+        self.assertTrue(is_blob(names.pop()))
+        self.assertFalse(any(default_storage.exists(name) for name in legacy))
+
+    def test_dedupe_command_refreshes_list_etag(self):
+        """Test list pages cached before a dedupe are not revalidated against the deleted originals"""
+        cache.clear()
+        make_property(self.owner, featured_image=default_storage.save('properties/old.jpg', ContentFile(self.photo_bytes)))
+        url = reverse('properties:property_list')
+        first = self.client.get(url)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+        call_command('dedupe_photos', stdout=StringIO())
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 200)
+
+
+class InquiryDigestTest(TestCase):
+    def setUp(self):
+        self.buyer = User.objects.create_user(username='buyer', password='testpass123')
+        self.hourly = self.agent('hourly', UserProfile.HOURLY)
+        self.busy = self.agent('busy', UserProfile.HOURLY)
+        self.daily = self.agent('daily', UserProfile.DAILY)
+        self.immediate = self.agent('immediate', UserProfile.IMMEDIATE)
+
+    def agent(self, username, mode):
+        user = User.objects.create_user(username=username, email=f'{username}@example.com', password='testpass123')
+        UserProfile.objects.filter(user=user).update(digest_mode=mode)
+        return make_property(user, title=f'{username.title()} House')
+
+    def inquire(self, prop, message='Still available?'):
+        return Inquiry.objects.create(related_property=prop, user=self.buyer, name='Buyer', email='buyer@example.com', message=message)
+
+    def send(self, frequency='hourly'):
+        out = StringIO()
+        call_command('send_inquiry_digests', frequency, stdout=out)
+        return out.getvalue()
+
+    def test_digest_owner_gets_no_immediate_job(self):
+        """Test an inquiry to a digest subscriber queues no per-inquiry email"""
+        client = Client()
+        client.login(username='buyer', password='testpass123')
+        for prop in (self.hourly, self.immediate):
+            client.post(reverse('properties:inquiry_create', kwargs={'pk': prop.pk}), {'name': 'B', 'email': 'b@example.com', 'message': 'Hi'})
+        self.assertEqual(Job.objects.count(), 1)
+        self.assertEqual(Job.objects.get().payload['inquiry_id'], Inquiry.objects.get(related_property=self.immediate).pk)
+
+    def test_one_digest_per_owner_over_one_connection(self):
+        """Test each hourly owner gets a single email covering all their inquiries"""
+        self.inquire(self.hourly)
+        for n in range(3):
+            self.inquire(self.busy, f'Question {n}')
+        daily = self.inquire(self.daily)
+        self.inquire(self.immediate)
+        with self.assertNumQueries(1):
+            self.assertEqual(len(list(pending_inquiries(UserProfile.HOURLY))), 4)
+        with mock.patch('apps.properties.digests.get_connection', wraps=mail.get_connection) as get_connection:
+            self.assertIn('Sent 2 digests covering 4 inquiries', self.send())
+        self.assertEqual(get_connection.call_count, 1)
+        by_recipient = {message.to[0]: message for message in mail.outbox}
+        self.assertEqual(set(by_recipient), {'hourly@example.com', 'busy@example.com'})
+        self.assertIn('3 new inquiries', by_recipient['busy@example.com'].subject)
+        self.assertIn('Question 2', by_recipient['busy@example.com'].body)
+        self.assertIn('http://localhost:8000' + reverse('properties:inquiry_list'), by_recipient['busy@example.com'].body)
+        daily.refresh_from_db()
+        self.assertIsNone(daily.notified_at)
+
+    def test_sent_inquiries_are_not_repeated(self):
+        """Test the next run only covers inquiries that arrived since"""
+        self.inquire(self.daily)
+        self.send('daily')
+        self.assertIn('Sent 0 digests', self.send('daily'))
+        self.inquire(self.daily, 'Follow-up')
+        self.send('daily')
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertIn('Follow-up', mail.outbox[1].body)
+        self.assertFalse(Inquiry.objects.filter(notified_at__isnull=True).exists())
+
+
+class InquiryCounterTest(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='agent', password='testpass123')
+        self.buyer = User.objects.create_user(username='buyer', password='testpass123')
+        self.prop = make_property(self.owner)
+        self.other = make_property(self.owner, title='Second Listing')
+
+    def inquire(self, prop=None, **fields):
+        return Inquiry.objects.create(related_property=prop or self.prop, user=self.buyer, name='B', email='b@example.com', message='Hi', **fields)
+
+    def counts(self, user):
+        row = UserInquiryCounter.objects.filter(user=user).first()
+        return (row.received, row.unread, row.sent) if row else (0, 0, 0)
+
+    def property_unread(self, prop):
+        return PropertyInquiryCounter.objects.filter(property=prop).values_list('unread', flat=True).first() or 0
+
+    def assertConsistent(self):
+        self.assertEqual(reconcile(dry_run=True), (0, 0))
+
+    def test_create_read_delete(self):
+        """Test counters follow inquiries being created, read and deleted"""
+        first = self.inquire()
+        self.inquire(self.other)
+        self.inquire(is_read=True)
+        self.assertEqual(self.counts(self.owner), (3, 2, 0))
+        self.assertEqual(self.counts(self.buyer), (0, 0, 3))
+        self.assertEqual(self.property_unread(self.prop), 1)
+        first.is_read = True
+        first.save()
+        first.save()
+        self.assertEqual(self.counts(self.owner), (3, 1, 0))
+        self.assertEqual(self.property_unread(self.prop), 0)
+        first.delete()
+        self.assertEqual(self.counts(self.owner), (2, 1, 0))
+        self.assertEqual(self.counts(self.buyer), (0, 0, 2))
+        self.assertConsistent()
+
+    def test_bulk_mark_read_and_cascades(self):
+        """Test bulk read changes and listing deletes keep the counters exact"""
+        for _ in range(3):
+            self.inquire()
+        self.inquire(self.other)
+        self.assertEqual(mark_read(Inquiry.objects.filter(related_property=self.prop)), 3)
+        self.assertEqual(self.counts(self.owner), (4, 1, 0))
+        self.assertEqual(mark_read(Inquiry.objects.all(), False), 3)
+        self.assertEqual(self.property_unread(self.prop), 3)
+        self.other.delete()
+        self.assertEqual(self.counts(self.owner), (3, 3, 0))
+        self.assertConsistent()
+
+    def test_owner_change_moves_counts(self):
+        """Test transferring a listing moves its inquiry counts to the new owner"""
+        self.inquire()
+        self.inquire(is_read=True)
+        new_owner = User.objects.create_user(username='other', password='testpass123')
+        self.prop.owner = new_owner
+        self.prop.save()
+        self.assertEqual(self.counts(self.owner), (0, 0, 0))
+        self.assertEqual(self.counts(new_owner), (2, 1, 0))
+        self.assertConsistent()
+
+    def test_reconcile_repairs_drift(self):
+        """Test the reconcile command fixes counters changed behind the signals"""
+        self.inquire()
+        Inquiry.objects.update(is_read=True)
+        out = StringIO()
+        call_command('reconcile_inquiry_counters', stdout=out)
+        self.assertIn('Fixed 1 user counters and 1 property counters', out.getvalue())
+        self.assertEqual(self.counts(self.owner), (1, 0, 0))
+        self.assertConsistent()
+
+    def test_inbox_reads_counts_without_counting(self):
+        """Test the inquiry inbox takes its totals from the counter row"""
+        for _ in range(3):
+            self.inquire()
+        client = Client()
+        client.login(username='agent', password='testpass123')
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse('properties:inquiry_list'))
+        self.assertEqual(response.context['received_count'], 3)
+        self.assertEqual(response.context['unread_count'], 3)
+        self.assertEqual(len(response.context['inquiries']), 3)
+        self.assertFalse([q['sql'] for q in queries if 'COUNT(' in q['sql'].upper()])
+        client.get(reverse('properties:inquiry_detail', kwargs={'pk': Inquiry.objects.first().pk}))
+        self.assertEqual(self.counts(self.owner), (3, 2, 0))
+
+
+class InquiryInboxTest(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='agent', password='testpass123')
+        self.buyer = User.objects.create_user(username='buyer', password='testpass123')
+        self.prop = make_property(self.owner)
+        for n in range(7):
+            Inquiry.objects.create(
+                related_property=self.prop, user=self.buyer, name='B', email='b@example.com',
+                message=f'Question {n}', is_read=n % 3 == 0,
+            )
+        self.expected = list(Inquiry.objects.filter(owner=self.owner).order_by('is_read', '-created_at', '-pk').values_list('pk', flat=True))
+
+    def test_owner_copied_and_transferred(self):
+        """Test inquiries carry the listing owner and follow a transfer"""
+        self.assertEqual(set(Inquiry.objects.values_list('owner', flat=True)), {self.owner.pk})
+        new_owner = User.objects.create_user(username='other', password='testpass123')
+        self.prop.owner = new_owner
+        self.prop.save()
+        self.assertEqual(Inquiry.objects.filter(owner=new_owner).count(), 7)
+
+    def test_fixture_without_owner_loads(self):
+        """Test the sample inquiries fixture loads and takes each listing's owner"""
+        fixtures = [str(settings.BASE_DIR / 'fixtures' / f'{name}.json') for name in ('users', 'profiles', 'properties', 'inquiries')]
+        call_command('loaddata', *fixtures, verbosity=0)
+        loaded = Inquiry.objects.filter(email='mike@example.com').select_related('related_property')
+        self.assertTrue(loaded)
+        for inquiry in loaded:
+            self.assertEqual(inquiry.owner_id, inquiry.related_property.owner_id)
+
+    def test_pages_unread_first_both_ways(self):
+        """Test keyset pages walk unread-then-read, newest first, forward and back"""
+        paginator = InboxPaginator(Inquiry.objects.filter(owner=self.owner), 3)
+        pages, page = [], paginator.page()
+        while True:
+            pages.append([inquiry.pk for inquiry in page])
+            if not page.has_next():
+                break
+            page = paginator.page(page.next_cursor)
+        self.assertEqual(sum(pages, []), self.expected)
+        # the unread run ends mid-page and is topped up from the read run
+        self.assertEqual([len(p) for p in pages], [3, 3, 1])
+        back = paginator.page(page.previous_cursor)
+        self.assertEqual([inquiry.pk for inquiry in back], pages[1])
+        self.assertEqual([inquiry.pk for inquiry in paginator.page(back.previous_cursor)], pages[0])
+        self.assertFalse(paginator.page(back.previous_cursor).has_previous())
+
+    def test_inbox_query_uses_index(self):
+        """Test a deep inbox page seeks on inquiry_inbox_idx without sorting"""
+        paginator = InboxPaginator(Inquiry.objects.filter(owner=self.owner), 3)
+        cursor = paginator.page().next_cursor
+        with CaptureQueriesContext(connection) as queries:
+            paginator.page(cursor)
+        for query in queries:
+            with connection.cursor() as plan_cursor:
+                plan_cursor.execute('EXPLAIN QUERY PLAN ' + query['sql'])
+                plan = ' '.join(str(row[-1]) for row in plan_cursor.fetchall())
+            self.assertIn('inquiry_inbox_idx', plan)
+            self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_inbox_view_cursor_links(self):
+        """Test the inbox view pages by cursor and rejects a bad one"""
+        client = Client()
+        client.login(username='agent', password='testpass123')
+        url = reverse('properties:inquiry_list')
+        first = client.get(url)
+        self.assertEqual([i.pk for i in first.context['inquiries']], self.expected)
+        self.assertFalse(first.context['is_paginated'])
+        self.assertEqual(client.get(url, {'cursor': 'garbage'}).status_code, 404)
+        sent = Client()
+        sent.login(username='buyer', password='testpass123')
+        response = sent.get(url, {'filter': 'sent'})
+        self.assertEqual(len(response.context['inquiries']), 7)
+        self.assertEqual(response.context['sent_count'], 7)
+
+
+class PerfSeedBenchTest(TestCase):
+    def seed(self, **options):
+        out = StringIO()
+        args = {'users': 10, 'properties': 60, 'inquiries': 300, 'images_per_property': 2, 'batch_size': 25, **options}
+        call_command('perf_seed', *[f'--{key.replace("_", "-")}={value}' for key, value in args.items()], stdout=out)
+        return out.getvalue()
+
+    def test_seed_creates_consistent_data(self):
+        """Test perf_seed bulk-loads rows with owners, coordinates and counters filled in"""
+        self.assertIn('Created 10 users, 60 properties and 300 inquiries', self.seed())
+        self.assertEqual(Property.objects.count(), 60)
+        self.assertEqual(Inquiry.objects.count(), 300)
+        self.assertEqual(UserProfile.objects.filter(role=UserProfile.AGENT).count(), 1)
+        self.assertFalse(Property.objects.filter(geohash='').exists())
+        self.assertFalse(Inquiry.objects.filter(notified_at__isnull=True).exists())
+        for inquiry in Inquiry.objects.select_related('related_property')[:50]:
+            self.assertEqual(inquiry.owner_id, inquiry.related_property.owner_id)
+            self.assertGreaterEqual(inquiry.created_at, inquiry.related_property.created_at)
+        # listings are backdated, not all stamped with the seeding time
+        self.assertGreater(Property.objects.dates('created_at', 'day').count(), 10)
+        self.assertEqual(reconcile(dry_run=True), (0, 0))
+        self.assertTrue(get_search_backend().search(Property.objects.all(), Property.objects.first().city.lower()).exists())
+
+    def test_seed_refuses_seeded_database(self):
+        """Test perf_seed will not add a second data set on top of the first"""
+        self.seed()
+        with self.assertRaises(CommandError):
+            self.seed()
+
+    def test_bench_reports_and_compares(self):
+        """Test perf_bench reports every scenario, rolls back its writes and flags regressions"""
+        self.seed()
+        properties = Property.objects.count()
+        out = StringIO()
+        call_command('perf_bench', '--iterations=2', '--warmup=0', '--host=testserver', stdout=out)
+        results = json.loads(out.getvalue())
+        scenarios = results['scenarios']
+        self.assertTrue({'list', 'list_near', 'list_sort_price_asc', 'detail_owner', 'inbox', 'profile', 'create_inquiry'} <= set(scenarios))
+        self.assertEqual(set(scenarios['list']), {'n', 'p50_ms', 'p95_ms', 'p99_ms', 'mean_ms', 'queries'})
+        self.assertEqual(Property.objects.count(), properties)
+        slower = {'scenarios': {'list': dict(scenarios['list'], p95_ms=scenarios['list']['p95_ms'] / 2)}}
+        self.assertTrue(compare(results, slower)['list']['regressed'])
+        self.assertFalse(compare(results, results)['detail']['regressed'])
+        with self.assertRaises(CommandError):
+            call_command('perf_bench', '--only=nope', '--host=testserver', stdout=StringIO())
+
+    def test_percentile_nearest_rank(self):
+        """Test percentiles use the nearest-rank method"""
+        values = list(range(1, 101))
+        self.assertEqual((percentile(values, 50), percentile(values, 95), percentile(values, 99)), (50, 95, 99))
+        self.assertEqual(percentile([7], 99), 7)
+
+
+class AsyncViewTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username='agent', password='testpass123')
+        self.buyer = User.objects.create_user(username='buyer', password='testpass123')
+        for i in range(13):
+            make_property(self.owner, title=f'Async Home {i}', price=Decimal(100000 + (i % 4) * 25000))
+        self.prop = Property.objects.order_by('pk').first()
+        PropertyImage.objects.create(property=self.prop, image='properties/gallery/a.jpg', caption='Front')
+        for n in range(5):
+            Inquiry.objects.create(
+                related_property=self.prop, user=self.buyer, name='B', email='b@example.com',
+                message=f'Question {n}', is_read=n < 2,
+            )
+
+    async def call(self, view_class, path, user=None, headers=None, **kwargs):
+        request = AsyncRequestFactory().get(path, headers=headers)
+        request.user = user or AnonymousUser()
+        request.session = SessionStore()
+        request._messages = FallbackStorage(request)
+        response = await view_class.as_view()(request, **kwargs)
+        if hasattr(response, 'render'):
+            await sync_to_async(response.render)()
+        return response
+
+    async def sync_context(self, path, user=None):
+        def get():
+            client = Client()
+            if user is not None:
+                client.force_login(user)
+            return client.get(path).context
+        return await sync_to_async(get)()
+
+    async def test_list_matches_sync_view(self):
+        """Test the async list view pages, sorts and counts like the sync one"""
+        for query in ('', '?sort=price_asc', '?page=2', '?page=last', '?cursor=&sort=price_desc'):
+            path = reverse('properties:property_list') + query
+            response = await self.call(AsyncPropertyListView, path)
+            self.assertEqual(response.status_code, 200, query)
+            expected = await self.sync_context(path)
+            self.assertEqual([p.pk for p in response.context_data['properties']], [p.pk for p in expected['properties']], query)
+            self.assertEqual(response.context_data['total_properties'], 13)
+        with self.assertRaises(Http404):
+            await self.call(AsyncPropertyListView, '/?page=9')
+        with self.assertRaises(Http404):
+            await self.call(AsyncPropertyListView, '/?cursor=garbage')
+
+    async def test_list_conditional_get(self):
+        """Test the async list view sends an ETag and answers a match with 304"""
+        response = await self.call(AsyncPropertyListView, '/')
+        self.assertIn('ETag', response)
+        again = await self.call(AsyncPropertyListView, '/', headers={'If-None-Match': response['ETag']})
+        self.assertEqual(again.status_code, 304)
+
+    async def test_detail_loads_images_and_owner_badge(self):
+        """Test the async detail view shows images to all and the unread badge to the owner only"""
+        path = self.prop.get_absolute_url()
+        owner = await self.call(AsyncPropertyDetailView, path, user=self.owner, pk=self.prop.pk)
+        self.assertEqual(owner.status_code, 200)
+        self.assertTrue(owner.context_data['is_owner'])
+        self.assertEqual(owner.context_data['inquiry_count'], 3)
+        self.assertEqual([i.caption for i in owner.context_data['images']], ['Front'])
+        buyer = await self.call(AsyncPropertyDetailView, path, user=self.buyer, pk=self.prop.pk)
+        self.assertNotIn('inquiry_count', buyer.context_data)
+        self.assertIn('inquiry_form', buyer.context_data)
+        with self.assertRaises(Http404):
+            await self.call(AsyncPropertyDetailView, '/property/0/', pk=0)
+
+    async def test_inbox_requires_login_and_matches_sync(self):
+        """Test the async inbox redirects anonymous users and pages like the sync one"""
+        path = reverse('properties:inquiry_list')
+        anonymous = await self.call(AsyncInquiryListView, path)
+        self.assertEqual(anonymous.status_code, 302)
+        response = await self.call(AsyncInquiryListView, path, user=self.owner)
+        expected = await self.sync_context(path, self.owner)
+        self.assertEqual([i.pk for i in response.context_data['inquiries']], [i.pk for i in expected['inquiries']])
+        self.assertEqual((response.context_data['received_count'], response.context_data['unread_count']), (5, 3))
+        sent = await self.call(AsyncInquiryListView, path + '?filter=sent', user=self.buyer)
+        self.assertEqual(sent.context_data['sent_count'], 5)
+
+    async def test_apage_matches_page(self):
+        """Test the paginators' async pages equal their sync pages"""
+        inbox = InboxPaginator(Inquiry.objects.filter(owner=self.owner), 2)
+        first = await inbox.apage()
+        second = await inbox.apage(first.next_cursor)
+        sync_second = await sync_to_async(inbox.page)(first.next_cursor)
+        self.assertEqual([i.pk for i in second], [i.pk for i in sync_second])
+        self.assertEqual(second.next_cursor, sync_second.next_cursor)
+        listing = CursorPaginator(Property.objects.all(), 5, sort='price_asc')
+        page = await listing.apage()
+        self.assertEqual([p.pk for p in page], [p.pk for p in await sync_to_async(listing.page)()])
+
+
+SHARDS = ['shard_east', 'shard_west']
+
+
+class ShardingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # two throwaway in-memory shards, migrated like `migrate --database`
+        cls._shard_settings = override_settings(
+            PROPERTY_SHARDS=SHARDS, PROPERTY_SHARD_STATES={'Texas': 'shard_east', 'California': 'shard_west'},
+        )
+        cls._shard_settings.enable()
+        cls._shard_names = {}
+        for alias in SHARDS:
+            settings.DATABASES[alias] = connections.configure_settings({
+                'default': settings.DATABASES['default'],
+                alias: {'ENGINE': 'realestate_project.backends.sqlite3', 'NAME': ':memory:'},
+            })[alias]
+            cls._shard_names[alias] = connections[alias].settings_dict['NAME']
+            connections[alias].creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        # set here rather than on the class, which the runner reads before the aliases exist
+        cls.databases = {'default', *SHARDS}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        for alias in SHARDS:
+            connections[alias].creation.destroy_test_db(cls._shard_names[alias], verbosity=0)
+            del connections[alias]
+            del settings.DATABASES[alias]
+        cls._shard_settings.disable()
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.owner = User.objects.create_user(username='agent', password='testpass123')
+        self.buyer = User.objects.create_user(username='buyer', password='testpass123')
+
+    def test_shard_lookup(self):
+        """Test states map to shards and pks map back to the shard that allocated them"""
+        self.assertEqual(shard_for_state(' texas'), 'shard_east')
+        self.assertEqual(shard_for_state('California'), 'shard_west')
+        self.assertIn(shard_for_state('Ohio'), SHARDS)
+        self.assertEqual(shard_for_state('Ohio'), shard_for_state('OHIO'))
+        self.assertEqual(shard_for_pk(5), 'default')
+        self.assertEqual(shard_for_pk((2 << SHARD_PK_BITS) + 5), 'shard_west')
+        self.assertEqual(shard_for_pk(9 << SHARD_PK_BITS), 'default')
+        self.assertEqual(shard_for_pk('bogus'), 'default')
+        self.assertFalse(ShardRouter().allow_migrate('shard_east', 'accounts', 'userprofile'))
+        self.assertTrue(ShardRouter().allow_migrate('shard_east', 'properties', 'inquiry'))
+
+    def test_listing_rows_follow_listing_shard(self):
+        """Test a listing, its photos, inquiries and counter are stored on its state's shard"""
+        prop = make_property(self.owner, state='Texas')
+        self.assertEqual(prop._state.db, 'shard_east')
+        self.assertEqual(prop.pk >> SHARD_PK_BITS, 1)
+        image = PropertyImage.objects.create(property=prop, image='properties/front.jpg', caption='Front')
+        inquiry = Inquiry.objects.create(
+            related_property=prop, user=self.buyer, name='B', email='b@example.com', message='Hi',
+        )
+        self.assertEqual((image._state.db, inquiry._state.db), ('shard_east', 'shard_east'))
+        self.assertEqual(shard_for_pk(inquiry.pk), 'shard_east')
+        self.assertEqual(inquiry.owner_id, self.owner.pk)
+        self.assertEqual(PropertyInquiryCounter.objects.using('shard_east').get(property=prop).unread, 1)
+        self.assertFalse(Property.objects.using('default').exists())
+        self.assertFalse(Property.objects.using('shard_west').exists())
+
+    def test_list_merges_shards_in_order(self):
+        """Test the list page merges every database's rows in the requested order"""
+        Property.objects.using('default').create(**{
+            'title': 'Legacy', 'description': 'd', 'price': Decimal('150000'), 'address': 'a', 'city': 'c',
+            'state': 'Texas', 'zipcode': 'z', 'bedrooms': 1, 'bathrooms': 1, 'area': 1,
+            'property_type': Property.HOUSE, 'status': Property.AVAILABLE, 'owner': self.owner,
+        })
+        for n in range(12):
+            make_property(self.owner, state=['Texas', 'California', 'Ohio'][n % 3], price=Decimal(100000 + n * 7919 % 50000))
+        expected = sorted(
+            (p for alias in ['default', *SHARDS] for p in Property.objects.using(alias).all()),
+            key=lambda p: (p.price, p.pk),
+        )
+        first = self.client.get(reverse('properties:property_list'), {'sort': 'price_asc'})
+        second = self.client.get(reverse('properties:property_list'), {'sort': 'price_asc', 'page': 2})
+        self.assertEqual(first.context['total_properties'], 13)
+        listed = list(first.context['properties']) + list(second.context['properties'])
+        self.assertEqual([p.pk for p in listed], [p.pk for p in expected])
+        pks, params = [], {'sort': 'price_asc', 'cursor': ''}
+        while True:
+            response = self.client.get(reverse('properties:property_list'), params)
+            page = response.context['page_obj']
+            pks += [p.pk for p in page]
+            if not page.has_next():
+                break
+            params['cursor'] = page.next_cursor
+        self.assertEqual(pks, [p.pk for p in expected])
+
+    def test_shared_photo_kept_while_any_shard_uses_it(self):
+        """Test a photo blob is deleted only once no listing on any database references it"""
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        media = override_settings(MEDIA_ROOT=tmp.name)
+        media.enable()
+        self.addCleanup(media.disable)
+        buffer = BytesIO()
+        Image.new('RGB', (32, 24), (200, 10, 90)).save(buffer, 'JPEG')
+        listings = [
+            make_property(self.owner, state=state, featured_image=SimpleUploadedFile('p.jpg', buffer.getvalue()))
+            for state in ('Texas', 'Texas', 'California')
+        ]
+        name = listings[0].featured_image.name
+        self.assertTrue(is_blob(name))
+        self.assertEqual(blob_references(name), 3)
+        for listing, alias, remaining in zip(listings, ['shard_east', 'shard_east', 'shard_west'], [True, True, False]):
+            with self.captureOnCommitCallbacks(using=alias, execute=True):
+                listing.delete()
+            self.assertEqual(default_storage.exists(name), remaining)
+
+    def test_user_constraints_only_dropped_on_shards(self):
+        """Test default keeps the user foreign keys while shards, with no user table, drop them"""
+        def user_fks(alias):
+            with connections[alias].cursor() as cursor:
+                constraints = connections[alias].introspection.get_constraints(cursor, 'properties_inquiry')
+            return sorted(c['columns'][0] for c in constraints.values() if c['foreign_key'] and c['foreign_key'][0] == 'auth_user')
+        self.assertEqual(user_fks('default'), ['owner_id', 'user_id'])
+        self.assertEqual(user_fks('shard_east'), [])
+
+    def test_digests_and_autocomplete_cover_shards(self):
+        """Test digests and the autocomplete counts include listings on every shard"""
+        self.owner.email = 'agent@example.com'
+        self.owner.save()
+        UserProfile.objects.filter(user=self.owner).update(digest_mode=UserProfile.HOURLY)
+        for state in ('Texas', 'California'):
+            Inquiry.objects.create(
+                related_property=make_property(self.owner, city='Springfield', state=state),
+                user=self.buyer, name='B', email='b@example.com', message='Hi',
+            )
+        self.assertEqual(send_digests(UserProfile.HOURLY), (1, 2))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertFalse(any(Inquiry.objects.using(alias).filter(notified_at__isnull=True).exists() for alias in SHARDS))
+        reset_autocomplete_index()
+        self.addCleanup(reset_autocomplete_index)
+        suggestions = get_autocomplete_index().suggest('springfield')
+        self.assertEqual(sorted(s['label'] for s in suggestions), ['Springfield, California', 'Springfield, Texas'])
+
+    def test_scatter_queryset(self):
+        """Test slicing, counting and aggregating across shards"""
+        for n, state in enumerate(['Texas', 'California', 'Texas', 'Ohio']):
+            make_property(self.owner, state=state, price=Decimal(100 + n))
+        merged = ScatterQuerySet(Property.objects.order_by('-price', 'pk'))
+        self.assertEqual([p.price for p in merged[1:3]], [Decimal(102), Decimal(101)])
+        self.assertEqual(merged[0].price, Decimal(103))
+        self.assertEqual(merged.filter(state='Texas').count(), 2)
+        self.assertEqual(merged.aggregate(total=Sum('price'), top=Max('price')), {'total': Decimal(406), 'top': Decimal(103)})
+        with self.assertRaises(TypeError):
+            merged[:2].filter(state='Texas')
+        with self.assertRaises(TypeError):
+            merged.aggregate(average=Avg('price'))
+
+    def test_reconcile_counts_every_shard(self):
+        """Test reconciling keeps inquiries held on shards and fixes each shard's listing counters"""
+        texas, california = make_property(self.owner, state='Texas'), make_property(self.owner, state='California')
+        for prop in (texas, california):
+            Inquiry.objects.create(related_property=prop, user=self.buyer, name='B', email='b@example.com', message='Hi')
+        PropertyInquiryCounter.objects.using('shard_east').filter(property=texas).update(unread=5)
+        self.assertEqual(reconcile(), (0, 1))
+        owner = UserInquiryCounter.objects.get(user=self.owner)
+        self.assertEqual((owner.received, owner.unread), (2, 2))
+        self.assertEqual(UserInquiryCounter.objects.get(user=self.buyer).sent, 2)
+        for alias, prop in (('shard_east', texas), ('shard_west', california)):
+            self.assertEqual(PropertyInquiryCounter.objects.using(alias).get(property=prop).unread, 1)
+
+    def test_failed_inquiry_rolls_back_every_database(self):
+        """Test an inquiry on a shard is not kept when queueing its notification fails"""
+        prop = make_property(self.owner, state='California')
+        self.client.force_login(self.buyer)
+        url = reverse('properties:inquiry_create', kwargs={'pk': prop.pk})
+        with mock.patch('apps.properties.views.notify_owner', side_effect=RuntimeError('queue down')):
+            with self.assertRaises(RuntimeError):
+                self.client.post(url, {'name': 'Buyer', 'email': 'buyer@example.com', 'message': 'Still available?'})
+        self.assertFalse(Inquiry.objects.using('shard_west').exists())
+        self.assertFalse(PropertyInquiryCounter.objects.using('shard_west').filter(unread__gt=0).exists())
+        self.assertFalse(UserInquiryCounter.objects.filter(received__gt=0).exists())
+        self.client.post(url, {'name': 'Buyer', 'email': 'buyer@example.com', 'message': 'Still available?'})
+        inquiry = Inquiry.objects.using('shard_west').get()
+        self.assertEqual(Job.objects.get().payload['inquiry_id'], inquiry.pk)
+
+    def test_feed_merges_every_database(self):
+        """Test /api/listings/ streams the listings of every database in order and pages across them"""
+        for n, state in enumerate(['Texas', 'California', 'Ohio', 'Texas', 'California']):
+            make_property(self.owner, state=state, price=Decimal(100000 + n * 1000))
+        url = reverse('properties:listing_feed')
+        rows = [json.loads(line) for line in b''.join(self.client.get(url, {'sort': 'price_desc'}).streaming_content).splitlines()]
+        self.assertEqual([row['price'] for row in rows], [f'{100000 + n * 1000}.00' for n in range(4, -1, -1)])
+        first = json.loads(b''.join(self.client.get(url, {'format': 'json', 'limit': 2, 'sort': 'price_desc'}).streaming_content))
+        rest = json.loads(b''.join(self.client.get(
+            url, {'format': 'json', 'limit': 5, 'sort': 'price_desc', 'cursor': first['next_cursor']},
+        ).streaming_content))
+        self.assertEqual([row['id'] for row in first['results'] + rest['results']], [row['id'] for row in rows])
+
+    def test_mark_read_updates_inquiries_on_their_shard(self):
+        """Test bulk read changes reach the shard holding the inquiries and keep the counters right"""
+        texas, california = make_property(self.owner, state='Texas'), make_property(self.owner, state='California')
+        for prop in (texas, texas, california):
+            Inquiry.objects.create(related_property=prop, user=self.buyer, name='B', email='b@example.com', message='Hi')
+        self.assertEqual(mark_read(Inquiry.objects.using('shard_east')), 2)
+        self.assertEqual(mark_read(Inquiry.objects.using('shard_west')), 1)
+        self.assertFalse(any(Inquiry.objects.using(alias).filter(is_read=False).exists() for alias in SHARDS))
+        self.assertEqual(UserInquiryCounter.objects.get(user=self.owner).unread, 0)
+        self.assertEqual(PropertyInquiryCounter.objects.using('shard_east').get(property=texas).unread, 0)
+        self.assertEqual(mark_read(Inquiry.objects.using('shard_west'), False), 1)
+        self.assertEqual(UserInquiryCounter.objects.get(user=self.owner).unread, 1)
+        self.assertEqual(PropertyInquiryCounter.objects.using('shard_west').get(property=california).unread, 1)
+        self.assertEqual(reconcile(), (0, 0))
+
+    def test_pk_urls_reach_their_shard(self):
+        """Test detail, inquiry, inbox and delete work on a sharded listing"""
+        prop = make_property(self.owner, state='California')
+        self.assertEqual(self.client.get(prop.get_absolute_url()).status_code, 200)
+        self.client.force_login(self.buyer)
+        self.client.post(
+            reverse('properties:inquiry_create', kwargs={'pk': prop.pk}),
+            {'name': 'Buyer', 'email': 'buyer@example.com', 'message': 'Still available?'},
+        )
+        inquiry = Inquiry.objects.using('shard_west').get()
+        self.client.force_login(self.owner)
+        inbox = self.client.get(reverse('properties:inquiry_list'))
+        self.assertEqual([i.pk for i in inbox.context['inquiries']], [inquiry.pk])
+        self.assertEqual(self.client.get(reverse('properties:inquiry_detail', kwargs={'pk': inquiry.pk})).status_code, 200)
+        self.assertTrue(Inquiry.objects.using('shard_west').get().is_read)
+        self.client.post(reverse('properties:property_delete', kwargs={'pk': prop.pk}))
+        self.assertFalse(Property.objects.using('shard_west').exists())
+        self.assertFalse(Inquiry.objects.using('shard_west').exists())
+
+
+class SQLiteProductionBackendTest(SimpleTestCase):
+    def wrapper(self, directory, **options):
+        settings_dict = connections.configure_settings({
+            'default': settings.DATABASES['default'],
+            'profile': {
+                'ENGINE': 'realestate_project.backends.sqlite3', 'NAME': os.path.join(directory, 'db.sqlite3'),
+                'OPTIONS': options,
+            },
+        })['profile']
+        wrapper = ProductionSQLiteWrapper(settings_dict, 'profile')
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def test_pragmas_applied_on_connect(self):
+        """Test init_command runs on every new connection and is not passed to sqlite3.connect"""
+        with tempfile.TemporaryDirectory() as directory:
+            wrapper = self.wrapper(directory, init_command='PRAGMA journal_mode = WAL; PRAGMA busy_timeout = 1234;', timeout=1)
+            with wrapper.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode')
+                self.assertEqual(cursor.fetchone()[0], 'wal')
+                cursor.execute('PRAGMA busy_timeout')
+                self.assertEqual(cursor.fetchone()[0], 1234)
+            wrapper.close()
+
+    def test_immediate_transactions_take_write_lock(self):
+        """Test transactions open with BEGIN IMMEDIATE, holding the write lock before the first write"""
+        with tempfile.TemporaryDirectory() as directory:
+            wrapper = self.wrapper(directory, transaction_mode='immediate')
+            wrapper.set_autocommit(False, force_begin_transaction_with_broken_autocommit=True)
+            other = sqlite3.connect(os.path.join(directory, 'db.sqlite3'), timeout=0, isolation_level=None)
+            with self.assertRaisesMessage(sqlite3.OperationalError, 'database is locked'):
+                other.execute('BEGIN IMMEDIATE')
+            other.close()
+            wrapper.rollback()
+            wrapper.set_autocommit(True)
+            wrapper.close()
+            with self.assertRaises(ImproperlyConfigured):
+                self.wrapper(directory, transaction_mode='eventually').transaction_mode
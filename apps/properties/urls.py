@@ -1,6 +1,17 @@
+from django.conf import settings
 from django.urls import path
+
+from apps.replicas.router import replica_reads
+
+from .sharding import shard_by_pk
 from .views import (
+    AsyncInquiryListView,
+    AsyncPropertyDetailView,
+    AsyncPropertyListView,
     PropertyListView,
+    autocomplete_view,
+    listing_feed_view,
+    resized_image_view,
     PropertyDetailView,
     PropertyCreateView,
     PropertyUpdateView,
@@ -12,13 +23,22 @@ from .views import (
 
 app_name = 'properties'
 
+# under an ASGI server the read-heavy pages are served by native async views
+if getattr(settings, 'PROPERTY_ASYNC_VIEWS', False):
+    list_view, detail_view, inbox_view = AsyncPropertyListView, AsyncPropertyDetailView, AsyncInquiryListView
+else:
+    list_view, detail_view, inbox_view = PropertyListView, PropertyDetailView, InquiryListView
+
 urlpatterns = [
-    path('', PropertyListView.as_view(), name='property_list'),
-    path('property/<int:pk>/', PropertyDetailView.as_view(), name='property_detail'),
-    path('property/<int:pk>/inquiry/', inquiry_create_view, name='inquiry_create'),
+    path('', replica_reads(list_view.as_view()), name='property_list'),
+    path('autocomplete/', autocomplete_view, name='autocomplete'),
+    path('api/listings/', replica_reads(listing_feed_view), name='listing_feed'),
+    path('images/<int:width>/<int:quality>/<path:name>', resized_image_view, name='resized_image'),
+    path('property/<int:pk>/', replica_reads(shard_by_pk(detail_view.as_view())), name='property_detail'),
+    path('property/<int:pk>/inquiry/', shard_by_pk(inquiry_create_view), name='inquiry_create'),
     path('property/new/', PropertyCreateView.as_view(), name='property_create'),
-    path('property/<int:pk>/edit/', PropertyUpdateView.as_view(), name='property_update'),
-    path('property/<int:pk>/delete/', PropertyDeleteView.as_view(), name='property_delete'),
-    path('inquiries/', InquiryListView.as_view(), name='inquiry_list'),
-    path('inquiry/<int:pk>/', InquiryDetailView.as_view(), name='inquiry_detail'),
+    path('property/<int:pk>/edit/', shard_by_pk(PropertyUpdateView.as_view()), name='property_update'),
+    path('property/<int:pk>/delete/', shard_by_pk(PropertyDeleteView.as_view()), name='property_delete'),
+    path('inquiries/', inbox_view.as_view(), name='inquiry_list'),
+    path('inquiry/<int:pk>/', shard_by_pk(InquiryDetailView.as_view()), name='inquiry_detail'),
 ]
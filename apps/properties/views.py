@@ -1,110 +1,208 @@
+import asyncio
+import os
+
+from asgiref.sync import sync_to_async
+from django.core.paginator import InvalidPage
 from django.shortcuts import render, redirect, get_object_or_404
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
+from django.views.generic.list import BaseListView
 from django.urls import reverse_lazy
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.decorators import login_required
 from django.db.models import Q
-from django.core.mail import send_mail
+from django.db import transaction
 from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from django.utils.decorators import classonlymethod, method_decorator
+from django.utils.cache import get_conditional_response, patch_cache_control
 
-from .models import Property, Inquiry
+from .models import Property, PropertyImage, PropertyInquiryCounter, Inquiry, UserInquiryCounter
 from .forms import PropertyForm, PropertySearchFilterForm, InquiryForm
-
-
+from .pagination import CachedCountPaginator, CursorPaginator, InboxPaginator, InvalidCursor, get_ordering
+from .filters import normalize_filters, apply_filters
+from .counts import acached_count, cached_count
+from .counters import property_unread, user_counts
+from .listing_index import IndexedListing, get_listing_index
+from .autocomplete import get_autocomplete_index
+from .conditional import conditional_page, list_validators, detail_validators
+from . import feed
+from .resizer import CONTENT_TYPES, ResizeError, get_resize_cache, resized_path
+from .tasks import notify_owner
+from .sharding import scatter, shard_aliases, with_users
+
+
+@method_decorator(conditional_page(list_validators), name='get')
 class PropertyListView(ListView):
 	model = Property
 	template_name = 'properties/property_list.html'
 	context_object_name = 'properties'
 	paginate_by = 10
-
-	def get_queryset(self):
-		queryset = Property.objects.filter(status=Property.AVAILABLE)
-
-		# bind filter form to GET params
-		data = self.request.GET
-		search = data.get('search')
-		property_type = data.get('property_type')
-		min_price = data.get('min_price')
-		max_price = data.get('max_price')
-		bedrooms = data.get('bedrooms')
-		bathrooms = data.get('bathrooms')
-		sort = data.get('sort')
-
-		if search:
-			queryset = queryset.filter(Q(city__icontains=search) | Q(state__icontains=search))
-
-		if property_type:
-			queryset = queryset.filter(property_type=property_type)
-
+	# 'offset' (numbered pages) or 'cursor' (keyset); a ?cursor= param always selects cursor mode
+	pagination_mode = getattr(settings, 'PROPERTY_LIST_PAGINATION', 'offset')
+
+	def use_cursor_pagination(self):
+		# relevance ranks are computed per query, so there is no column to seek on
+		if getattr(self, 'ranked', False):
+			return False
+		return self.pagination_mode == 'cursor' or 'cursor' in self.request.GET
+
+	def paginate_queryset(self, queryset, page_size):
+		if not self.use_cursor_pagination():
+			return super().paginate_queryset(queryset, page_size)
+		paginator = CursorPaginator(queryset, page_size, sort=self.request.GET.get('sort', ''))
 		try:
-			if min_price:
-				queryset = queryset.filter(price__gte=min_price)
-		except Exception:
-			pass
+			page = paginator.page(self.request.GET.get('cursor'))
+		except InvalidCursor:
+			raise Http404('Invalid cursor.')
+		return (paginator, page, page.object_list, page.has_other_pages())
 
-		try:
-			if max_price:
-				queryset = queryset.filter(price__lte=max_price)
-		except Exception:
-			pass
+	def get_paginator(self, queryset, per_page, **kwargs):
+		return CachedCountPaginator(queryset, per_page, count_func=self.get_total_count, **kwargs)
 
-		try:
-			if bedrooms:
-				queryset = queryset.filter(bedrooms__gte=int(bedrooms))
-		except Exception:
-			pass
+	def get_total_count(self):
+		if isinstance(self.object_list, IndexedListing):
+			return len(self.object_list)
+		return cached_count(self.filters, self.object_list)
 
-		try:
-			if bathrooms:
-				queryset = queryset.filter(bathrooms__gte=float(bathrooms))
-		except Exception:
-			pass
-
-		# Sorting options
-		if sort == 'price_asc':
-			queryset = queryset.order_by('price')
-		elif sort == 'price_desc':
-			queryset = queryset.order_by('-price')
-		elif sort == 'area_asc':
-			queryset = queryset.order_by('area')
-		elif sort == 'area_desc':
-			queryset = queryset.order_by('-area')
-		elif sort == 'oldest':
-			queryset = queryset.order_by('created_at')
+	def get_queryset(self):
+		queryset = Property.objects.filter(status=Property.AVAILABLE)
+
+		# normalized filters double as the result-count cache key
+		self.filters = normalize_filters(self.request.GET)
+		sort = self.request.GET.get('sort')
+		self.ranked = sort == 'relevance' and bool(self.filters.search)
+
+		# answer plain filter/sort requests from the in-memory index when enabled;
+		# it only holds default's listings, so sharded setups read the databases
+		index = None if shard_aliases() else get_listing_index()
+		if index is not None and index.supports(self.filters) and not self.use_cursor_pagination():
+			return index.query(self.filters, sort)
+		queryset = apply_filters(queryset, self.filters, rank=self.ranked)
+
+		# sorting options, with pk as a stable tie-breaker
+		if self.ranked:
+			queryset = queryset.order_by('-search_rank', '-pk')
 		else:
-			queryset = queryset.order_by('-created_at')
+			queryset = queryset.order_by(*get_ordering(sort))
 
-		return queryset
+		# merges the sorted rows of every shard when sharding is on
+		return scatter(queryset)
 
 	def get_context_data(self, **kwargs):
 		context = super().get_context_data(**kwargs)
-		qs = self.get_queryset()
-		context['total_properties'] = qs.count()
+		context['total_properties'] = self.get_total_count()
 		# filter form bound to GET params
 		context['filter_form'] = PropertySearchFilterForm(self.request.GET)
 		# indicate if any filters are active
-		context['has_filters'] = any(self.request.GET.get(k) for k in ['search', 'property_type', 'min_price', 'max_price', 'bedrooms', 'bathrooms'])
+		context['filters'] = self.filters
+		context['has_filters'] = any(value is not None for value in self.filters)
 		# copy GET params for pagination links
 		params = self.request.GET.copy()
+		if 'cursor' in params:
+			# filter links restart from the first page but stay in cursor mode
+			params['cursor'] = ''
 		context['query_params'] = params
+		context['cursor_pagination'] = self.use_cursor_pagination()
+		context['property_card_timeout'] = getattr(settings, 'PROPERTY_CARD_CACHE_TIMEOUT', 60 * 60 * 24)
 		return context
 
 
+@require_GET
+def autocomplete_view(request):
+	query = request.GET.get('q', '')[:100]
+	try:
+		limit = min(max(int(request.GET.get('limit', 10)), 1), 10)
+	except ValueError:
+		limit = 10
+	results = get_autocomplete_index().suggest(query, limit=limit)
+	response = JsonResponse({'query': query, 'results': results})
+	# suggestions are shared by every visitor; let browsers reuse them briefly
+	response['Cache-Control'] = 'public, max-age=60'
+	return response
+
+
+@require_GET
+def listing_feed_view(request):
+	filters = normalize_filters(request.GET)
+	sort = feed.feed_sort(request.GET.get('sort', ''))
+	output = request.GET.get('format', feed.NDJSON)
+	if output not in (feed.NDJSON, feed.JSON):
+		return JsonResponse({'error': 'format must be ndjson or json.'}, status=400)
+	limit = None
+	if request.GET.get('limit'):
+		try:
+			limit = int(request.GET['limit'])
+		except ValueError:
+			limit = 0
+		if limit < 1:
+			return JsonResponse({'error': 'limit must be a positive integer.'}, status=400)
+	try:
+		queryset = feed.feed_queryset(filters, sort, request.GET.get('cursor'))
+	except InvalidCursor as exc:
+		return JsonResponse({'error': str(exc)}, status=400)
+	chunk_size = getattr(settings, 'PROPERTY_FEED_CHUNK_SIZE', 500)
+	rows = feed.iter_listings(queryset, request, sort, limit=limit, chunk_size=chunk_size)
+	if output == feed.JSON:
+		response = StreamingHttpResponse(feed.stream_json(rows, limit), content_type='application/json')
+	else:
+		response = StreamingHttpResponse(feed.stream_ndjson(rows), content_type='application/x-ndjson')
+	# keep reverse proxies from buffering the whole feed
+	response['X-Accel-Buffering'] = 'no'
+	return response
+
+
+@require_GET
+def resized_image_view(request, width, quality, name):
+	extension = request.GET.get('format', 'jpg')
+	try:
+		path, key = resized_path(name, width, quality, extension)
+	except ResizeError:
+		raise Http404('No such image preset.')
+	etag = f'"{key}"'
+	response = get_conditional_response(request, etag=etag)
+	if response is None:
+		accel_prefix = getattr(settings, 'PROPERTY_RESIZE_ACCEL_REDIRECT', None)
+		if accel_prefix:
+			# let nginx send the cached file itself
+			response = HttpResponse(content_type=CONTENT_TYPES[extension])
+			response['X-Accel-Redirect'] = accel_prefix + os.path.relpath(path, get_resize_cache().directory).replace(os.sep, '/')
+		else:
+			try:
+				handle = open(path, 'rb')
+			except FileNotFoundError:
+				# evicted between the lookup and the open; encode it again
+				path, key = resized_path(name, width, quality, extension)
+				handle = open(path, 'rb')
+			# FileResponse hands the file to wsgi.file_wrapper (sendfile where supported)
+			response = FileResponse(handle, content_type=CONTENT_TYPES[extension])
+		response['ETag'] = etag
+	patch_cache_control(response, public=True, max_age=60 * 60 * 24 * 365, immutable=True)
+	return response
+
+
+@method_decorator(conditional_page(detail_validators), name='get')
 class PropertyDetailView(DetailView):
 	model = Property
 	template_name = 'properties/property_detail.html'
 	context_object_name = 'property'
 
+	def get_images(self):
+		return self.object.images.all() # type: ignore
+
+	def get_unread_count(self):
+		return property_unread(self.object.pk) # type: ignore
+
 	def get_context_data(self, **kwargs):
 		context = super().get_context_data(**kwargs)
-		context['images'] = self.object.images.all() # type: ignore
+		context['images'] = self.get_images()
 		context['is_owner'] = self.request.user == self.object.owner # type: ignore
 		# Inquiry form and context for detail page
 		if self.request.user.is_authenticated:
 			if context['is_owner']:
 				# show unread inquiry count for owner
-				context['inquiry_count'] = self.object.inquiries.filter(is_read=False).count() # type: ignore
+				context['inquiry_count'] = self.get_unread_count()
 			else:
 				context['inquiry_form'] = InquiryForm(user=self.request.user)
 		else:
@@ -126,26 +224,15 @@ def inquiry_create_view(request, pk):
 			inquiry = form.save(commit=False)
 			inquiry.related_property = property_obj
 			inquiry.user = request.user
-			inquiry.save()
-			# send notification email to property owner (console backend in dev)
-			subject = f"New Inquiry for {property_obj.title}"
-			message = (
-				f"You have received a new inquiry for your property '{property_obj.title}'.\n\n"
-				f"From: {inquiry.name} ({inquiry.email})\n"
-				f"Phone: {inquiry.phone or 'N/A'}\n\n"
-				f"Message:\n{inquiry.message}\n\n"
-				f"View property: {request.build_absolute_uri(property_obj.get_absolute_url())}\n"
-			)
-			from_email = getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@realestate.com')
-			recipient_list = [property_obj.owner.email] if property_obj.owner.email else []
-			try:
-				if recipient_list:
-					send_mail(subject, message, from_email, recipient_list, fail_silently=False)
-			except Exception:
-				# don't block inquiry saving on email failure
-				messages.warning(request, 'Inquiry saved, but failed to send notification email.')
-			else:
-				messages.success(request, 'Your inquiry has been sent successfully!')
+			# the notification job commits with the inquiry; a worker (or the
+			# owner's digest) sends it. The inquiry and listing counter go to the
+			# listing's database, the job and user counters to default: default
+			# commits first, so a failed shard commit leaves at most a job the
+			# worker skips for want of its inquiry
+			with transaction.atomic(using=property_obj._state.db), transaction.atomic():
+				inquiry.save()
+				notify_owner(inquiry, request.build_absolute_uri(property_obj.get_absolute_url()))
+			messages.success(request, 'Your inquiry has been sent successfully!')
 			return redirect('properties:property_detail', pk=property_obj.pk)
 		else:
 			# keep the user on the property detail page and show errors
@@ -162,23 +249,40 @@ class InquiryListView(LoginRequiredMixin, ListView):
 	context_object_name = 'inquiries'
 	paginate_by = 20
 
+	def get_filter_type(self):
+		return 'sent' if self.request.GET.get('filter') == 'sent' else 'received'
+
 	def get_queryset(self):
-		filter_type = self.request.GET.get('filter', 'received')
-		qs = Inquiry.objects.select_related('property', 'user')
-		if filter_type == 'received':
-			# inquiries for properties owned by the user
-			return qs.filter(property__owner=self.request.user).order_by('-created_at')
-		elif filter_type == 'sent':
-			return qs.filter(user=self.request.user).order_by('-created_at')
-		# default
-		return qs.filter(property__owner=self.request.user).order_by('-created_at')
+		qs = with_users(Inquiry.objects.select_related('related_property'), 'user')
+		if self.get_filter_type() == 'sent':
+			return scatter(qs.filter(user=self.request.user))
+		# inquiries for properties owned by the user, served by inquiry_inbox_idx
+		return scatter(qs.filter(owner=self.request.user))
+
+	def get_cursor_paginator(self, queryset, page_size):
+		# keyset pages stay as fast on page 500 as on page 1
+		if self.get_filter_type() == 'sent':
+			return CursorPaginator(queryset, page_size)
+		return InboxPaginator(queryset, page_size)
+
+	def paginate_queryset(self, queryset, page_size):
+		paginator = self.get_cursor_paginator(queryset, page_size)
+		try:
+			page = paginator.page(self.request.GET.get('cursor'))
+		except InvalidCursor:
+			raise Http404('Invalid cursor.')
+		return (paginator, page, page.object_list, page.has_other_pages())
+
+	def get_counts(self):
+		return user_counts(self.request.user)
 
 	def get_context_data(self, **kwargs):
 		context = super().get_context_data(**kwargs)
-		filter_type = self.request.GET.get('filter', 'received')
-		context['filter_type'] = filter_type
-		context['received_count'] = Inquiry.objects.filter(property__owner=self.request.user).count()
-		context['sent_count'] = Inquiry.objects.filter(user=self.request.user).count()
+		counts = self.get_counts()
+		context['filter_type'] = self.get_filter_type()
+		context['received_count'] = counts.received
+		context['unread_count'] = counts.unread
+		context['sent_count'] = counts.sent
 		return context
 
 
@@ -189,14 +293,15 @@ class InquiryDetailView(LoginRequiredMixin, DetailView):
 
 	def get_queryset(self):
 		# only allow owners or inquirers to view
-		return Inquiry.objects.filter(Q(property__owner=self.request.user) | Q(user=self.request.user)).select_related('property', 'user')
+		queryset = Inquiry.objects.filter(Q(owner=self.request.user) | Q(user=self.request.user)).select_related('related_property')
+		return with_users(queryset, 'related_property__owner', 'user')
 
 	def get_object(self, queryset=None):
 		obj = super().get_object(queryset=queryset)
 		# if owner views and inquiry unread mark as read
-		if self.request.user == obj.property.owner and not obj.is_read: # type: ignore
+		if self.request.user.pk == obj.owner_id and not obj.is_read: # type: ignore
 			obj.is_read = True # type: ignore
-			obj.save()
+			obj.save(update_fields=['is_read'])
 		return obj
 
 
@@ -254,3 +359,148 @@ class PropertyDeleteView(LoginRequiredMixin, DeleteView):
 		messages.success(self.request, 'Property deleted successfully!')
 		return super().delete(request, *args, **kwargs)
 
+
+
+# Async variants of the read-heavy pages for ASGI deployments (PROPERTY_ASYNC_VIEWS).
+# They load their rows through the async ORM and run independent queries
+# concurrently; templates are still rendered by Django in a worker thread.
+
+async def aget_user(request):
+	"""``request.user`` loaded off the event loop; Django 4.2 has no ``request.auser()``."""
+	if not hasattr(request, '_cached_user'):
+		# evaluating the lazy user reads the session and user rows
+		await sync_to_async(lambda: request.user.is_authenticated)()
+	return request.user
+
+
+async def afetch(queryset):
+	return [obj async for obj in queryset.aiterator()]
+
+
+class AsyncConditionalMixin:
+	"""Wrap the async view in ``conditional_page(page_validators)``."""
+	page_validators = None
+
+	@classonlymethod
+	def as_view(cls, **initkwargs):
+		return conditional_page(cls.page_validators)(super().as_view(**initkwargs))
+
+
+class AsyncPropertyListView(AsyncConditionalMixin, PropertyListView):
+	page_validators = list_validators
+	# filled in by get() on the async path
+	page_result = total_count = None
+
+	async def get(self, request, *args, **kwargs):
+		if get_listing_index() is not None:
+			# the in-memory index is synchronous; run the whole sync view in one thread hop
+			return await sync_to_async(BaseListView.get)(self, request, *args, **kwargs)
+		await aget_user(request)
+		self.object_list = self.get_queryset()
+		page_size = self.get_paginate_by(self.object_list)
+		if self.use_cursor_pagination():
+			paginator = CursorPaginator(self.object_list, page_size, sort=request.GET.get('sort', ''))
+			try:
+				page, self.total_count = await asyncio.gather(
+					paginator.apage(request.GET.get('cursor')), acached_count(self.filters, self.object_list),
+				)
+			except InvalidCursor:
+				raise Http404('Invalid cursor.')
+		else:
+			paginator, page = await self.apaginate(page_size)
+		self.page_result = (paginator, page, page.object_list, page.has_other_pages())
+		return self.render_to_response(self.get_context_data())
+
+	async def apaginate(self, page_size):
+		"""Offset page and result count, fetched concurrently."""
+		paginator = self.get_paginator(self.object_list, page_size, orphans=self.get_paginate_orphans())
+		number = self.kwargs.get(self.page_kwarg) or self.request.GET.get(self.page_kwarg) or 1
+		count = acached_count(self.filters, self.object_list)
+		rows = None
+		if number == 'last':
+			self.total_count = await count
+			number = paginator.num_pages
+		else:
+			try:
+				number = int(number)
+			except ValueError:
+				raise Http404('Invalid page.')
+			bottom = max(number - 1, 0) * page_size
+			rows, self.total_count = await asyncio.gather(afetch(self.object_list[bottom:bottom + page_size]), count)
+		try:
+			page = paginator.page(number)
+		except InvalidPage:
+			raise Http404('Invalid page.')
+		# orphans can widen the last page past the rows fetched up front
+		if rows is None or paginator.orphans:
+			rows = await afetch(page.object_list)
+		page.object_list = rows
+		return paginator, page
+
+	def paginate_queryset(self, queryset, page_size):
+		if self.page_result is None:
+			return super().paginate_queryset(queryset, page_size)
+		return self.page_result
+
+	def get_total_count(self):
+		if self.total_count is None:
+			return super().get_total_count()
+		return self.total_count
+
+
+class AsyncPropertyDetailView(AsyncConditionalMixin, PropertyDetailView):
+	page_validators = detail_validators
+
+	async def get(self, request, *args, **kwargs):
+		user = await aget_user(request)
+		pk = self.kwargs[self.pk_url_kwarg]
+		queries = [
+			with_users(self.get_queryset(), 'owner').aget(pk=pk),
+			afetch(PropertyImage.objects.filter(property_id=pk)),
+		]
+		if user.is_authenticated:
+			# only the owner's badge shows it, so non-owners get no row back
+			unread = PropertyInquiryCounter.objects.filter(property_id=pk, property__owner=user)
+			queries.append(unread.values_list('unread', flat=True).afirst())
+		try:
+			self.object, self.images, *unread = await asyncio.gather(*queries)
+		except Property.DoesNotExist:
+			raise Http404('No property found matching the query.')
+		self.unread_count = (unread[0] if unread else None) or 0
+		return self.render_to_response(self.get_context_data(object=self.object))
+
+	def get_images(self):
+		return self.images
+
+	def get_unread_count(self):
+		return self.unread_count
+
+
+class AsyncInquiryListView(InquiryListView):
+
+	async def dispatch(self, request, *args, **kwargs):
+		user = await aget_user(request)
+		if not user.is_authenticated:
+			return self.handle_no_permission()
+		# skip LoginRequiredMixin.dispatch, which checks the user synchronously
+		return await super(LoginRequiredMixin, self).dispatch(request, *args, **kwargs)
+
+	async def get(self, request, *args, **kwargs):
+		self.object_list = self.get_queryset()
+		paginator = self.get_cursor_paginator(self.object_list, self.get_paginate_by(self.object_list))
+		try:
+			page, counts = await asyncio.gather(
+				paginator.apage(request.GET.get('cursor')),
+				UserInquiryCounter.objects.filter(user=request.user).afirst(),
+			)
+		except InvalidCursor:
+			raise Http404('Invalid cursor.')
+		self.counts = counts or UserInquiryCounter(user=request.user)
+		self.page_result = (paginator, page, page.object_list, page.has_other_pages())
+		return self.render_to_response(self.get_context_data())
+
+	def paginate_queryset(self, queryset, page_size):
+		return self.page_result
+
+	def get_counts(self):
+		return self.counts
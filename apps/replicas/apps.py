@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class ReplicasConfig(AppConfig):
+    name = 'apps.replicas'
+    verbose_name = 'Read Replicas'
+
+    def ready(self):
+        from .health import install
+        install()
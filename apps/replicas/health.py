@@ -0,0 +1,102 @@
+"""Replica selection with periodic health checks.
+
+Each process keeps the last check result per replica alias and rechecks it
+every ``DATABASE_REPLICA_CHECK_INTERVAL`` seconds when a read is routed. A
+replica is healthy when it answers a query against ``django_migrations``,
+so an unreachable database or an empty file copy both count as down. A
+query failing on a replica mid-request marks it down at once; reads go to
+the primary until a later check passes.
+"""
+import asyncio
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.db.backends.signals import connection_created
+
+
+logger = logging.getLogger(__name__)
+
+
+def configured_replicas():
+    return list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+
+def check_replica(alias):
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute('SELECT 1 FROM django_migrations LIMIT 1')
+    except DatabaseError as exc:
+        logger.warning('Replica %s failed its health check: %s', alias, exc)
+        return False
+    return True
+
+
+def _in_event_loop():
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+class ReplicaPool:
+    def __init__(self, check=check_replica):
+        self.check = check
+        self.lock = threading.Lock()
+        # alias -> (healthy, checked_at)
+        self.status = {}
+
+    def healthy(self, alias):
+        interval = getattr(settings, 'DATABASE_REPLICA_CHECK_INTERVAL', 10)
+        now = time.monotonic()
+        with self.lock:
+            healthy, checked_at = self.status.get(alias, (True, None))
+        # no queries from async code; the next read on a worker thread rechecks
+        if (checked_at is None or now - checked_at >= interval) and not _in_event_loop():
+            healthy = self.check(alias)
+            with self.lock:
+                self.status[alias] = (healthy, now)
+        return healthy
+
+    def choose(self):
+        """A random healthy replica alias, or None when there is none."""
+        candidates = [alias for alias in configured_replicas() if self.healthy(alias)]
+        return random.choice(candidates) if candidates else None
+
+    def mark_down(self, alias):
+        with self.lock:
+            self.status[alias] = (False, time.monotonic())
+
+    def reset(self):
+        with self.lock:
+            self.status.clear()
+
+
+pool = ReplicaPool()
+
+
+def _replica_failure_wrapper(alias):
+    def wrapper(execute, sql, params, many, context):
+        try:
+            return execute(sql, params, many, context)
+        except DatabaseError:
+            pool.mark_down(alias)
+            raise
+    return wrapper
+
+
+def _wrap_connection(sender, connection, **kwargs):
+    if connection.alias not in configured_replicas():
+        return
+    if not any(getattr(w, 'replica_alias', None) for w in connection.execute_wrappers):
+        wrapper = _replica_failure_wrapper(connection.alias)
+        wrapper.replica_alias = connection.alias
+        connection.execute_wrappers.append(wrapper)
+
+
+def install():
+    connection_created.connect(_wrap_connection, dispatch_uid='replica_failure_wrapper')
@@ -0,0 +1,55 @@
+import os
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from apps.replicas.health import pool
+
+
+def copy_database(source, target):
+    """Copy the SQLite file ``source`` to ``target`` without blocking writers for long."""
+    partial = f'{target}.partial'
+    src = sqlite3.connect(source)
+    try:
+        dst = sqlite3.connect(partial)
+        try:
+            # the online backup API copies a consistent snapshot while the primary is in use
+            src.backup(dst)
+            # a WAL primary copies as WAL; replicas are swapped under their readers, so keep them rollback-journal
+            dst.execute('PRAGMA journal_mode = DELETE')
+        finally:
+            dst.close()
+    finally:
+        src.close()
+    # readers holding the old file keep it; new connections open the fresh copy
+    os.replace(partial, target)
+
+
+class Command(BaseCommand):
+    help = 'Refresh the SQLite read replicas in DATABASE_REPLICAS with a copy of the default database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--every', type=float, default=0, help='Repeat every this many seconds; 0 copies once.')
+
+    def handle(self, *args, **options):
+        primary = connections['default'].settings_dict
+        # by vendor, so SQLite backends such as the production profile's qualify
+        if connections['default'].vendor != 'sqlite':
+            raise CommandError('Replica copies only work with a SQLite default database.')
+        replicas = list(getattr(settings, 'DATABASE_REPLICAS', []))
+        if not replicas:
+            raise CommandError('No replicas configured; set SQLITE_REPLICAS=<count>.')
+        while True:
+            started = time.perf_counter()
+            for alias in replicas:
+                copy_database(str(primary['NAME']), str(connections[alias].settings_dict['NAME']))
+                # drop this process's handle on the replaced file
+                connections[alias].close()
+            pool.reset()
+            self.stdout.write(f'Copied the default database to {", ".join(replicas)} in {time.perf_counter() - started:.2f}s.')
+            if not options['every']:
+                return
+            time.sleep(options['every'])
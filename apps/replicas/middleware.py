@@ -0,0 +1,86 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .router import RoutingState, _state
+
+
+STICKY_COOKIE = 'db_primary'
+
+UNSAFE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+
+class ReplicaRoutingMiddleware:
+    """Track each request's routing state and the sticky-primary cookie.
+
+    A request that writes (or uses an unsafe method) sets a short-lived
+    cookie; while it is present the user's reads all go to the primary.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'DATABASE_REPLICAS', None):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        state = RoutingState(pinned=STICKY_COOKIE in request.COOKIES)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.finish(request, response, state)
+
+    async def __acall__(self, request):
+        state = RoutingState(pinned=STICKY_COOKIE in request.COOKIES)
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.finish(request, response, state)
+
+    def finish(self, request, response, state):
+        if state.wrote or request.method in UNSAFE_METHODS:
+            response.set_cookie(
+                STICKY_COOKIE, '1', max_age=getattr(settings, 'DATABASE_REPLICA_STICKY_SECONDS', 5),
+                httponly=True, samesite='Lax',
+            )
+        if response.streaming and state.replica_reads:
+            # the body is read after this returns; route its queries the same way
+            if response.is_async:
+                response.streaming_content = self.astream(response.streaming_content, state)
+            else:
+                response.streaming_content = self.stream(response.streaming_content, state)
+        return response
+
+    def stream(self, content, state):
+        content = iter(content)
+        while True:
+            token = _state.set(state)
+            try:
+                chunk = next(content, None)
+            finally:
+                _state.reset(token)
+            if chunk is None:
+                return
+            yield chunk
+
+    async def astream(self, content, state):
+        content = aiter(content)
+        while True:
+            token = _state.set(state)
+            try:
+                chunk = await anext(content, None)
+            finally:
+                _state.reset(token)
+            if chunk is None:
+                return
+            yield chunk
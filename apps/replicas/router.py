@@ -0,0 +1,95 @@
+"""Send the public pages' reads to read replicas.
+
+Only views wrapped in ``replica_reads`` read from a replica, and only for
+GET/HEAD requests; everything else, and every write, uses ``default``.
+Within a request the first write pins the rest of its reads to the primary,
+and ``ReplicaRoutingMiddleware`` keeps the user on the primary for
+``DATABASE_REPLICA_STICKY_SECONDS`` afterwards so they read their own
+writes while the replicas catch up.
+
+Sessions, users, profiles and content types are always read from the
+primary: a replica copied before a login, logout, password change or
+deactivation would otherwise sign the user out or keep them signed in.
+"""
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+
+from .health import configured_replicas, pool
+
+
+PRIMARY = 'default'
+
+# apps whose rows decide who the user is and what they may do
+PRIMARY_ONLY_APPS = {'sessions', 'auth', 'contenttypes', 'accounts'}
+
+_state = ContextVar('replica_routing', default=None)
+
+
+class RoutingState:
+    def __init__(self, pinned=False):
+        # set by replica_reads for safe requests to the public views
+        self.replica_reads = False
+        # the user wrote recently (sticky cookie)
+        self.pinned = pinned
+        # this request wrote
+        self.wrote = False
+        # one replica per request, so its reads see a single snapshot
+        self.replica = None
+
+
+def current_state():
+    return _state.get()
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in PRIMARY_ONLY_APPS:
+            return PRIMARY
+        state = _state.get()
+        if state is None or not state.replica_reads or state.pinned or state.wrote:
+            return PRIMARY
+        if state.replica is None or state.replica not in configured_replicas():
+            state.replica = pool.choose()
+        return state.replica or PRIMARY
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas are copies of the primary, so rows relate across them
+        aliases = {PRIMARY, *configured_replicas()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in configured_replicas():
+            return False
+        return None
+
+
+def replica_reads(view):
+    """Let a view's GET/HEAD requests read from a replica."""
+    def enable(request):
+        state = _state.get()
+        if state is not None:
+            # left on after the view returns so a streamed body reads from the replica too
+            state.replica_reads = request.method in ('GET', 'HEAD')
+
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            enable(request)
+            return await view(request, *args, **kwargs)
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        enable(request)
+        return view(request, *args, **kwargs)
+    return wrapper
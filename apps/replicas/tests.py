@@ -0,0 +1,235 @@
+import os
+import sqlite3
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.sessions.models import Session
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connections
+from django.db.utils import ConnectionHandler
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, Client, override_settings
+from django.urls import reverse
+
+from apps.accounts.models import UserProfile
+from apps.properties.models import Property, PropertyImage
+
+from .health import ReplicaPool, pool
+from .management.commands.copy_sqlite_replicas import copy_database
+from .middleware import STICKY_COOKIE, ReplicaRoutingMiddleware
+from .router import ReplicaRouter, RoutingState, _state, current_state, replica_reads
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'])
+class ReplicaRouterTest(SimpleTestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.state = RoutingState()
+        self.state.replica_reads = True
+        self.token = _state.set(self.state)
+        self.addCleanup(_state.reset, self.token)
+        patcher = mock.patch.object(pool, 'choose', return_value='replica2')
+        self.choose = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_public_reads_use_one_replica_per_request(self):
+        """Test reads from a replica-enabled request pick a replica once and keep it"""
+        self.assertEqual(self.router.db_for_read(Property), 'replica2')
+        self.assertEqual(self.router.db_for_read(PropertyImage), 'replica2')
+        self.choose.assert_called_once()
+
+    def test_identity_reads_use_primary(self):
+        """Test sessions, users and profiles are never read from a replica"""
+        for model in (Session, User, UserProfile, ContentType):
+            self.assertEqual(self.router.db_for_read(model), 'default')
+
+    def test_other_requests_read_primary(self):
+        """Test reads outside replica-enabled views and outside requests use the primary"""
+        self.state.replica_reads = False
+        self.assertEqual(self.router.db_for_read(Property), 'default')
+        _state.set(None)
+        self.assertEqual(self.router.db_for_read(Property), 'default')
+
+    def test_writes_pin_the_request_to_primary(self):
+        """Test once a request writes, its later reads go to the primary"""
+        self.assertEqual(self.router.db_for_write(Property), 'default')
+        self.assertTrue(self.state.wrote)
+        self.assertEqual(self.router.db_for_read(Property), 'default')
+
+    def test_sticky_users_read_primary(self):
+        """Test a user inside the sticky window reads from the primary"""
+        self.state.pinned = True
+        self.assertEqual(self.router.db_for_read(Property), 'default')
+
+    def test_no_healthy_replica_falls_back(self):
+        """Test reads use the primary when every replica is down"""
+        self.choose.return_value = None
+        self.assertEqual(self.router.db_for_read(Property), 'default')
+
+    def test_replicas_never_migrated(self):
+        """Test migrations only run on the primary"""
+        self.assertFalse(self.router.allow_migrate('replica1', 'properties'))
+        self.assertIsNone(self.router.allow_migrate('default', 'properties'))
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'], DATABASE_REPLICA_CHECK_INTERVAL=60)
+class ReplicaPoolTest(SimpleTestCase):
+    def test_unhealthy_replicas_skipped(self):
+        """Test selection skips replicas failing their check and returns None when all do"""
+        replicas = ReplicaPool(check=lambda alias: alias == 'replica2')
+        self.assertEqual({replicas.choose() for _ in range(20)}, {'replica2'})
+        replicas = ReplicaPool(check=lambda alias: False)
+        self.assertIsNone(replicas.choose())
+
+    def test_checks_cached_for_interval(self):
+        """Test each replica is checked once per interval and mark_down takes it out at once"""
+        check = mock.Mock(return_value=True)
+        replicas = ReplicaPool(check=check)
+        for _ in range(5):
+            replicas.choose()
+        self.assertEqual(check.call_count, 2)
+        replicas.mark_down('replica1')
+        self.assertEqual({replicas.choose() for _ in range(20)}, {'replica2'})
+        with mock.patch('apps.replicas.health.time.monotonic', return_value=10 ** 9):
+            self.assertTrue(replicas.healthy('replica1'))
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'], DATABASE_REPLICA_STICKY_SECONDS=7)
+class ReplicaMiddlewareTest(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def test_write_sets_sticky_cookie(self):
+        """Test a request that writes sends the sticky-primary cookie"""
+        def view(request):
+            ReplicaRouter().db_for_write(Property)
+            return HttpResponse()
+        response = ReplicaRoutingMiddleware(view)(self.factory.get('/'))
+        self.assertEqual(response.cookies[STICKY_COOKIE]['max-age'], 7)
+        response = ReplicaRoutingMiddleware(lambda request: HttpResponse())(self.factory.post('/'))
+        self.assertIn(STICKY_COOKIE, response.cookies)
+        response = ReplicaRoutingMiddleware(lambda request: HttpResponse())(self.factory.get('/'))
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+    def test_sticky_cookie_pins_request(self):
+        """Test a request carrying the sticky cookie is pinned to the primary"""
+        seen = []
+        view = replica_reads(lambda request: seen.append(current_state()) or HttpResponse())
+        request = self.factory.get('/')
+        request.COOKIES[STICKY_COOKIE] = '1'
+        ReplicaRoutingMiddleware(view)(request)
+        self.assertTrue(seen[0].pinned)
+        self.assertTrue(seen[0].replica_reads)
+        ReplicaRoutingMiddleware(view)(self.factory.head('/'))
+        self.assertFalse(seen[1].pinned)
+        self.assertIsNone(current_state())
+
+    def test_streamed_body_keeps_routing(self):
+        """Test a streamed body is read under the request's routing state"""
+        def chunks():
+            yield str(current_state().replica_reads).encode()
+        view = replica_reads(lambda request: StreamingHttpResponse(chunks()))
+        response = ReplicaRoutingMiddleware(view)(self.factory.get('/'))
+        self.assertIsNone(current_state())
+        self.assertEqual(b''.join(response.streaming_content), b'True')
+
+
+class ReplicaRoutingIntegrationTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.owner = User.objects.create_user(username='agent', password='testpass123')
+        self.buyer = User.objects.create_user(username='buyer', password='testpass123')
+        self.property = Property.objects.create(
+            title='Replica House', description='Read from a copy', price=300000, address='1 Copy Lane',
+            city='Austin', state='Texas', zipcode='73301', bedrooms=3, bathrooms=2, area=1500,
+            property_type=Property.HOUSE, status=Property.AVAILABLE, owner=self.owner,
+        )
+
+    def test_public_pages_read_replicas_until_user_writes(self):
+        """Test list/detail/feed reads go to a replica, and to the primary right after a write"""
+        # the test database stands in for the replica
+        with override_settings(DATABASE_REPLICAS=['default']), \
+                mock.patch.object(pool, 'choose', return_value='default') as choose:
+            self.client.get(reverse('properties:property_list'))
+            self.client.get(self.property.get_absolute_url())
+            b''.join(self.client.get(reverse('properties:listing_feed')).streaming_content)
+            self.assertEqual(choose.call_count, 3)
+            self.client.force_login(self.buyer)
+            response = self.client.post(
+                reverse('properties:inquiry_create', kwargs={'pk': self.property.pk}),
+                {'name': 'Buyer', 'email': 'buyer@example.com', 'message': 'Still available?'},
+            )
+            self.assertIn(STICKY_COOKIE, response.cookies)
+            choose.reset_mock()
+            self.client.get(self.property.get_absolute_url())
+            choose.assert_not_called()
+
+
+class StaleReplicaTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # an empty, migrated database: a replica copied before any of the test's rows existed
+        settings.DATABASES['stale'] = connections.configure_settings({
+            'default': settings.DATABASES['default'],
+            'stale': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'},
+        })['stale']
+        cls._stale_name = connections['stale'].settings_dict['NAME']
+        connections['stale'].creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        cls.databases = {'default', 'stale'}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['stale'].creation.destroy_test_db(cls._stale_name, verbosity=0)
+        del connections['stale']
+        del settings.DATABASES['stale']
+
+    def test_signed_in_user_survives_stale_replica(self):
+        """Test a user signed in after the last copy stays signed in on replica-read pages"""
+        user = User.objects.create_user(username='fresh', password='testpass123')
+        self.client.force_login(user)
+        with override_settings(DATABASE_REPLICAS=['stale']), mock.patch.object(pool, 'choose', return_value='stale'):
+            response = self.client.get(reverse('properties:property_list'))
+        self.assertEqual(response.context['user'], user)
+        self.assertFalse(User.objects.using('stale').exists())
+
+
+class CopySqliteReplicasTest(SimpleTestCase):
+    def test_copy_replaces_replica_file(self):
+        """Test the copy is a complete, readable snapshot of the primary file"""
+        with tempfile.TemporaryDirectory() as directory:
+            source, target = os.path.join(directory, 'primary.sqlite3'), os.path.join(directory, 'replica.sqlite3')
+            with sqlite3.connect(source) as db:
+                db.execute('CREATE TABLE listing (id INTEGER)')
+                db.executemany('INSERT INTO listing VALUES (?)', [(n,) for n in range(100)])
+            db.close()
+            open(target, 'w').close()
+            copy_database(source, target)
+            replica = sqlite3.connect(target)
+            self.assertEqual(replica.execute('SELECT COUNT(*) FROM listing').fetchone(), (100,))
+            replica.close()
+            self.assertEqual(sorted(os.listdir(directory)), ['primary.sqlite3', 'replica.sqlite3'])
+
+    def test_command_accepts_production_backend(self):
+        """Test the command copies a default database on the production SQLite backend"""
+        with tempfile.TemporaryDirectory() as directory:
+            source, target = os.path.join(directory, 'primary.sqlite3'), os.path.join(directory, 'replica.sqlite3')
+            with sqlite3.connect(source) as db:
+                db.execute('CREATE TABLE listing (id INTEGER)')
+            db.close()
+            databases = ConnectionHandler({
+                'default': {'ENGINE': 'realestate_project.backends.sqlite3', 'NAME': source, 'OPTIONS': {'transaction_mode': 'IMMEDIATE'}},
+                'replica1': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': target},
+            })
+            with override_settings(DATABASE_REPLICAS=['replica1']), \
+                    mock.patch('apps.replicas.management.commands.copy_sqlite_replicas.connections', databases):
+                call_command('copy_sqlite_replicas', stdout=StringIO())
+            databases.close_all()
+            replica = sqlite3.connect(target)
+            self.assertEqual(replica.execute('SELECT COUNT(*) FROM listing').fetchone(), (0,))
+            replica.close()
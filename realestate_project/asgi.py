@@ -7,5 +7,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'realestate_project.settings')
+# serve the list, detail and inbox pages with the async views (see PROPERTY_ASYNC_VIEWS)
+os.environ.setdefault('PROPERTY_ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
@@ -0,0 +1,65 @@
+"""SQLite backend with the two connection options Django 5.1 adds.
+
+Its schema editor also leaves out foreign keys to tables the database does
+not hold, which shard databases rely on (see ``schema.py``).
+
+Django 4.2's SQLite backend has no hook for per-connection pragmas and opens
+every ``transaction.atomic()`` block with a plain (deferred) ``BEGIN``. This
+backend accepts two extra ``OPTIONS``, named as in Django 5.1 so the settings
+carry over unchanged on upgrade:
+
+``init_command``
+    SQL run on every new connection, statements separated by ``;``.
+``transaction_mode``
+    ``DEFERRED``, ``IMMEDIATE`` or ``EXCLUSIVE``, used as ``BEGIN <mode>``.
+    A deferred transaction that reads before it writes must upgrade its read
+    lock, and SQLite fails that upgrade at once with "database is locked"
+    when another connection is writing, without waiting for
+    ``busy_timeout``. ``IMMEDIATE`` takes the write lock up front, so
+    concurrent writers queue on the timeout instead.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+from django.utils.functional import cached_property
+
+from .schema import DatabaseSchemaEditor
+
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+# OPTIONS handled here rather than passed on to sqlite3.connect()
+EXTRA_OPTIONS = ('init_command', 'transaction_mode')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    SchemaEditorClass = DatabaseSchemaEditor
+
+    @cached_property
+    def transaction_mode(self):
+        mode = self.settings_dict['OPTIONS'].get('transaction_mode')
+        if mode is None:
+            return None
+        if mode.upper() not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(
+                f"transaction_mode must be one of {', '.join(TRANSACTION_MODES)}, not {mode!r}."
+            )
+        return mode.upper()
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        for option in EXTRA_OPTIONS:
+            params.pop(option, None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for statement in self.settings_dict['OPTIONS'].get('init_command', '').split(';'):
+            if statement.strip():
+                conn.execute(statement)
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode is None:
+            super()._start_transaction_under_autocommit()
+        else:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
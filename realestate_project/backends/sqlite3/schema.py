@@ -0,0 +1,37 @@
+from contextlib import contextmanager
+
+from django.db import router
+from django.db.backends.sqlite3 import schema
+
+
+class DatabaseSchemaEditor(schema.DatabaseSchemaEditor):
+    """Leave out foreign key constraints to tables this database does not hold.
+
+    A shard only migrates the listing models (see ``ShardRouter``), so a
+    constraint on, say, ``Property.owner`` would reference a missing
+    ``auth_user`` table and make every insert fail. SQLite rebuilds a table
+    for most schema changes, so the check runs on every table creation.
+    """
+
+    @contextmanager
+    def _local_constraints(self, fields):
+        dropped = [
+            field for field in fields
+            if field.remote_field and field.db_constraint
+            and not router.allow_migrate_model(self.connection.alias, field.remote_field.model)
+        ]
+        for field in dropped:
+            field.db_constraint = False
+        try:
+            yield
+        finally:
+            for field in dropped:
+                field.db_constraint = True
+
+    def create_model(self, model):
+        with self._local_constraints(model._meta.local_fields):
+            super().create_model(model)
+
+    def add_field(self, model, field):
+        with self._local_constraints([field]):
+            super().add_field(model, field)
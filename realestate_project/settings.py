@@ -26,10 +26,17 @@ INSTALLED_APPS = [
     # Custom apps go under the `apps` package, e.g. 'apps.properties'
     'apps.properties',
     'apps.accounts',
+    'apps.jobs',
+    'apps.metrics',
+    'apps.replicas',
 ]
 
 # Middleware
 MIDDLEWARE = [
+    # first, so its timings include every other middleware
+    'apps.metrics.middleware.MetricsMiddleware',
+    # before anything that reads the database (sessions, auth)
+    'apps.replicas.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -67,6 +74,107 @@ DATABASES = {
     }
 }
 
+# Read replicas (apps.replicas). Every alias besides 'default' and the shards
+# is a replica that the list, detail and listings API pages read from.
+# SQLITE_REPLICAS=<n> adds n local file copies; refresh them with
+# `python manage.py copy_sqlite_replicas`.
+for n in range(1, int(os.environ.get('SQLITE_REPLICAS', '0')) + 1):
+    DATABASES[f'replica{n}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / f'db.replica{n}.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Geographic sharding (apps.properties.sharding): listings, their photos and
+# inquiries are stored on the PROPERTY_SHARDS aliases by state; default keeps
+# everything else. SQLITE_SHARDS=<n> adds n local shard files; create them with
+# `python manage.py migrate --database shard<i>`. Only ever append shards: a
+# shard's position fixes the pk range it allocates from.
+for n in range(1, int(os.environ.get('SQLITE_SHARDS', '0')) + 1):
+    DATABASES[f'shard{n}'] = {
+        # creates no foreign keys to the user table, which shards do not hold
+        'ENGINE': 'realestate_project.backends.sqlite3',
+        'NAME': BASE_DIR / f'db.shard{n}.sqlite3',
+    }
+PROPERTY_SHARDS = [alias for alias in DATABASES if alias.startswith('shard')]
+# Pin states to a shard, e.g. {'California': 'shard1'}; others are spread by hash.
+PROPERTY_SHARD_STATES = {}
+
+# Production SQLite profile (SQLITE_PRODUCTION=1), applied to default and the
+# shards, which take writes; replicas are read-only copies and keep the stock
+# backend. WAL lets readers run alongside the writer, write transactions take
+# the lock up front (BEGIN IMMEDIATE) and wait busy_timeout for it instead of
+# failing with "database is locked", and connections stay open across requests.
+SQLITE_PRODUCTION = os.environ.get('SQLITE_PRODUCTION') == '1'
+SQLITE_PRODUCTION_PRAGMAS = [
+    'PRAGMA journal_mode = WAL',
+    # fsync at checkpoints only; a power cut can lose the last commits, never corrupt
+    'PRAGMA synchronous = NORMAL',
+    # 64 MiB page cache per connection (negative values are KiB)
+    'PRAGMA cache_size = -65536',
+    # read the file through 256 MiB of memory map instead of read() calls
+    'PRAGMA mmap_size = 268435456',
+    # milliseconds a writer waits for the lock
+    'PRAGMA busy_timeout = 5000',
+    'PRAGMA temp_store = MEMORY',
+]
+if SQLITE_PRODUCTION:
+    for alias in ['default', *PROPERTY_SHARDS]:
+        DATABASES[alias].update({
+            'ENGINE': 'realestate_project.backends.sqlite3',
+            'OPTIONS': {'init_command': '; '.join(SQLITE_PRODUCTION_PRAGMAS), 'transaction_mode': 'IMMEDIATE'},
+            # seconds a connection is reused; checked before reuse
+            'CONN_MAX_AGE': 600,
+            'CONN_HEALTH_CHECKS': True,
+        })
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default' and alias not in PROPERTY_SHARDS]
+# the shard router answers for listings only and leaves the rest to the replica router
+DATABASE_ROUTERS = ['apps.properties.sharding.ShardRouter', 'apps.replicas.router.ReplicaRouter']
+# Seconds a user's reads stay on the primary after they write
+DATABASE_REPLICA_STICKY_SECONDS = 5
+# Seconds between health checks of each replica, per process
+DATABASE_REPLICA_CHECK_INTERVAL = 10
+
+# Caches
+# 'fragments' holds rendered template fragments such as the property list
+# cards; MAX_ENTRIES bounds its memory per process.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'default',
+    },
+    'fragments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'fragments',
+        'TIMEOUT': 60 * 60 * 24,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+
+# Cache alias for signed-in users, or None to load them from the database on
+# every request. It must be shared by all processes: a per-process cache would
+# keep serving a user after another process changes their password or deactivates them.
+# Set IDENTITY_CACHE_URL=redis://... (needs the redis package) to enable it
+# and to read sessions through the same cache.
+IDENTITY_CACHE = None
+if os.environ.get('IDENTITY_CACHE_URL'):
+    CACHES['identity'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['IDENTITY_CACHE_URL'],
+        'TIMEOUT': 60 * 60,
+    }
+    IDENTITY_CACHE = 'identity'
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+    SESSION_CACHE_ALIAS = 'identity'
+
+# ModelBackend, loading the signed-in user and profile through IDENTITY_CACHE;
+# the plain ModelBackend stays listed so sessions started under it keep working.
+AUTHENTICATION_BACKENDS = [
+    'apps.accounts.backends.CachedModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -106,9 +214,53 @@ LOGIN_URL = 'accounts:login'
 LOGIN_REDIRECT_URL = 'properties:property_list'
 LOGOUT_REDIRECT_URL = 'properties:property_list'
 
+# Property listings
+# 'offset' renders numbered pages; 'cursor' uses keyset pagination with opaque
+# next/prev tokens so deep pages cost the same as the first one.
+PROPERTY_LIST_PAGINATION = 'offset'
+# Seconds a cached list result count may live; saves/deletes invalidate sooner.
+PROPERTY_COUNT_CACHE_TIMEOUT = 60 * 60
+# Full-text search backend: 'auto' picks SQLite FTS5 or Postgres tsvector from
+# the default database; or give a dotted path from apps.properties.search.
+PROPERTY_SEARCH_BACKEND = 'auto'
+# Serve list filters/sorts from a per-process NumPy column index (requires numpy).
+# Each worker rechecks the index against the database every CHECK_INTERVAL seconds.
+PROPERTY_LISTING_INDEX = False
+PROPERTY_LISTING_INDEX_CHECK_INTERVAL = 60
+# CSV of zipcode,latitude,longitude used for offline geocoding; None uses the
+# small bundled table in apps/properties/data/zip_centroids.csv.
+PROPERTY_ZIP_CENTROIDS = None
+# Seconds between full rebuilds of the per-process city/state autocomplete trie.
+PROPERTY_AUTOCOMPLETE_REBUILD_INTERVAL = 300
+# Seconds a rendered property card stays in the 'fragments' cache. Cards are
+# keyed on (pk, updated_at), so edits never serve a stale card.
+PROPERTY_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+# Mixed into list/detail ETags; bump when a deploy changes those templates so
+# browsers and CDNs stop revalidating against the old markup.
+PROPERTY_PAGE_ETAG_VERSION = '1'
+# Rows fetched per database round trip by the streaming /api/listings/ feed.
+PROPERTY_FEED_CHUNK_SIZE = 500
+# Background processes rendering resized WebP/JPEG copies of uploaded photos;
+# 0 renders inline during the request.
+PROPERTY_RENDITION_WORKERS = 2
+# On-demand /images/<width>/<quality>/<path> resizes: allowed presets, the disk
+# cache holding the results and its size budget (LRU-evicted beyond it).
+PROPERTY_RESIZE_WIDTHS = [160, 320, 480, 640, 960, 1280, 1920]
+PROPERTY_RESIZE_QUALITIES = [50, 70, 85]
+PROPERTY_RESIZE_CACHE_DIR = BASE_DIR / 'cache' / 'resized'
+PROPERTY_RESIZE_CACHE_BYTES = 512 * 1024 * 1024
+# Internal nginx location serving PROPERTY_RESIZE_CACHE_DIR via X-Accel-Redirect,
+# e.g. '/_resized/'; None streams the file from Django with FileResponse.
+PROPERTY_RESIZE_ACCEL_REDIRECT = None
+# Serve the list, detail and inbox pages with native async views. asgi.py turns
+# this on through the environment; WSGI servers keep the sync views.
+PROPERTY_ASYNC_VIEWS = os.environ.get('PROPERTY_ASYNC_VIEWS') == '1'
+
 # Email Configuration (Console Backend for MVP)
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 DEFAULT_FROM_EMAIL = 'noreply@realestate.com'
+# Base URL for links in emails sent outside a request (inquiry digests)
+SITE_URL = 'http://localhost:8000'
 ADMINS = [('Admin', 'admin@realestate.com')]
 
 # For Production (commented out for reference)
@@ -118,3 +270,26 @@ ADMINS = [('Admin', 'admin@realestate.com')]
 # EMAIL_USE_TLS = True
 # EMAIL_HOST_USER = 'your-email@gmail.com'
 # EMAIL_HOST_PASSWORD = 'your-app-password'
+
+# Background jobs (apps.jobs; run with `python manage.py run_workers`)
+# Failed jobs retry after JOBS_RETRY_DELAY seconds, doubling up to
+# JOBS_MAX_RETRY_DELAY, until JOBS_MAX_ATTEMPTS; a running job whose worker
+# disappeared is picked up again after JOBS_LOCK_TIMEOUT seconds.
+JOBS_MAX_ATTEMPTS = 5
+JOBS_RETRY_DELAY = 30
+JOBS_MAX_RETRY_DELAY = 60 * 60
+JOBS_LOCK_TIMEOUT = 5 * 60
+
+# Request metrics (apps.metrics), scraped by Prometheus from /metrics
+METRICS_ENABLED = True
+# Bearer token Prometheus sends to read /metrics (authorization in its scrape
+# config); unset, /metrics refuses everyone
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+# Addresses additionally required of scrapers, or None for any. Behind a
+# reverse proxy REMOTE_ADDR is the proxy, so this is no substitute for the token.
+METRICS_ALLOWED_IPS = None
+# With several worker processes, a directory shared by them: each writes its
+# totals there every METRICS_FLUSH_INTERVAL seconds and /metrics adds them up.
+# Clear it on deploy. None reports only the process answering the scrape.
+METRICS_DIR = None
+METRICS_FLUSH_INTERVAL = 5
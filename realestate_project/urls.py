@@ -7,6 +7,7 @@ from django.conf.urls.static import static
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('accounts/', include('apps.accounts.urls')),
+    path('', include('apps.metrics.urls')),
     path('', include('apps.properties.urls')),
 ]
 
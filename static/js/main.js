@@ -69,7 +69,8 @@ document.addEventListener('DOMContentLoaded', function () {
   document.querySelectorAll('.img-hover-zoom').forEach(function (thumb) {
     thumb.style.cursor = 'pointer';
     thumb.addEventListener('click', function () {
-      var src = this.src;
+      // thumbnails carry the full-size rendition in data-full
+      var src = this.dataset.full || this.src;
       var modal = document.getElementById('imageLightbox');
       if (!modal) {
         modal = document.createElement('div');
@@ -166,6 +167,37 @@ document.addEventListener('DOMContentLoaded', function() {
     });
   });
 
+  // City/state suggestions for the search box
+  var autocompleteBox = document.querySelector('[data-autocomplete-url]');
+  var autocompleteInput = autocompleteBox && autocompleteBox.querySelector('input[name="search"]');
+  if (autocompleteInput) {
+    var datalist = document.createElement('datalist');
+    datalist.id = 'searchSuggestions';
+    autocompleteBox.appendChild(datalist);
+    autocompleteInput.setAttribute('list', datalist.id);
+    autocompleteInput.setAttribute('autocomplete', 'off');
+    var autocompleteTimer = null;
+    autocompleteInput.addEventListener('input', function() {
+      clearTimeout(autocompleteTimer);
+      var q = autocompleteInput.value.trim();
+      if (!q) { datalist.innerHTML = ''; return; }
+      autocompleteTimer = setTimeout(function() {
+        fetch(autocompleteBox.dataset.autocompleteUrl + '?q=' + encodeURIComponent(q))
+          .then(function(resp) { return resp.json(); })
+          .then(function(data) {
+            datalist.innerHTML = '';
+            data.results.forEach(function(item) {
+              var option = document.createElement('option');
+              option.value = item.value;
+              option.label = item.label + ' (' + item.count + ')';
+              datalist.appendChild(option);
+            });
+          })
+          .catch(function() {});
+      }, 120);
+    });
+  }
+
   // Keyboard shortcut: Ctrl/Cmd+F focuses on filter search input
   document.addEventListener('keydown', function(e) {
     if ((e.ctrlKey || e.metaKey) && e.key === 'f') {